@@ -0,0 +1,97 @@
+"""Synthetic catalogs and storage for the steel toes benchmarks."""
+import logging
+import time
+from typing import List
+
+import fsspec
+import pandas as pd
+from fsspec.implementations.memory import MemoryFileSystem
+from kedro.extras.datasets.pandas import CSVDataSet
+from kedro.io.data_catalog import DataCatalog
+from kedro.pipeline import Pipeline, node
+
+# steel toes sets the level of its logger when it is imported, it has to be
+# imported before the level is lowered below
+import steel_toes  # noqa: F401
+
+
+class LatencyMemoryFileSystem(MemoryFileSystem):
+    """In memory filesystem that sleeps on every call that would hit storage.
+
+    Set `LatencyMemoryFileSystem.latency` to the seconds each call should take
+    to imitate object storage.
+    """
+
+    protocol = "latencymemory"
+    latency = 0.0
+    calls = 0
+
+    @classmethod
+    def _strip_protocol(cls, path):
+        if isinstance(path, str):
+            path = path.replace("latencymemory://", "memory://", 1)
+        return super()._strip_protocol(path)
+
+    def _wait(self) -> None:
+        type(self).calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def info(self, path, **kwargs):
+        """Info of path, after the latency."""
+        self._wait()
+        return super().info(path, **kwargs)
+
+    def ls(self, path, detail=True, **kwargs):
+        """List path, after the latency."""
+        self._wait()
+        return super().ls(path, detail=detail, **kwargs)
+
+    def rm(self, path, recursive=False, maxdepth=None):
+        """Remove path, after the latency."""
+        self._wait()
+        return super().rm(path, recursive=recursive, maxdepth=maxdepth)
+
+
+fsspec.register_implementation("latencymemory", LatencyMemoryFileSystem, clobber=True)
+# a log line per swap would dominate the timings
+logging.getLogger("steel_toes").setLevel(logging.WARNING)
+
+
+def dataset_names(n: int) -> List[str]:
+    """Names of the datasets in a catalog of n datasets."""
+    return [f"dataset_{i}" for i in range(n)]
+
+
+def synthetic_catalog(
+    n: int,
+    root: str = "latencymemory://steel_toes",
+    branch: str = "bench",
+    branched_every: int = 10,
+    layers: int = 8,
+) -> DataCatalog:
+    """Create a catalog of n csv datasets spread over layer directories.
+
+    Every `branched_every` dataset has data saved under `branch`, base data is
+    never written as none of the probes read it.
+    """
+    df = pd.DataFrame({"col1": [1]})
+    datasets = {}
+    for i, name in enumerate(dataset_names(n)):
+        directory = f"{root}/{i % layers:02}_layer"
+        datasets[name] = CSVDataSet(filepath=f"{directory}/{name}.csv")
+        if branched_every and i % branched_every == 0:
+            CSVDataSet(filepath=f"{directory}/{name}_{branch}.csv").save(df)
+    return DataCatalog(datasets)
+
+
+def identity(data):
+    """Pass data through a node unchanged."""
+    return data  # pragma: no cover
+
+
+def chain_pipeline(names: List[str]) -> Pipeline:
+    """Pipeline that passes data along names one node at a time."""
+    return Pipeline(
+        [node(identity, a, b, name=f"to_{b}") for a, b in zip(names[:-1], names[1:])]
+    )
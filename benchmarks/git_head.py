@@ -0,0 +1,54 @@
+"""Compare reading HEAD directly with running `git rev-parse`.
+
+Run from inside a git repository.
+
+    python -m benchmarks.git_head --repeat 200 --output git_head.json
+"""
+import argparse
+import json
+import subprocess
+import timeit
+from pathlib import Path
+
+from steel_toes.git import clear_cache, read_head
+
+
+def rev_parse(proj_dir: Path) -> str:
+    """Current branch the way steel toes used to get it."""
+    res = subprocess.check_output(
+        ["git", "rev-parse", "--abbrev-ref", "HEAD"], cwd=str(proj_dir)
+    )
+    return res.decode().strip()
+
+
+def uncached(proj_dir: Path) -> str:
+    """Current branch read directly with a cold cache."""
+    clear_cache()
+    return read_head(proj_dir)
+
+
+def main() -> None:
+    """Time every approach and report the mean in milliseconds."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--directory", default=".", type=Path)
+    parser.add_argument("--repeat", default=100, type=int)
+    parser.add_argument("--output", default=None, type=Path)
+    args = parser.parse_args()
+
+    assert rev_parse(args.directory) == uncached(args.directory)
+    results = {}
+    for name, func in [
+        ("subprocess", rev_parse),
+        ("native", uncached),
+        ("native_cached", read_head),
+    ]:
+        seconds = timeit.timeit(lambda: func(args.directory), number=args.repeat)
+        results[name] = seconds / args.repeat * 1000
+        print(f"{name:>14}: {results[name]:8.3f} ms")
+
+    if args.output is not None:
+        args.output.write_text(json.dumps({"git_head_ms": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
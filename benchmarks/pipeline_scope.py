@@ -0,0 +1,61 @@
+"""Compare catalog wide and pipeline scoped resolution of a filtered run.
+
+A synthetic catalog of 5,000 datasets is resolved the way `kedro run
+--pipeline` would, where the selected pipeline only covers a share of it.
+
+    python -m benchmarks.pipeline_scope --datasets 5000 --share 0.05
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+from steel_toes import SteelToes
+from benchmarks.catalog import (
+    LatencyMemoryFileSystem,
+    chain_pipeline,
+    dataset_names,
+    synthetic_catalog,
+)
+
+
+def startup(resolution: str, datasets: int, share: float) -> dict:
+    """Time the hooks that run before the first node for one resolution."""
+    catalog = synthetic_catalog(datasets)
+    pipeline = chain_pipeline(dataset_names(int(datasets * share)))
+    hook = SteelToes(branch="bench", resolution=resolution)
+    LatencyMemoryFileSystem.calls = 0
+    start = time.perf_counter()
+    hook.after_catalog_created(catalog)
+    hook.before_pipeline_run(run_params={}, pipeline=pipeline, catalog=catalog)
+    return {
+        "seconds": time.perf_counter() - start,
+        "storage_calls": LatencyMemoryFileSystem.calls,
+    }
+
+
+def main() -> None:
+    """Run both resolutions and report startup time and storage calls."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--datasets", default=5000, type=int)
+    parser.add_argument("--share", default=0.05, type=float)
+    parser.add_argument("--latency", default=0.0, type=float)
+    parser.add_argument("--output", default=None, type=Path)
+    args = parser.parse_args()
+
+    LatencyMemoryFileSystem.latency = args.latency
+    results = {
+        resolution: startup(resolution, args.datasets, args.share)
+        for resolution in ["catalog", "pipeline"]
+    }
+    for resolution, result in results.items():
+        print(
+            f"{resolution:>9}: {result['seconds']:8.3f} s "
+            f"{result['storage_calls']:6} storage calls"
+        )
+    if args.output is not None:
+        args.output.write_text(json.dumps({"pipeline_scope": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Time the steel toes hot path on synthetic catalogs of increasing size.
+
+Every size is run on local disk and on an in memory filesystem with an
+injectable latency per storage call, results are written as json so that
+versions can be compared offline.
+
+    python -m benchmarks.suite --sizes 10 1000 10000 --output results.json
+    python -m benchmarks.suite --sizes 1000 --latency 0.001 --compare results.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+
+from fsspec.implementations.memory import MemoryFileSystem
+
+import steel_toes
+from benchmarks.catalog import (
+    LatencyMemoryFileSystem,
+    chain_pipeline,
+    dataset_names,
+    synthetic_catalog,
+)
+from steel_toes import SteelToes, clean_branch, whos_protected
+
+BRANCH = "bench"
+STORAGES = ["local", "memory"]
+OPERATIONS = [
+    "after_catalog_created",
+    "before_pipeline_run",
+    "after_node_run",
+    "whos_protected",
+    "clean_branch",
+]
+
+
+def timed(func: Callable[[], object]) -> Dict[str, float]:
+    """Time func and count the storage calls it made on the memory filesystem."""
+    LatencyMemoryFileSystem.calls = 0
+    start = time.perf_counter()
+    func()
+    return {
+        "seconds": time.perf_counter() - start,
+        "storage_calls": LatencyMemoryFileSystem.calls,
+    }
+
+
+def run_once(n: int, root: str, hook_kwargs: Dict) -> Dict[str, Dict[str, float]]:
+    """Time every operation once on a fresh catalog of n datasets."""
+    catalog = synthetic_catalog(n, root=root, branch=BRANCH)
+    names = dataset_names(n)
+    pipeline = chain_pipeline(names)
+    hook = SteelToes(branch=BRANCH, **hook_kwargs)
+    context = SimpleNamespace(catalog=catalog)
+
+    def after_node_run() -> None:
+        for name in names[1:]:
+            hook.after_node_run(catalog=catalog, outputs={name: None})
+
+    return {
+        "after_catalog_created": timed(lambda: hook.after_catalog_created(catalog)),
+        "before_pipeline_run": timed(
+            lambda: hook.before_pipeline_run(
+                run_params={}, pipeline=pipeline, catalog=catalog
+            )
+        ),
+        "after_node_run": timed(after_node_run),
+        "whos_protected": timed(lambda: whos_protected(catalog)),
+        "clean_branch": timed(
+            lambda: clean_branch(branch=BRANCH, context=context, jobs=8)
+        ),
+    }
+
+
+def run_case(
+    n: int, storage: str, repeat: int, hook_kwargs: Dict
+) -> Dict[str, Dict[str, float]]:
+    """Time every operation repeat times, keeping the min and median."""
+    runs = []
+    for i in range(repeat):
+        if storage == "memory":
+            root = f"latencymemory://bench_{n}_{i}"
+            runs.append(run_once(n, root, hook_kwargs))
+            MemoryFileSystem.store.clear()
+            MemoryFileSystem.pseudo_dirs[:] = [""]
+        else:
+            with tempfile.TemporaryDirectory() as root:
+                runs.append(run_once(n, root, hook_kwargs))
+    return {
+        operation: {
+            "min": min(run[operation]["seconds"] for run in runs),
+            "median": statistics.median(run[operation]["seconds"] for run in runs),
+            "storage_calls": runs[-1][operation]["storage_calls"],
+            "per_dataset": statistics.median(run[operation]["seconds"] for run in runs)
+            / n,
+        }
+        for operation in OPERATIONS
+    }
+
+
+def compare(old: Dict, new: Dict, threshold: float = 1.2) -> List[str]:
+    """Lines describing every case that is threshold times slower than old."""
+    lines = []
+    for case, operations in new["results"].items():
+        for operation, timing in operations.items():
+            before = old["results"].get(case, {}).get(operation)
+            if not before or not before["median"]:
+                continue
+            ratio = timing["median"] / before["median"]
+            flag = "  REGRESSION" if ratio > threshold else ""
+            lines.append(f"{case:>16} {operation:>22}: {ratio:5.2f}x{flag}")
+    return lines
+
+
+def main() -> None:
+    """Run the suite and write the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=[10, 1000, 10000], type=int)
+    parser.add_argument("--storage", nargs="+", default=STORAGES, choices=STORAGES)
+    parser.add_argument("--latency", default=0.0, type=float)
+    parser.add_argument("--repeat", default=3, type=int)
+    parser.add_argument("--probe", default="exists")
+    parser.add_argument("--workers", default=1, type=int)
+    parser.add_argument("--output", default=None, type=Path)
+    parser.add_argument("--compare", default=None, type=Path)
+    args = parser.parse_args()
+
+    LatencyMemoryFileSystem.latency = args.latency
+    hook_kwargs = {"probe": args.probe, "workers": args.workers}
+    results = {}
+    for storage in args.storage:
+        for n in args.sizes:
+            case = f"{storage}/{n}"
+            results[case] = run_case(n, storage, args.repeat, hook_kwargs)
+            for operation, timing in results[case].items():
+                print(
+                    f"{case:>16} {operation:>22}: {timing['median']:9.4f} s "
+                    f"{timing['storage_calls']:7} storage calls"
+                )
+
+    report = {
+        "steel_toes": steel_toes.__version__,
+        "python": platform.python_version(),
+        "started": time.time(),
+        "parameters": {**vars(args), "output": None, "compare": None},
+        "results": results,
+    }
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=2))
+    if args.compare is not None:
+        print(f"\ncompared with {args.compare}")
+        for line in compare(json.loads(args.compare.read_text()), report):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
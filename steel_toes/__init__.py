@@ -15,8 +15,17 @@ __author__ = ("Waylon Walker",)
 __author_email__ = ("waylon@waylonwalker.com",)
 __license__ = "MIT"
 
-__all__ = ["cli", "SteelToes", "whos_protected", "clean_branch"]
+__all__ = [
+    "cli",
+    "SteelToes",
+    "whos_protected",
+    "clean_branch",
+    "register",
+    "use_layout",
+]
 
 from steel_toes.cli import cli
 from steel_toes.hook import SteelToes
+from steel_toes.layout import use_layout
+from steel_toes.registry import register
 from steel_toes.steel_toes import clean_branch, whos_protected
@@ -0,0 +1,101 @@
+"""
+Existence cache for steel toes.
+
+Remembers whether branched filepaths exist so that the same dataset is not
+probed again by the next hook, or the next run inside the same process.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from steel_toes.probe import Candidate
+
+Key = Tuple[str, str]
+
+
+class ExistenceCache:
+    """Bounded LRU cache of branched filepath existence with an optional ttl.
+
+    Arguments:
+        maxsize (int): Maximum number of filepaths to remember.
+        ttl (float): Seconds to remember a result for. Default None remembers
+            results until they are evicted or invalidated.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None) -> None:
+        """Initialize an empty cache."""
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Key, Tuple[bool, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(dataset: Any, filepath: Any) -> Key:
+        """Key filepaths by protocol so paths on different filesystems differ."""
+        return (str(getattr(dataset, "_protocol", "")), str(filepath))
+
+    def get(self, key: Key) -> Optional[bool]:
+        """Get a cached result, None if it is unknown or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (
+                self.ttl is None or time.monotonic() - entry[1] < self.ttl
+            ):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: Key, exists: bool) -> None:
+        """Remember whether key exists, evicting the least recently used."""
+        with self._lock:
+            self._entries[key] = (exists, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Key) -> None:
+        """Forget key, it will be probed again next time."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Forget everything, the counters are kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def info(self) -> Dict[str, Any]:
+        """Hit and miss counters of the cache."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+            }
+
+    def wrap(self, probe: Callable[..., List[bool]]) -> Callable[..., List[bool]]:
+        """Wrap probe so that only candidates missing from the cache are probed."""
+
+        def cached_probe(candidates: List[Candidate], workers: int = 1) -> List[bool]:
+            keys = [
+                self.key(d, branched_filepath) for d, branched_filepath in candidates
+            ]
+            exists = [self.get(key) for key in keys]
+            missing = [
+                i for i, branched_exists in enumerate(exists) if branched_exists is None
+            ]
+            probed = probe([candidates[i] for i in missing], workers=workers)
+            for i, branched_exists in zip(missing, probed):
+                exists[i] = branched_exists
+                self.set(keys[i], branched_exists)
+            return exists
+
+        return cached_probe
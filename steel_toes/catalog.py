@@ -0,0 +1,255 @@
+"""
+Lightweight catalog for the steel toes cli.
+
+Bootstrapping a `KedroSession` imports the whole project, its pipelines and
+libraries such as pandas or spark, just so the cli can learn where datasets
+live.  This module parses the catalog config files directly and builds small
+stand-in datasets holding only the filepath and filesystem of each entry.
+The parsed config is cached and keyed by the mtimes of the config files.
+Only single file datasets, versioned or not, are modelled.  Directories of
+partitions and dataset factories fall back to a `KedroSession`.
+
+The config is read from the `CONF_SOURCE` of the projects settings.py, which
+is parsed rather than imported, since importing it imports the hooks and
+everything they need.
+"""
+import ast
+import json
+import os
+from pathlib import Path, PurePosixPath
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import toml
+import yaml
+from fsspec.core import url_to_fs
+from kedro.io.core import Version, get_filepath_str, get_protocol_and_path
+
+PATTERNS = ["catalog*", "catalog*/**/*", "**/catalog*"]
+SUFFIXES = [".yml", ".yaml", ".json"]
+
+
+CATALOG_CACHE = ".steel_toes/catalog.json"
+# bumped whenever the cached entries change shape
+CACHE_FORMAT = 2
+
+PARTITIONED_TYPES = {
+    "PartitionedDataSet",
+    "PartitionedDataset",
+    "IncrementalDataSet",
+    "IncrementalDataset",
+}
+
+
+class LightCatalogError(ValueError):
+    """Raised when catalog entries need kedro to resolve or to model."""
+
+
+def settings_conf_source(project_path: Union[str, Path] = ".") -> str:
+    """Read `CONF_SOURCE` from the settings.py of the project without importing it.
+
+    The package is found through `[tool.kedro]` in pyproject.toml.  Projects
+    without settings, or settings without `CONF_SOURCE`, use kedro's "conf".
+    """
+    project_path = Path(project_path)
+    try:
+        metadata = toml.load(project_path / "pyproject.toml")["tool"]["kedro"]
+        package = metadata["package_name"]
+    except (FileNotFoundError, KeyError, toml.TomlDecodeError):
+        return "conf"
+    settings = (
+        project_path / metadata.get("source_dir", "src") / package / "settings.py"
+    )
+    try:
+        tree = ast.parse(settings.read_text())
+    except FileNotFoundError:
+        return "conf"
+    conf_source = "conf"
+    for node in tree.body:
+        if isinstance(node, ast.Assign):
+            targets, value = node.targets, node.value
+        elif isinstance(node, ast.AnnAssign) and node.value is not None:
+            targets, value = [node.target], node.value
+        else:
+            continue
+        if not any(isinstance(t, ast.Name) and t.id == "CONF_SOURCE" for t in targets):
+            continue
+        if not (isinstance(value, ast.Constant) and isinstance(value.value, str)):
+            raise LightCatalogError(f"CONF_SOURCE in {settings} needs kedro to resolve")
+        conf_source = value.value
+    return conf_source
+
+
+def catalog_files(
+    project_path: Union[str, Path] = ".",
+    env: str = "local",
+    conf_source: str = "conf",
+) -> List[Path]:
+    """Find the catalog config files of base and env, in load order."""
+    files: List[Path] = []
+    for conf_path in ["base", env]:
+        root = Path(project_path) / conf_source / conf_path
+        found = set()
+        for pattern in PATTERNS:
+            found.update(
+                path
+                for path in root.glob(pattern)
+                if path.is_file() and path.suffix in SUFFIXES
+            )
+        files.extend(sorted(found))
+    return files
+
+
+def _signature(files: List[Path]) -> List[Tuple[str, int]]:
+    """Key the cache on every config file and when it was last changed."""
+    return [(str(path), path.stat().st_mtime_ns) for path in files]
+
+
+def _is_partitioned_type(type_: Any) -> bool:
+    """Check if the type of an entry names a partitioned dataset class."""
+    return isinstance(type_, str) and type_.rsplit(".", 1)[-1] in PARTITIONED_TYPES
+
+
+def _read_config(files: List[Path]) -> Dict[str, Dict[str, Any]]:
+    """Parse and merge the catalog entries of files, later files win."""
+    config: Dict[str, Dict[str, Any]] = {}
+    for path in files:
+        content = yaml.safe_load(path.read_text()) or {}
+        for name, entry in content.items():
+            if name.startswith("_") or not isinstance(entry, dict):
+                # yaml anchors and other non dataset config
+                continue
+            type_ = entry.get("type")
+            config[name] = {
+                "type": type_,
+                "filepath": entry.get("filepath", entry.get("path")),
+                "versioned": bool(entry.get("versioned", False)),
+                "credentials": "credentials" in entry or "fs_args" in entry,
+                # partitions live in a directory at `path` rather than `filepath`
+                "partitioned": "filepath" not in entry
+                and ("path" in entry or _is_partitioned_type(type_)),
+                "factory": "{" in name,
+            }
+    return config
+
+
+def read_catalog(
+    project_path: Union[str, Path] = ".",
+    env: str = "local",
+    conf_source: str = "conf",
+    cache: Union[str, Path, None] = CATALOG_CACHE,
+) -> Dict[str, Dict[str, Any]]:
+    """Read the type, filepath and versioning of every catalog entry.
+
+    A relative cache lives in project_path, None reads without a cache.
+
+    Returns: {dataset_name: {"type", "filepath", "versioned", "credentials",
+        "partitioned", "factory"}}
+    """
+    files = catalog_files(project_path, env, conf_source)
+    signature = _signature(files)
+    cache_path = None if cache is None else Path(project_path) / cache
+    if cache_path is not None and cache_path.exists():
+        cached = json.loads(cache_path.read_text())
+        if cached.get("format") == CACHE_FORMAT and cached.get("signature") == [
+            list(s) for s in signature
+        ]:
+            return cached["entries"]
+
+    entries = _read_config(files)
+    if cache_path is not None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        cache_path.write_text(
+            json.dumps(
+                {"format": CACHE_FORMAT, "signature": signature, "entries": entries}
+            )
+        )
+    return entries
+
+
+class LightDataSet:
+    """Stand-in for a file based dataset that can only check if it exists."""
+
+    def __init__(
+        self, filepath: str, type: Optional[str] = None, versioned: bool = False
+    ) -> None:
+        """Resolve the filesystem of filepath, nothing is loaded."""
+        self._protocol, path = get_protocol_and_path(filepath)
+        self._fs, _ = url_to_fs(filepath)
+        self._filepath = PurePosixPath(path)
+        # a directory of versions lives at filepath, like kedro's datasets
+        self._version = Version(None, None) if versioned else None
+        self.type = type
+
+    def _exists(self) -> bool:
+        return self._fs.exists(get_filepath_str(self._filepath, self._protocol))
+
+    def __repr__(self) -> str:
+        return f"LightDataSet(filepath='{self._filepath}', type='{self.type}')"
+
+
+class LightCatalog:
+    """Catalog of `LightDataSet`s, with the parts of `DataCatalog` steel toes uses.
+
+    Arguments:
+        project_path (Path): root of the kedro project.
+        env (str): kedro environment to read on top of base.
+        conf_source (str): directory the config lives in.  Defaults to the
+            `CONF_SOURCE` of the project settings.
+        cache (Path): file the parsed config is cached in, None disables it.
+    """
+
+    def __init__(
+        self,
+        project_path: Union[str, Path] = ".",
+        env: str = "local",
+        conf_source: Optional[str] = None,
+        cache: Union[str, Path, None] = CATALOG_CACHE,
+    ) -> None:
+        """Read the catalog config, raising if it needs kedro to resolve."""
+        project_path = Path(project_path)
+        if conf_source is None:
+            conf_source = settings_conf_source(project_path)
+        self.entries = read_catalog(project_path, env, conf_source, cache)
+        datasets = {}
+        for name, entry in self.entries.items():
+            if entry["factory"]:
+                raise LightCatalogError(f"{name} is a dataset factory")
+            if entry["partitioned"]:
+                raise LightCatalogError(
+                    f"{name} is a {entry['type']} directory of partitions"
+                )
+            filepath = entry["filepath"]
+            if not isinstance(filepath, str):
+                continue
+            if "${" in filepath or entry["credentials"]:
+                raise LightCatalogError(
+                    f"{name} needs kedro to resolve '{filepath}' or its credentials"
+                )
+            if "://" not in filepath and not Path(filepath).is_absolute():
+                filepath = str(project_path / filepath)
+            datasets[name] = LightDataSet(filepath, entry["type"], entry["versioned"])
+        self.datasets = SimpleNamespace(**datasets)
+
+    def list(self) -> List[str]:
+        """List the names of the file based datasets."""
+        return list(vars(self.datasets))
+
+
+def light_context(
+    project_path: Union[str, Path] = ".",
+    env: str = "local",
+    conf_source: Optional[str] = None,
+) -> Optional[SimpleNamespace]:
+    """Build a context holding a `LightCatalog`, None when kedro is needed.
+
+    The cache is kept in `STEEL_TOES_CATALOG_CACHE`, an empty value disables
+    it.  Defaults to `.steel_toes/catalog.json` in the project.
+    """
+    cache = os.environ.get("STEEL_TOES_CATALOG_CACHE", CATALOG_CACHE) or None
+    try:
+        return SimpleNamespace(
+            catalog=LightCatalog(project_path, env, conf_source, cache)
+        )
+    except LightCatalogError:
+        return None
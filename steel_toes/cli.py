@@ -3,11 +3,21 @@ cli module provides steel-toes command line interface.
 
 The main use case for the cli is to cleanup data after branch work is done.
 """
+import os
+import time
 from pathlib import Path
 
 import click
-from kedro.framework.project import settings
 
+from steel_toes.catalog import light_context
+from steel_toes.gc import gc as _gc
+from steel_toes.layout import LAYOUTS
+from steel_toes.manifest import verify_manifest as _verify_manifest
+from steel_toes.migrate import migrate as _migrate
+from steel_toes.promote import promote as _promote
+from steel_toes.remove import RemoveSummary
+from steel_toes.scope import run_scoped as _run_scoped
+from steel_toes.stats import STATS_DIR, hook_seconds, read_reports, regression, slowest
 from steel_toes.steel_toes import clean_branch as _clean_branch
 
 __version__ = "0.2.0"
@@ -15,6 +25,7 @@ __version__ = "0.2.0"
 
 def _eighteen_path_lookup(server):
     from kedro.config.common import _lookup_config_filepaths
+    from kedro.framework.project import settings
 
     conf_loader = settings.CONFIG_LOADER_CLASS(server.settings.CONF_SOURCE)
     paths = []
@@ -30,6 +41,54 @@ def _eighteen_path_lookup(server):
     return paths
 
 
+def _context(directory: str = ".", session: bool = False):
+    """Catalog context for a command.
+
+    The catalog config is read directly unless a session is asked for, or the
+    config needs kedro to resolve templates or credentials or to model the
+    dataset type, in which case None lets the command bootstrap a full
+    `KedroSession`.
+    """
+    if session:
+        return None
+    return light_context(directory, os.environ.get("KEDRO_ENV", "local"))
+
+
+class _Progress:
+    """Progress bar that is only drawn once the total is known."""
+
+    def __init__(self, label: str) -> None:
+        self.label = label
+        self.bar = None
+
+    def __call__(self, done: int, total: int) -> None:
+        if self.bar is None:
+            self.bar = click.progressbar(length=total, label=self.label)
+            self.bar.__enter__()
+        self.bar.update(done)
+
+    def __enter__(self) -> "_Progress":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self.bar is not None:
+            self.bar.__exit__(*exc)
+
+
+def _echo_summary(summary: RemoveSummary, dryrun: bool = False) -> None:
+    """Print how many files and bytes were removed and how long it took."""
+    action = "would remove" if dryrun else "removed"
+    sized = (
+        ""
+        if summary.files is None
+        else f", {summary.files} files, {summary.bytes} bytes"
+    )
+    click.echo(
+        f"steel-toes {action} {len(summary.paths)} paths{sized} "
+        f"in {summary.seconds:.2f}s"
+    )
+
+
 @click.group(name="steel-toes")
 @click.version_option(__version__, "-V", "--version", help="Prints version and exits")
 def cli() -> None:
@@ -71,9 +130,460 @@ def cli() -> None:
     is_flag=True,
     help="Displays the files that would be deleted using the specified command without actually deleting them.",
 )
+@click.option(
+    "--jobs",
+    "-j",
+    default=8,
+    type=int,
+    help="Number of directories listed, and batches deleted, at once",
+)
+@click.option(
+    "--verbose",
+    "-v",
+    default=False,
+    is_flag=True,
+    help="Also count the files and bytes under deleted directories, listing each of them.",
+)
+@click.option(
+    "--session",
+    default=False,
+    is_flag=True,
+    help="Load the catalog through a full KedroSession instead of the catalog config.",
+)
 @cli.command()
 def clean_branch(
-    directory: str = ".", branch: str = None, dryrun: bool = False
+    directory: str = ".",
+    branch: str = None,
+    dryrun: bool = False,
+    jobs: int = 8,
+    verbose: bool = False,
+    session: bool = False,
 ) -> None:
     """Find branch datasets and removes them."""
-    _clean_branch(directory=directory, branch=branch, dryrun=dryrun)  # pragma: nocover
+    with _Progress("deleting") as progress:  # pragma: nocover
+        summary = _clean_branch(
+            directory=directory,
+            branch=branch,
+            dryrun=dryrun,
+            jobs=jobs,
+            progress=progress,
+            size=verbose,
+            context=_context(directory, session),
+        )
+    _echo_summary(summary, dryrun)  # pragma: nocover
+
+
+@click.option(
+    "--directory",
+    "-d",
+    default=".",
+    type=click.Path(exists=False, file_okay=False),
+    help="Path to the kedro project",
+)
+@click.option(
+    "--manifest",
+    "-m",
+    default="data/.steel_toes",
+    type=click.Path(exists=False, file_okay=False),
+    help="Directory the manifest files are kept in",
+)
+@click.option("--branch", "-b", default=None, type=str, help="git branch to verify")
+@click.option(
+    "--rebuild",
+    default=False,
+    is_flag=True,
+    help="Rewrite the manifest from the branched datasets that exist in storage.",
+)
+@click.option(
+    "--workers", "-w", default=1, type=int, help="Number of threads checking storage"
+)
+@click.option(
+    "--session",
+    default=False,
+    is_flag=True,
+    help="Load the catalog through a full KedroSession instead of the catalog config.",
+)
+@cli.command()
+def verify_manifest(
+    directory: str = ".",
+    manifest: str = "data/.steel_toes",
+    branch: str = None,
+    rebuild: bool = False,
+    workers: int = 1,
+    session: bool = False,
+) -> None:
+    """Compare the branch manifest with storage and optionally rebuild it."""
+    _verify_manifest(
+        manifest=manifest,
+        branch=branch,
+        directory=directory,
+        rebuild=rebuild,
+        workers=workers,
+        context=_context(directory, session),
+    )  # pragma: nocover
+
+
+@click.option(
+    "--directory",
+    "-d",
+    default=".",
+    type=click.Path(exists=False, file_okay=False),
+    help="Path to the kedro project",
+)
+@click.option(
+    "--base",
+    default=None,
+    type=str,
+    help="Also collect data from branches merged into this branch",
+)
+@click.option(
+    "--dryrun",
+    default=False,
+    is_flag=True,
+    help="Report the files that would be deleted without deleting them.",
+)
+@click.option(
+    "--state",
+    default=".steel_toes/gc.json",
+    type=click.Path(dir_okay=False),
+    help="File, relative to --directory, recording the paths of live branches, proof they are branch data once the branch is gone, and the listing of every directory so unchanged directories are not listed again",
+)
+@click.option(
+    "--manifest",
+    default=None,
+    type=click.Path(file_okay=False),
+    help="Directory of the branch manifests kept by the hook, the paths they record are branch data",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    default=8,
+    type=int,
+    help="Number of directories listed, and batches deleted, at once",
+)
+@click.option(
+    "--verbose",
+    "-v",
+    default=False,
+    is_flag=True,
+    help="Also count the files and bytes under deleted directories, listing each of them.",
+)
+@click.option(
+    "--session",
+    default=False,
+    is_flag=True,
+    help="Load the catalog through a full KedroSession instead of the catalog config.",
+)
+@cli.command()
+def gc(
+    directory: str = ".",
+    base: str = None,
+    dryrun: bool = False,
+    state: str = ".steel_toes/gc.json",
+    manifest: str = None,
+    jobs: int = 8,
+    verbose: bool = False,
+    session: bool = False,
+) -> None:
+    """Remove data left behind by deleted or merged branches.
+
+    Only paths proven to be branch data are removed, paths that are merely
+    named like it are listed and kept.
+    """
+    report = _gc(
+        directory=directory,
+        base=base,
+        dryrun=dryrun,
+        state=state,
+        jobs=jobs,
+        context=_context(directory, session),
+        manifest=manifest,
+        size=verbose,
+    )  # pragma: nocover
+    for branch, paths in report.orphans.items():  # pragma: nocover
+        click.echo(f"{branch}: {len(paths)} paths")
+    for branch, paths in report.unproven.items():  # pragma: nocover
+        for path in paths:
+            click.echo(f"kept, not proven to be data of '{branch}': {path}")
+    _echo_summary(report.summary, dryrun)  # pragma: nocover
+
+
+@click.option(
+    "--directory",
+    "-d",
+    default=".",
+    type=click.Path(exists=False, file_okay=False),
+    help="Path to the kedro project",
+)
+@click.option(
+    "--branch",
+    "-b",
+    required=True,
+    type=str,
+    help="git branch to promote the data of",
+)
+@click.option(
+    "--dryrun",
+    default=False,
+    is_flag=True,
+    help="Report the files that would be moved without moving them.",
+)
+@click.option(
+    "--verify",
+    default=False,
+    is_flag=True,
+    help="Compare a checksum of each file before and after it is moved.",
+)
+@click.option(
+    "--resume",
+    default=False,
+    is_flag=True,
+    help="Finish a promotion that was interrupted.",
+)
+@click.option(
+    "--rollback",
+    default=False,
+    is_flag=True,
+    help="Undo a promotion that was interrupted.",
+)
+@click.option(
+    "--journal",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="Journal file, defaults to .steel_toes/promote/<branch>.jsonl",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    default=8,
+    type=int,
+    help="Number of files moved at once",
+)
+@click.option(
+    "--session",
+    default=False,
+    is_flag=True,
+    help="Load the catalog through a full KedroSession instead of the catalog config.",
+)
+@cli.command()
+def promote(
+    directory: str = ".",
+    branch: str = None,
+    dryrun: bool = False,
+    verify: bool = False,
+    resume: bool = False,
+    rollback: bool = False,
+    journal: str = None,
+    jobs: int = 8,
+    session: bool = False,
+) -> None:
+    """Move the data of a merged branch onto the base paths."""
+    report = _promote(
+        directory=directory,
+        branch=branch,
+        dryrun=dryrun,
+        verify=verify,
+        resume=resume,
+        rollback=rollback,
+        journal=journal,
+        jobs=jobs,
+        context=_context(directory, session),
+    )  # pragma: nocover
+    action = "rolled back" if rollback else "would move" if dryrun else "moved"
+    click.echo(
+        f"steel-toes {action} {len(report.moved)} files in {report.seconds:.2f}s"
+    )  # pragma: nocover
+
+
+@click.option(
+    "--directory",
+    "-d",
+    default=".",
+    type=click.Path(exists=False, file_okay=False),
+    help="Path to the kedro project",
+)
+@click.option(
+    "--branch",
+    "-b",
+    "branches",
+    required=True,
+    multiple=True,
+    type=str,
+    help="git branch to migrate the data of, may be given more than once",
+)
+@click.option(
+    "--from",
+    "source",
+    default="suffix",
+    type=click.Choice(list(LAYOUTS)),
+    help="Layout the branch data is stored in",
+)
+@click.option(
+    "--to",
+    "target",
+    default="prefix",
+    type=click.Choice(list(LAYOUTS)),
+    help="Layout to move the branch data to",
+)
+@click.option(
+    "--root",
+    default="data",
+    type=str,
+    help="Data root of the prefix layout",
+)
+@click.option(
+    "--dryrun",
+    default=False,
+    is_flag=True,
+    help="Report the paths that would be moved without moving them.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    default=8,
+    type=int,
+    help="Number of datasets listed, and paths moved, at once",
+)
+@click.option(
+    "--session",
+    default=False,
+    is_flag=True,
+    help="Load the catalog through a full KedroSession instead of the catalog config.",
+)
+@cli.command()
+def migrate_layout(
+    directory: str = ".",
+    branches: tuple = (),
+    source: str = "suffix",
+    target: str = "prefix",
+    root: str = "data",
+    dryrun: bool = False,
+    jobs: int = 8,
+    session: bool = False,
+) -> None:
+    """Move branch data from one layout to another."""
+    report = _migrate(
+        directory=directory,
+        branches=branches,
+        source=source,
+        target=target,
+        root=root,
+        dryrun=dryrun,
+        jobs=jobs,
+        context=_context(directory, session),
+    )  # pragma: nocover
+    action = "would move" if dryrun else "moved"
+    click.echo(
+        f"steel-toes {action} {len(report.moved)} paths in {report.seconds:.2f}s"
+    )  # pragma: nocover
+
+
+@click.option(
+    "--directory",
+    "-d",
+    default=".",
+    type=click.Path(exists=False, file_okay=False),
+    help="Path to the kedro project",
+)
+@click.option(
+    "--base",
+    default="main",
+    type=str,
+    help="Branch to diff against the merge-base with",
+)
+@click.option(
+    "--pipeline",
+    "-p",
+    "pipeline_name",
+    default=None,
+    type=str,
+    help="Name of the pipeline to scope, defaults to __default__",
+)
+@click.option(
+    "--env", "-e", default=None, type=str, help="Kedro configuration environment"
+)
+@click.option(
+    "--dry-run",
+    "--dryrun",
+    "dryrun",
+    default=False,
+    is_flag=True,
+    help="Show the nodes that would run without running them.",
+)
+@cli.command()
+def run(
+    directory: str = ".",
+    base: str = "main",
+    pipeline_name: str = None,
+    env: str = None,
+    dryrun: bool = False,
+) -> None:
+    """Run only the nodes changed since the merge-base with base, and downstream."""
+    result = _run_scoped(
+        directory=directory,
+        base=base,
+        pipeline_name=pipeline_name,
+        env=env,
+        dryrun=dryrun,
+    )  # pragma: nocover
+    changed = set(result.changed)  # pragma: nocover
+    click.echo(
+        f"steel-toes {'would run' if dryrun else 'ran'} {len(result.nodes)} nodes, "
+        f"{len(changed)} changed since {result.merge_base[:10]}"
+    )  # pragma: nocover
+    for name in result.nodes:  # pragma: nocover
+        click.echo(f"  {'*' if name in changed else ' '} {name}")
+    if result.inputs:  # pragma: nocover
+        click.echo("loaded from branch, parent branch or base data")
+        for name in result.inputs:
+            click.echo(f"    {name}")
+
+
+@click.option(
+    "--directory",
+    "-d",
+    default=STATS_DIR,
+    type=click.Path(exists=False, file_okay=False),
+    help="Directory the run reports are written to",
+)
+@click.option(
+    "--last", "-n", default=5, type=int, help="Number of latest reports to summarise"
+)
+@click.option("--top", default=10, type=int, help="Number of slowest datasets to list")
+@cli.command()
+def stats(directory: str = STATS_DIR, last: int = 5, top: int = 10) -> None:
+    """Summarise the latest run reports written by the SteelToes hook."""
+    reports = read_reports(directory, last)
+    if not reports:
+        click.echo(f"steel-toes found no reports in {directory}")
+        return
+    for report in reports:
+        outcomes = report["outcomes"]
+        started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(report["started"]))
+        line = (
+            f"{started} {report.get('branch', '')}: "
+            f"{hook_seconds(report):.3f}s in hooks, "
+            f"{report['storage_calls']} storage calls, "
+            f"{outcomes['swapped']} swapped, {outcomes['skipped']} skipped, "
+            f"{outcomes['ignored']} ignored"
+        )
+        cache = report.get("cache")
+        if cache and cache["hits"] + cache["misses"]:
+            hit_rate = cache["hits"] / (cache["hits"] + cache["misses"])
+            line += f", {hit_rate:.0%} cache hits"
+        click.echo(line)
+
+    latest = reports[-1]
+    click.echo("\nhooks of the latest run")
+    for name, timing in sorted(
+        latest["hooks"].items(), key=lambda h: h[1]["seconds"], reverse=True
+    ):
+        click.echo(f"  {timing['seconds']:.3f}s {timing['calls']:>6} x {name}")
+
+    click.echo(f"\nslowest datasets over {len(reports)} runs")
+    for path, seconds in slowest(reports, top):
+        click.echo(f"  {seconds * 1000:.1f}ms {path}")
+
+    slowdown = regression(reports)
+    if slowdown is not None and slowdown > 1.5:
+        click.echo(f"\nthe latest run was {slowdown:.1f}x slower than the median run")
@@ -0,0 +1,173 @@
+"""
+Deduplication of branched datasets identical to their base.
+
+Most nodes on a feature branch save exactly the same bytes as main.  Once a
+branched dataset is saved its content is compared with the base, and when
+they match the branched copy is dropped, or replaced by a hardlink on local
+disk, so the branch only stores and reads what it really changed.
+
+Saving truncates a file in place, which would write through a hardlink onto
+the base, so a hardlinked branch file is unlinked before it is saved again.
+"""
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+from urllib.parse import quote
+
+from steel_toes.protected import PROTECTED
+
+DEDUP = ["drop", "hardlink"]
+DEDUP_DIR = ".steel_toes/dedup"
+
+
+def file_digest(fs: Any, path: str, chunk_size: int = 2**20) -> str:
+    """Hash the content of path in chunks, without reading it all into memory.
+
+    Directories, such as spark output, hash the relative path and content of
+    every file inside them.
+    """
+    digest = hashlib.sha256()
+    if fs.isdir(path):
+        root = fs._strip_protocol(path).rstrip("/")
+        for file in sorted(fs.find(path)):
+            digest.update(file[len(root) :].encode())
+            digest.update(file_digest(fs, file, chunk_size).encode())
+        return digest.hexdigest()
+    with fs.open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def same_content(
+    fs: Any, path: str, other: str, chunk_size: int = 2**20
+) -> Optional[str]:
+    """Compare two paths in chunks, stopping at the first difference.
+
+    Sizes are compared first so most changed files are never read.
+
+    Returns: sha256 of the content when both are identical, otherwise None.
+    """
+    if fs.isdir(path) or fs.isdir(other):
+        digest = file_digest(fs, path, chunk_size)
+        return digest if digest == file_digest(fs, other, chunk_size) else None
+    if fs.size(path) != fs.size(other):
+        return None
+    digest = hashlib.sha256()
+    with fs.open(path, "rb") as f, fs.open(other, "rb") as g:
+        while True:
+            chunk = f.read(chunk_size)
+            if chunk != g.read(chunk_size):
+                return None
+            if not chunk:
+                return digest.hexdigest()
+            digest.update(chunk)
+
+
+def dedup_dataset(d: Any, mode: str = "drop", drop: bool = True) -> Optional[str]:
+    """Drop, or hardlink, the branched copy of d when it matches the base.
+
+    Dropping swaps d back to its base filepath, so the rest of the run reads
+    the shared copy.  Hardlinks need local files, anything else is dropped,
+    unless drop is False, then it is kept.
+
+    Returns: sha256 of the shared content when d was deduplicated.
+    """
+    if not hasattr(d, "_filepath_swapped") or getattr(d, "_version", None):
+        # versioned datasets hold a new version every save, never a copy
+        return None
+    fs = d._fs
+    branched, base = str(d._filepath), str(d._filepath_base)
+    hardlink = mode == "hardlink" and getattr(d, "_protocol", None) == "file"
+    if not (drop or hardlink):
+        return None
+    try:
+        digest = same_content(fs, branched, base)
+    except FileNotFoundError:
+        return None
+    if digest is None:
+        return None
+
+    if hardlink and not fs.isdir(branched):
+        tmp = f"{branched}.steel_toes_link"
+        try:
+            os.link(base, tmp)
+            os.replace(tmp, branched)
+            return digest
+        except OSError:
+            # another device, or a filesystem without hardlinks
+            pass
+    if not drop:
+        return None
+    fs.rm(branched, recursive=True)
+    d._filepath = d._filepath_base
+    del d._filepath_swapped
+    PROTECTED.forget(d)
+    return digest
+
+
+def unshare(d: Any) -> bool:
+    """Unlink the branched file of d when it is a hardlink to its base.
+
+    Returns: whether the file was unlinked, the next save writes a new one.
+    """
+    if not hasattr(d, "_filepath_swapped") or getattr(d, "_protocol", None) != "file":
+        return False
+    branched, base = str(d._filepath), str(d._filepath_base)
+    try:
+        if not os.path.samefile(branched, base):
+            return False
+        os.unlink(branched)
+    except OSError:
+        # nothing saved on the branch yet
+        return False
+    return True
+
+
+class Equivalences:
+    """Record of the branched datasets found identical to their base.
+
+    Arguments:
+        directory (Path): directory that the records are kept in.
+        branch (str): git branch the record belongs to.
+    """
+
+    def __init__(self, directory: Union[str, Path], branch: str) -> None:
+        """Initialize a record, nothing is read until it is needed."""
+        self.directory = Path(directory)
+        self.branch = branch
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> Path:
+        """Path to the record of this branch."""
+        return self.directory / f"{quote(self.branch, safe='')}.json"
+
+    def read(self) -> Dict[str, Dict[str, str]]:
+        """Read the record, mapping dataset names to the paths found equal."""
+        try:
+            return json.loads(self.path.read_text())["datasets"]
+        except FileNotFoundError:
+            return {}
+
+    def record(
+        self, dataset: str, branched: Any, base: Any, digest: str, mode: str
+    ) -> None:
+        """Record that the branched copy of dataset was identical to base."""
+        with self._lock:
+            datasets = self.read()
+            datasets[dataset] = {
+                "branched": str(branched),
+                "base": str(base),
+                "sha256": digest,
+                "mode": mode,
+            }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+            tmp.write_text(
+                json.dumps({"branch": self.branch, "datasets": datasets}, indent=2)
+            )
+            os.replace(tmp, self.path)
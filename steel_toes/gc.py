@@ -0,0 +1,340 @@
+"""
+Garbage collection of data left behind by old branches.
+
+Each catalog data directory is listed once, files named like a branched
+dataset (`<stem>_<branch><suffix>`) are matched against the live git refs, and
+everything belonging to branches that no longer exist, or that were merged
+into a base branch, is removed in bulk.  In the prefix layout the branches
+directory of each data root is listed as well, every prefix in it is a
+branch and is removed as a whole.
+
+A name alone does not prove a file is branch data, `iris_v2.csv` may be a
+dataset of its own.  Paths are only removed when the branch they are named
+after is one git remembers, in the reflogs, when a manifest or an earlier run
+recorded them, or when they are in the prefix layout.  Every other path is
+reported as unproven and left alone.
+
+The state file keeps the listing of every directory along with its
+modification time, a directory that has not changed since is not listed
+again.  Filesystems without directory modification times, such as object
+stores, list every directory on every run.
+"""
+import json
+import subprocess
+from pathlib import Path, PurePosixPath
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple, Union
+
+from steel_toes.git import find_git_dir, read_head, read_refs, reflog_branches
+from steel_toes.layout import Layout, current_layout, prefix_branch
+from steel_toes.probe import _map
+from steel_toes.remove import RemoveSummary, Target, remove_paths
+from steel_toes.steel_toes import base_paths, load_catalog, logger
+
+Base = Tuple[Any, str]
+
+
+class GcReport(NamedTuple):
+    """Branched paths found by gc, keyed by the branch that produced them.
+
+    unproven paths are named like branch data of a branch that is gone, with
+    nothing to prove they are, and are never removed.
+    """
+
+    orphans: Dict[str, List[str]]
+    kept: Dict[str, List[str]]
+    summary: RemoveSummary
+    unproven: Dict[str, List[str]]
+
+
+def live_branches(
+    directory: Union[str, Path] = ".", base: Optional[str] = None
+) -> Tuple[Set[str], Set[str]]:
+    """Read the live branches, and the ones merged into base, in one pass.
+
+    Local branches and remote tracking branches are both live, a teammates
+    branch only needs to be pushed to keep its data.
+
+    Returns: (live, merged) branch names.
+    """
+    git_dir = find_git_dir(directory)
+    if git_dir is None:
+        raise RuntimeError(f"{directory} is not in a git repository")
+    live = set()
+    for ref in read_refs(git_dir):
+        if ref.startswith("refs/heads/"):
+            live.add(ref[len("refs/heads/") :])
+        elif ref.startswith("refs/remotes/"):
+            live.add(ref[len("refs/remotes/") :].partition("/")[2])
+    live.discard("HEAD")
+
+    merged: Set[str] = set()
+    if base is not None:
+        res = subprocess.check_output(
+            ["git", "for-each-ref", f"--merged={base}", "--format=%(refname)"]
+            + ["refs/heads", "refs/remotes"],
+            cwd=str(directory),
+        )
+        for ref in res.decode().split():
+            if ref.startswith("refs/heads/"):
+                merged.add(ref[len("refs/heads/") :])
+            elif ref.startswith("refs/remotes/"):
+                merged.add(ref[len("refs/remotes/") :].partition("/")[2])
+        # the base, and the branch being worked on, are never collected
+        merged -= {base, read_head(directory), "HEAD"}
+    return live, merged
+
+
+def parse_branch(name: str, stems: List[Tuple[str, str]]) -> Optional[str]:
+    """Parse the branch out of a branched file name.
+
+    The longest matching stem wins, so `iris_raw_bob.csv` belongs to branch
+    `bob` of `iris_raw.csv` rather than branch `raw_bob` of `iris.csv`.
+    """
+    for stem, suffix in sorted(stems, key=lambda s: len(s[0]), reverse=True):
+        prefix = f"{stem}_"
+        if (
+            name.startswith(prefix)
+            and name.endswith(suffix)
+            and len(name) > len(prefix) + len(suffix)
+        ):
+            return name[len(prefix) : len(name) - len(suffix)]
+    return None
+
+
+def _list_directory(directory: Tuple[Any, str]) -> List[str]:
+    """List every path directly inside directory, or directories like `root/*`."""
+    fs, path = directory
+    if "*" in path:
+        return [str(p).rstrip("/") for p in fs.glob(f"{path}/*")]
+    try:
+        return [str(p).rstrip("/") for p in fs.ls(path, detail=False)]
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+
+def _modified(fs: Any, path: str) -> Optional[float]:
+    """Modification time of directory path, None when the filesystem has none."""
+    try:
+        info = fs.info(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    if info.get("type") != "directory":
+        return None
+    return info.get("mtime")
+
+
+def list_directories(
+    directories: List[Tuple[Any, str]],
+    jobs: int = 1,
+    listings: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> List[List[str]]:
+    """List every directory, reusing the listings of unchanged directories.
+
+    Arguments:
+        directories (List): (filesystem, directory) to list.
+        jobs (int): Number of directories listed at once.
+        listings (Dict): {directory url: {"mtime", "paths"}} of earlier runs,
+            updated in place.  None lists every directory.
+
+    Returns: the paths in each directory, in order.
+    """
+    if listings is None:
+        return _map(_list_directory, directories, jobs)
+
+    def list_directory(directory: Tuple[Any, str]) -> Tuple[str, Dict[str, Any]]:
+        fs, path = directory
+        key = fs.unstrip_protocol(path)
+        cached = listings.get(key)
+        if "*" in path or (cached is not None and cached["mtime"] is None):
+            # nothing tells whether the directory changed
+            return key, {"mtime": None, "paths": _list_directory(directory)}
+        # read before listing, a change made while listing is found next run
+        mtime = _modified(fs, path)
+        if mtime is not None and cached is not None and cached["mtime"] == mtime:
+            return key, cached
+        return key, {"mtime": mtime, "paths": _list_directory(directory)}
+
+    listed = _map(list_directory, directories, jobs)
+    listings.update(listed)
+    return [listing["paths"] for _, listing in listed]
+
+
+def find_branched(
+    bases: List[Base],
+    jobs: int = 1,
+    listings: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> Dict[str, Tuple[Any, str]]:
+    """Find every branched path next to bases with one listing per directory.
+
+    Arguments:
+        bases (List): (filesystem, base path) of the catalog datasets.
+        jobs (int): Number of directories listed at once.
+        listings (Dict): listings of earlier runs, see `list_directories`.
+
+    Returns: {path: (filesystem, branch)}
+    """
+    directories: Dict[Tuple[str, str], Tuple[Any, str]] = {}
+    stems: Dict[Tuple[str, str], List[Tuple[str, str]]] = {}
+    base_names: Dict[Tuple[str, str], Set[str]] = {}
+    for fs, path in bases:
+        base = PurePosixPath(path)
+        key = (str(fs.protocol), str(base.parent))
+        directories.setdefault(key, (fs, str(base.parent)))
+        stems.setdefault(key, []).append((base.stem, base.suffix))
+        base_names.setdefault(key, set()).add(base.name)
+
+    branched = {}
+    found = list_directories(list(directories.values()), jobs, listings)
+    for key, listing in zip(directories, found):
+        fs = directories[key][0]
+        for path in listing:
+            name = PurePosixPath(path).name
+            if name in base_names[key]:
+                continue
+            branch = parse_branch(name, stems[key])
+            if branch is not None:
+                branched[path] = (fs, branch)
+    return branched
+
+
+def read_manifests(directory: Union[str, Path, None]) -> Set[str]:
+    """Read the branched paths recorded by the manifests of every branch."""
+    if directory is None:
+        return set()
+    paths = set()
+    for manifest in Path(directory).glob("*.json"):
+        try:
+            paths.update(json.loads(manifest.read_text())["datasets"].values())
+        except (ValueError, KeyError):
+            logger.warning(f"STEEL_TOES:gc | could not read manifest '{manifest}'")
+    return paths
+
+
+def find_prefixed(
+    bases: List[Base],
+    layout: Layout,
+    jobs: int = 1,
+    listings: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> Dict[str, Tuple[Any, str]]:
+    """Find the prefix of every branch with one listing per data root.
+
+    Returns: {prefix: (filesystem, branch)}
+    """
+    directories: Dict[Tuple[str, str], Tuple[Any, str]] = {}
+    for fs, path in bases:
+        branches = None if "*" in path else layout.branches(path)
+        if branches is not None:
+            directories.setdefault((str(fs.protocol), branches), (fs, branches))
+
+    found = list_directories(list(directories.values()), jobs, listings)
+    return {
+        prefix: (fs, prefix_branch(prefix))
+        for (fs, _), listing in zip(directories.values(), found)
+        for prefix in listing
+    }
+
+
+def read_state(path: Optional[Path]) -> Tuple[Dict[str, str], Dict[str, Any]]:
+    """Read the paths of live branches and the listings an earlier run kept.
+
+    State files written before listings were kept only hold the paths.
+
+    Returns: ({path: branch}, {directory url: {"mtime", "paths"}})
+    """
+    if path is None or not path.exists():
+        return {}, {}
+    state = json.loads(path.read_text())
+    if "kept" not in state or "listings" not in state:
+        return state, {}
+    return state["kept"], state["listings"]
+
+
+def gc(
+    directory: Union[str, Path] = ".",
+    base: Optional[str] = None,
+    dryrun: bool = False,
+    state: Union[str, Path, None] = None,
+    jobs: int = 1,
+    bases: Optional[List[Base]] = None,
+    context=None,
+    manifest: Union[str, Path, None] = None,
+    size: bool = False,
+) -> GcReport:
+    """Remove data left behind by branches that no longer exist.
+
+    Arguments:
+        directory (Path): directory of kedro project. Defaults to '.'
+        base (str): also collect branches merged into base. Defaults to None,
+            only collecting branches that no longer exist.
+        dryrun (bool): Report what would be removed without removing it.
+        state (Path): json file recording the paths of live branches, proof
+            that they are branch data once the branch is gone, and the
+            listing of every directory, so that directories that have not
+            changed are not listed again.  Relative to directory.
+        jobs (int): Number of directories listed, and batches deleted, at once.
+        bases (List): (filesystem, base path) of datasets, read from the
+            catalog when not given.
+        manifest (Path): directory of the branch manifests kept by the hook,
+            the paths they record are branch data.
+        size (bool): Also count the files and bytes under removed
+            directories, dry runs always count them.
+
+    Returns: GcReport of orphaned, kept and unproven paths by branch.
+    """
+    live, merged = live_branches(directory, base)
+    git_dir = find_git_dir(directory)
+    known = live | (set() if git_dir is None else reflog_branches(git_dir))
+    if bases is None:
+        bases = base_paths(load_catalog(context), versions=True)
+    state_path = None if state is None else Path(directory) / state
+    recorded: Set[str] = read_manifests(manifest)
+    live_paths, listings = read_state(state_path)
+    recorded.update(live_paths)
+
+    orphans: Dict[str, List[str]] = {}
+    kept: Dict[str, List[str]] = {}
+    unproven: Dict[str, List[str]] = {}
+    targets: List[Target] = []
+    found = find_branched(bases, jobs, listings)
+    layout = current_layout()
+    if layout.prefixed:
+        prefixed = find_prefixed(bases, layout, jobs, listings)
+        found.update(prefixed)
+        recorded.update(prefixed)
+    for path, (fs, branch) in sorted(found.items()):
+        if branch in live and branch not in merged:
+            kept.setdefault(branch, []).append(path)
+        elif branch in known or path in recorded:
+            orphans.setdefault(branch, []).append(path)
+            targets.append((fs, path))
+        else:
+            unproven.setdefault(branch, []).append(path)
+
+    for branch, paths in orphans.items():
+        reason = "merged" if branch in merged else "deleted"
+        logger.info(f"STEEL_TOES:gc | {reason} branch '{branch}' {len(paths)} paths")
+    for branch, paths in unproven.items():
+        for path in paths:
+            logger.warning(
+                f"STEEL_TOES:gc | '{path}' is named like data of branch "
+                f"'{branch}', which git does not remember, kept"
+            )
+    summary = remove_paths(targets, dryrun=dryrun, jobs=jobs, size=size)
+
+    if state_path is not None and not dryrun:
+        # directories something was removed from are listed again
+        for fs, path in targets:
+            listings.pop(fs.unstrip_protocol(str(PurePosixPath(path).parent)), None)
+        state_path.parent.mkdir(parents=True, exist_ok=True)
+        state_path.write_text(
+            json.dumps(
+                {
+                    "kept": {
+                        p: branch for branch, paths in kept.items() for p in paths
+                    },
+                    "listings": listings,
+                },
+                indent=2,
+            )
+        )
+    return GcReport(orphans=orphans, kept=kept, summary=summary, unproven=unproven)
@@ -0,0 +1,239 @@
+"""
+Pure python git lookups for steel toes.
+
+Reading `.git/HEAD` directly is much cheaper than forking `git`, which matters
+because the branch is resolved every time a kedro command starts.  Worktrees
+and submodules keep a `.git` file pointing to their real git directory, refs
+may be loose files or packed into `packed-refs`.  Only walking the commit
+graph for the ancestry of a branch runs `git`, once.
+"""
+import os
+import subprocess
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+_GIT_DIRS: Dict[str, Optional[Path]] = {}
+_HEADS: Dict[Path, Tuple[Tuple[int, int, int], str]] = {}
+
+
+def clear_cache() -> None:
+    """Forget every cached git directory and HEAD."""
+    _GIT_DIRS.clear()
+    _HEADS.clear()
+
+
+def _read_gitfile(gitfile: Path) -> Optional[Path]:
+    """Follow a `.git` file used by worktrees and submodules to the git dir."""
+    content = gitfile.read_text().strip()
+    if not content.startswith("gitdir:"):
+        return None
+    git_dir = Path(content[len("gitdir:") :].strip())
+    if not git_dir.is_absolute():
+        git_dir = gitfile.parent / git_dir
+    return git_dir.resolve()
+
+
+def find_git_dir(proj_dir: Union[str, Path, None] = None) -> Optional[Path]:
+    """Find the git directory of the repository containing proj_dir.
+
+    Results are cached per proj_dir.  A directory outside of any repository is
+    looked up again every time, `git init` may have run since.
+
+    Returns: git directory or None when proj_dir is not in a git repository.
+    """
+    start = Path(proj_dir or Path.cwd()).absolute()
+    key = str(start)
+    if key in _GIT_DIRS:
+        return _GIT_DIRS[key]
+    git_dir = None
+    for directory in (start, *start.parents):
+        dotgit = directory / ".git"
+        try:
+            if dotgit.is_dir():
+                if (dotgit / "HEAD").is_file():
+                    git_dir = dotgit
+                break
+            if dotgit.is_file():
+                git_dir = _read_gitfile(dotgit)
+                break
+        except OSError:
+            break
+    if git_dir is not None:
+        _GIT_DIRS[key] = git_dir
+    return git_dir
+
+
+def common_dir(git_dir: Path) -> Path:
+    """Get the directory shared refs live in, worktrees point to it."""
+    try:
+        common = (git_dir / "commondir").read_text().strip()
+    except FileNotFoundError:
+        return git_dir
+    return (git_dir / common).resolve()
+
+
+def read_head(proj_dir: Union[str, Path, None] = None) -> Optional[str]:
+    """Read the current branch from HEAD without running git.
+
+    Matches `git rev-parse --abbrev-ref HEAD`, a detached HEAD is reported as
+    "HEAD".  HEAD is cached and only read again when it changes.
+
+    Returns: Git branch or None when there is no git repository.
+    """
+    git_dir = find_git_dir(proj_dir)
+    if git_dir is None:
+        return None
+    head = git_dir / "HEAD"
+    try:
+        # git replaces HEAD on every change, so the inode changes even when
+        # the mtime resolution of the filesystem is too coarse to notice
+        stat = head.stat()
+        signature = (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+        cached = _HEADS.get(head)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        content = head.read_text().strip()
+    except OSError:
+        return None
+    if content.startswith("ref:"):
+        ref = content[len("ref:") :].strip()
+        branch = ref[len("refs/heads/") :] if ref.startswith("refs/heads/") else ref
+    else:
+        branch = "HEAD"
+    _HEADS[head] = (signature, branch)
+    return branch
+
+
+def _packed_refs(git_dir: Path) -> Dict[str, str]:
+    """Read packed-refs into {ref: sha}."""
+    refs = {}
+    try:
+        lines = (common_dir(git_dir) / "packed-refs").read_text().splitlines()
+    except FileNotFoundError:
+        return refs
+    for line in lines:
+        if not line or line.startswith(("#", "^")):
+            continue
+        sha, _, ref = line.partition(" ")
+        refs[ref.strip()] = sha
+    return refs
+
+
+def resolve_ref(git_dir: Path, ref: str) -> Optional[str]:
+    """Resolve ref such as "refs/heads/main" to a commit sha."""
+    for directory in (git_dir, common_dir(git_dir)):
+        try:
+            content = (directory / ref).read_text().strip()
+        except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+            continue
+        if content.startswith("ref:"):
+            return resolve_ref(git_dir, content[len("ref:") :].strip())
+        return content
+    return _packed_refs(git_dir).get(ref)
+
+
+def read_refs(
+    git_dir: Path, prefixes: Iterable[str] = ("refs/heads/", "refs/remotes/")
+) -> Dict[str, str]:
+    """Read every ref under prefixes in one pass over loose and packed refs.
+
+    Returns: {ref: sha}
+    """
+    prefixes = tuple(prefixes)
+    refs = {
+        ref: sha
+        for ref, sha in _packed_refs(git_dir).items()
+        if ref.startswith(prefixes)
+    }
+    root = common_dir(git_dir)
+    for prefix in prefixes:
+        for dirpath, _, filenames in os.walk(root / prefix):
+            for filename in filenames:
+                path = Path(dirpath) / filename
+                ref = path.relative_to(root).as_posix()
+                content = path.read_text().strip()
+                if not content.startswith("ref:"):
+                    refs[ref] = content
+    return refs
+
+
+def branch_name(ref: str) -> Optional[str]:
+    """Branch name of a local or remote tracking ref, None for anything else."""
+    if ref.startswith("refs/heads/"):
+        return ref[len("refs/heads/") :]
+    if ref.startswith("refs/remotes/"):
+        name = ref[len("refs/remotes/") :].partition("/")[2]
+        return None if name == "HEAD" else name
+    return None
+
+
+def reflog_branches(git_dir: Path) -> Set[str]:
+    """Read every branch the reflogs remember, including deleted ones.
+
+    Deleting a branch removes its own reflog, but every checkout of it stays
+    in the reflog of HEAD, as `checkout: moving from <a> to <b>`.
+
+    Returns: branch names.
+    """
+    root = common_dir(git_dir)
+    branches = set()
+    for prefix in ("refs/heads/", "refs/remotes/"):
+        for dirpath, _, filenames in os.walk(root / "logs" / prefix):
+            for filename in filenames:
+                ref = (Path(dirpath) / filename).relative_to(root / "logs")
+                name = branch_name(ref.as_posix())
+                if name is not None:
+                    branches.add(name)
+    for log in {git_dir / "logs" / "HEAD", root / "logs" / "HEAD"}:
+        try:
+            lines = log.read_text().splitlines()
+        except FileNotFoundError:
+            continue
+        for line in lines:
+            _, _, message = line.partition("\t")
+            if message.startswith("checkout: moving from "):
+                moved = message[len("checkout: moving from ") :]
+                branches.update(moved.split(" to ", 1))
+    branches.discard("HEAD")
+    return branches
+
+
+def ancestry(
+    proj_dir: Union[str, Path, None] = None,
+    branch: Optional[str] = None,
+    base: str = "main",
+) -> List[str]:
+    """Get the feature branches that branch was branched off, nearest first.
+
+    The commits of branch that are not on base are listed by a single
+    `git rev-list`, every other local or remote tracking branch whose tip is
+    one of them is a parent.  Parents are ordered by how far back their tip
+    is.  Branches pointing at the same commit as branch are not parents, a
+    branch just created off branch has the same tip.
+
+    Returns: parent branch names, empty when branch or base is not a branch
+    of the repository.
+    """
+    git_dir = find_git_dir(proj_dir)
+    branch = branch or read_head(proj_dir)
+    if git_dir is None or not branch or branch == base:
+        return []
+    try:
+        res = subprocess.check_output(
+            ["git", "rev-list", "--topo-order", branch, f"^{base}", "--"],
+            cwd=str(proj_dir or Path.cwd()),
+            stderr=subprocess.DEVNULL,
+        )
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return []
+    shas = res.decode().split()
+    distance = {sha: i for i, sha in enumerate(shas)}
+
+    parents: Dict[str, int] = {}
+    for ref, sha in read_refs(git_dir).items():
+        name = branch_name(ref)
+        # the tip is listed first, only commits behind it are strict ancestors
+        if name in (None, branch, base) or distance.get(sha, 0) == 0:
+            continue
+        parents[name] = min(distance[sha], parents.get(name, distance[sha]))
+    return sorted(parents, key=lambda name: (parents[name], name))
@@ -18,22 +18,55 @@ need to use a bit of an unconventional method to initialize your hooks.
 
 """
 
+import functools
 import os
 
 from pathlib import Path
-from typing import Any, Dict, Union
+from typing import Any, Callable, Dict, Optional, Tuple, Union
 
 from kedro.framework.hooks import hook_impl
 from kedro.io.data_catalog import DataCatalog
 from kedro.pipeline import Pipeline
 
-from steel_toes.steel_toes import announce_protection, get_current_branch, inject_branch
+from steel_toes.cache import ExistenceCache
+from steel_toes.dedup import DEDUP, DEDUP_DIR, Equivalences, dedup_dataset, unshare
+from steel_toes.git import ancestry
+from steel_toes.manifest import Manifest
+from steel_toes.once import OncePerKey
+from steel_toes.probe import PROBES
+from steel_toes.protected import PROTECTED
+from steel_toes.resolution import TABLE_ATTR, ResolutionTable, is_parallel
+from steel_toes.stats import Stats
+from steel_toes.steel_toes import (
+    _swap,
+    announce_protection,
+    branched_paths,
+    get_current_branch,
+    inject_branch,
+    inject_branches,
+    inherited,
+    is_swapped,
+    logger,
+)
 from rich.console import Console
 
 from typing import List
 
 console = Console()
 
+RESOLUTIONS = ["catalog", "on_demand", "pipeline"]
+
+
+def _timed(method: Callable) -> Callable:
+    """Record the wall time of a hook, and the storage calls it makes."""
+
+    @functools.wraps(method)
+    def timed(self: "SteelToes", *args: Any, **kwargs: Any) -> Any:
+        with self.stats.hook(method.__name__):
+            return method(self, *args, **kwargs)
+
+    return timed
+
 
 class SteelToes:
     """Steel Toes Kedro Hook.
@@ -43,6 +76,37 @@ class SteelToes:
     Arguments:
         context (KedroContext): ProjectContext for your kedro project
         announce (bool): Announces protected datasets on startup. Default False
+        ignore_types (List): Dataset types that should never be branched.
+        workers (int): Number of threads used to check if branched datasets
+            exist. Default 1 checks each dataset one at a time.
+        probe (str): How to check if branched datasets exist.  "exists" calls
+            each datasets own `_exists()`, "listing" lists each data directory
+            once, "async" gathers checks on async filesystems such as s3fs
+            with at most `workers` (or 64) in flight.  Default "exists".
+        manifest (Path): Directory to keep a manifest of branched datasets in.
+            When set, datasets are swapped from the manifest without checking
+            storage, and every branched save is recorded in it.  Default None.
+        cache_size (int): Number of existence checks to remember across hooks
+            and runs in the same process.  Default 0 disables the cache.
+        cache_ttl (float): Seconds to remember existence checks for.  Default
+            None remembers them until evicted or the dataset is saved.
+        resolution (str): When datasets are resolved.  "catalog" resolves the
+            whole catalog up front, "on_demand" resolves each dataset the
+            first time it is loaded or saved, "pipeline" only resolves the
+            inputs and plans the outputs of the pipeline being run.  Default
+            "catalog".
+        dedup (str): Compare each branched dataset with its base once it is
+            saved, and when they are identical "drop" the branched copy or
+            "hardlink" it to the base.  Default None keeps every copy.  With
+            ancestry and a parent branch, copies are only hardlinked.
+        stats (Path): Directory to write a json report of every run to, read
+            by `steel-toes stats`.  Timings and counters are always kept on
+            `SteelToes.stats`.  Default None writes no reports.
+        ancestry (bool): Load the data of the feature branches the branch was
+            branched off, nearest first, for datasets without branch data,
+            before falling back to base.  The parents are read from the git
+            commit graph once.  Default False only falls back to base.
+        base (str): Base branch the ancestry stops at.  Default "main".
     Example:
 
     To add SteelToes to your kedro>0.18.0 project add an instance of the
@@ -61,71 +125,411 @@ class SteelToes:
         branch: Union[str, None] = None,
         announce: bool = False,
         ignore_types: List = [],
+        workers: int = 1,
+        probe: str = "exists",
+        manifest: Union[str, Path, None] = None,
+        cache_size: int = 0,
+        cache_ttl: Optional[float] = None,
+        resolution: str = "catalog",
+        dedup: Optional[str] = None,
+        stats: Union[str, Path, None] = None,
+        ancestry: bool = False,
+        base: str = "main",
     ) -> None:
-        """Initialize a steel_toes kedro hook instance."""
-        project_path = Path(".")
-        console.log("init steel toes")
-        if branch is None:
-            branch = get_current_branch(
-                project_path
-                # self.context.project_path
-            )  # pragma: no cover
-        if branch is None:  # pragma: no cover
-            # branch is not mocked
-            self.branch = ""
-        else:
-            self.branch = branch
+        """Initialize a steel_toes kedro hook instance.
+
+        Nothing is resolved here, settings.py is imported by every kedro
+        command, including the ones that never create a catalog.  The branch
+        and whether steel toes is enabled are resolved on first use.
+        """
+        self._branch = branch
         self.announce = announce
         self.ignore_types = ignore_types
+        self.workers = workers
+        if probe not in PROBES:
+            raise ValueError(f"probe must be one of {', '.join(PROBES)}, got '{probe}'")
+        self.probe = probe
+        if resolution not in RESOLUTIONS:
+            raise ValueError(
+                f"resolution must be one of {', '.join(RESOLUTIONS)}, got '{resolution}'"
+            )
+        self.resolution = resolution
+        if dedup is not None and dedup not in DEDUP:
+            raise ValueError(f"dedup must be one of {', '.join(DEDUP)}, got '{dedup}'")
+        self.dedup = dedup
+        self._equivalences: Optional[Equivalences] = None
+        self.stats = Stats()
+        self._stats_dir = stats
+        self._manifest_dir = manifest
+        self._manifest: Optional[Manifest] = None
+        self.ancestry = ancestry
+        self.base = base
+        self._ancestors: Optional[List[str]] = None
+        self.cache = ExistenceCache(cache_size, cache_ttl) if cache_size else None
+        self._catalog = None
+        self._plan: Dict[str, Tuple[Any, Any]] = {}
+        self._table: Optional[ResolutionTable] = None
+        # ThreadRunner calls node hooks from many threads at once, every
+        # dataset is resolved once per run without a lock shared by all
+        self._once = OncePerKey()
+        self._lazy = OncePerKey()
+        self._disabled: Optional[bool] = None
+
+    @property
+    def branch(self) -> str:
+        """Branch to inject, resolved from the environment or git on first use."""
+        if self._branch is None:
+            branch = get_current_branch(Path("."))
+            # branch is not mocked
+            self._branch = "" if branch is None else branch  # pragma: no cover
+        return self._branch
+
+    @branch.setter
+    def branch(self, branch: str) -> None:
+        self._branch = branch
+
+    @property
+    def disabled(self) -> bool:
+        """Whether STEEL_TOES_ENABLED turns steel toes off, read on first use."""
+        if self._disabled is None:
+            enabled = os.environ.get("STEEL_TOES_ENABLED", "True")
+            self._disabled = enabled.lower() in ["false", "no", "n", "0"]
+        return self._disabled
+
+    @disabled.setter
+    def disabled(self, disabled: bool) -> None:
+        self._disabled = disabled
+
+    @property
+    def manifest(self) -> Optional[Manifest]:
+        """Manifest of the current branch, None unless a directory is set."""
+        if self._manifest is None and self._manifest_dir is not None:
+            self._lazy("manifest", self._open_manifest)
+        return self._manifest
+
+    def _open_manifest(self) -> None:
+        self._manifest = Manifest(self._manifest_dir, self.branch, self.ancestors)
+
+    @property
+    def ancestors(self) -> List[str]:
+        """Parent feature branches of the branch, nearest first, read from git once."""
+        if self._ancestors is None:
+            self._lazy("ancestors", self._read_ancestors)
+        return self._ancestors
+
+    def _read_ancestors(self) -> None:
+        if not self.ancestry or not self.branch:
+            self._ancestors = []
+            return
+        self._ancestors = ancestry(Path("."), self.branch, self.base)
+        if self._ancestors:
+            console.log(f"falling back to {' -> '.join(self._ancestors)}")
+
+    @property
+    def equivalences(self) -> Equivalences:
+        """Record of the datasets deduplicated on the current branch."""
+        if self._equivalences is None:
+            self._lazy("equivalences", self._open_equivalences)
+        return self._equivalences
 
-        enabled = os.environ.get("STEEL_TOES_ENABLED", "True")
-        self.disabled = enabled.lower() in ["false", "no", "n", "0"]
+    def _open_equivalences(self) -> None:
+        self._equivalences = Equivalences(DEDUP_DIR, self.branch)
+
+    @property
+    def _probe(self):
+        """Probe used to check if branched datasets exist."""
+        probe = PROBES[self.probe] if self.manifest is None else self.manifest.probe
+        if self.cache is not None:
+            return self.cache.wrap(probe)
+        return probe
+
+    @property
+    def _in_worker(self) -> bool:
+        """Whether this hook runs in a ParallelRunner worker process."""
+        return self._table is not None and self._table.in_worker
 
     @hook_impl
-    def before_pipeline_run(self, pipeline: Pipeline, catalog: DataCatalog) -> None:
+    @_timed
+    def before_pipeline_run(
+        self, run_params: Dict[str, Any], pipeline: Pipeline, catalog: DataCatalog
+    ) -> None:
         """Inject branch information `before_pipeline_run` if the dataset exists."""
         if self.disabled:
             return
-        for dataset in pipeline.all_inputs():
-            inject_branch(
+        self._catalog = catalog
+        self._once.clear()
+        parallel = is_parallel(run_params)
+        if self.resolution == "on_demand" and not parallel:
+            return
+        outcomes = inject_branches(
+            self.branch,
+            catalog,
+            pipeline.all_inputs(),
+            hook="before_pipeliene_run",
+            ignore_types=self.ignore_types,
+            workers=self.workers,
+            probe=self._probe,
+            ancestors=self.ancestors,
+        )
+        self.stats.count(outcomes)
+        if parallel:
+            # workers get a pickled copy of the catalog for every node and
+            # nothing they swap makes it back, so outputs are decided here too
+            outputs = [o for o in pipeline.all_outputs() if not self._swapped(o)]
+            self._table = ResolutionTable.resolve(
                 self.branch,
                 catalog,
-                dataset,
-                hook="before_pipeliene_run",
-                ignore_types=self.ignore_types,
+                outputs,
+                self.ignore_types,
+            )
+            self.stats.count({"swapped": sum(map(self._swapped, outputs))})
+            for output in outputs:
+                if output in self._table.paths:
+                    self._forget(output, self._table.paths[output])
+        elif self.resolution == "pipeline":
+            # outputs are swapped after_node_run, work out where to now so
+            # that nothing needs to be looked up while the pipeline runs
+            self._plan = branched_paths(
+                self.branch, catalog, pipeline.all_outputs(), self.ignore_types
             )
+            if self.announce:
+                announce_protection(catalog)
+
+    def _swapped(self, dataset: str) -> bool:
+        return is_swapped(getattr(self._catalog.datasets, dataset, None))
 
     @hook_impl
+    @_timed
     def after_catalog_created(self, catalog: DataCatalog) -> None:
         """Inject branch information `after_catalog_created` if the dataset exists."""
         if self.disabled:
             return
         console.log(f"on branch {self.branch}")
-        for dataset in catalog.list():
-            inject_branch(
-                self.branch,
-                catalog,
-                dataset,
-                hook="after_catalog_created",
-                ignore_types=self.ignore_types,
-            )
+        self._catalog = catalog
+        self._once.clear()
+        if self.resolution in ["on_demand", "pipeline"]:
+            return
+        outcomes = inject_branches(
+            self.branch,
+            catalog,
+            catalog.list(),
+            hook="after_catalog_created",
+            ignore_types=self.ignore_types,
+            workers=self.workers,
+            probe=self._probe,
+            ancestors=self.ancestors,
+        )
+        self.stats.count(outcomes)
         if self.announce:
             announce_protection(catalog)
 
     @hook_impl
+    @_timed
     def after_node_run(self, catalog: DataCatalog, outputs: Dict[str, Any]) -> None:
         """Inject branch information `after_node_run`.
 
         On first run of a branch it will create this will create the dataset
         """
-        if self.disabled:
+        if self.disabled or self.resolution == "on_demand" or self._in_worker:
             return
+        if self._catalog is not None and catalog is not self._catalog:
+            # runners save through a shallow copy of the catalog of the session
+            PROTECTED.share(catalog, self._catalog)
         for output in outputs:
+            self._inject_save(catalog, output, hook="after_node_run")
+
+    def _inject_save(self, catalog: DataCatalog, dataset: str, hook: str) -> None:
+        """Swap dataset to its branched filepath before it is saved, once per run."""
+        self._once(("save", dataset), self._swap_output, catalog, dataset, hook)
+
+    def _swap_output(self, catalog: DataCatalog, dataset: str, hook: str) -> None:
+        """Swap dataset to its branched filepath and forget whether it exists."""
+        d = getattr(catalog.datasets, dataset, None)
+        swapped = is_swapped(d)
+        planned = self._plan.pop(dataset, None)
+        if planned is not None and planned[0] is getattr(
+            catalog.datasets, dataset, None
+        ):
+            if not hasattr(planned[0], "_filepath_swapped") or inherited(
+                planned[0], self.branch
+            ):
+                _swap(
+                    *planned,
+                    hook=hook,
+                    dataset=dataset,
+                    branch=self.branch,
+                    catalog=catalog,
+                )
+        else:
             inject_branch(
                 self.branch,
                 catalog,
-                output,
+                dataset,
                 save_mode=True,
-                hook="after_node_run",
+                hook=hook,
                 ignore_types=self.ignore_types,
             )
+        if not swapped and is_swapped(d):
+            self.stats.count({"swapped": 1})
+        if self.cache is not None and hasattr(d, "_filepath"):
+            self.cache.invalidate(self.cache.key(d, d._filepath))
+
+    @hook_impl
+    @_timed
+    def before_dataset_loaded(self, dataset_name: str) -> None:
+        """Inject branch information the first time a dataset is loaded.
+
+        Only used with resolution="on_demand", the decision is memoised on the
+        dataset so each dataset is only resolved once.  Threads loading the
+        same dataset wait for the first to resolve it.
+        """
+        if (
+            self.disabled
+            or self.resolution != "on_demand"
+            or self._catalog is None
+            or self._in_worker
+        ):
+            return
+        d = getattr(self._catalog.datasets, dataset_name, None)
+        if d is None or hasattr(d, "_steel_toes_resolved"):
+            return
+        self._once(("load", dataset_name), self._resolve, dataset_name, d)
+
+    def _resolve(self, dataset_name: str, d: Any) -> None:
+        """Swap a dataset that is about to be loaded if its branch exists."""
+        outcomes = inject_branches(
+            self.branch,
+            self._catalog,
+            [dataset_name],
+            hook="before_dataset_loaded",
+            ignore_types=self.ignore_types,
+            probe=self._probe,
+            ancestors=self.ancestors,
+        )
+        self.stats.count(outcomes)
+        d._steel_toes_resolved = True
+
+    @hook_impl
+    @_timed
+    def before_dataset_saved(self, dataset_name: str) -> None:
+        """Inject branch information before a dataset is saved.
+
+        Only swaps with resolution="on_demand", otherwise `after_node_run` has
+        already swapped the outputs.  A branched file hardlinked to its base
+        by dedup is unlinked before every save, in workers too.
+        """
+        if self.disabled or self._catalog is None:
+            return
+        d = getattr(self._catalog.datasets, dataset_name, None)
+        if self.resolution == "on_demand" and not self._in_worker:
+            self._inject_save(self._catalog, dataset_name, hook="before_dataset_saved")
+            if d is not None:
+                d._steel_toes_resolved = True
+        unshare(d)
+
+    @hook_impl
+    @_timed
+    def before_node_run(self, catalog: DataCatalog) -> None:
+        """Apply the resolution table shipped along with the catalog to a worker.
+
+        Only used with ParallelRunner, the worker saves to the catalog it was
+        sent, so that is the catalog saves are reported from.
+        """
+        if self.disabled:
+            return
+        table = getattr(catalog, TABLE_ATTR, None)
+        if table is None or not table.in_worker:
+            return
+        self._table = table
+        self._catalog = catalog
+        table.apply(catalog)
+
+    @hook_impl
+    @_timed
+    def after_dataset_saved(self, dataset_name: str) -> None:
+        """Deduplicate and record branched datasets once they are saved.
+
+        Workers of a ParallelRunner report their saves to the parent instead,
+        which deduplicates and records them after the run.
+        """
+        if self.disabled or self._catalog is None:
+            return
+        d = getattr(self._catalog.datasets, dataset_name, None)
+        if self._in_worker:
+            if hasattr(d, "_filepath_swapped"):
+                self._table.report(dataset_name, d._filepath)
+            return
+        self._saved(dataset_name, d)
+
+    def _saved(self, dataset_name: str, d: Any) -> None:
+        """Deduplicate and record a branched dataset that was saved."""
+        if self.dedup is not None and hasattr(d, "_filepath_swapped"):
+            self._dedup(dataset_name, d)
+        if self.manifest is not None and hasattr(d, "_filepath_swapped"):
+            self.manifest.record(dataset_name, d._filepath)
+
+    @hook_impl
+    @_timed
+    def after_pipeline_run(self) -> None:
+        """Collect saves made in workers, and write the report of the run."""
+        if self.disabled:
+            return
+        if self._table is not None and not self._in_worker:
+            for save in self._table.collect():
+                d = getattr(self._catalog.datasets, save["dataset"], None)
+                self._forget(save["dataset"], save["path"])
+                self._saved(save["dataset"], d)
+            self._table = None
+        if self._stats_dir is not None:
+            self.stats.write(self._stats_dir, **self._report_context())
+
+    @hook_impl
+    @_timed
+    def on_pipeline_error(self) -> None:
+        """Discard the saves reported by workers of a run that failed."""
+        if self.disabled:
+            return
+        if self._table is not None and not self._in_worker:
+            self._table.discard()
+            self._table = None
+
+    def _forget(self, dataset: str, path: Any) -> None:
+        """Forget whether the branched path of dataset exists, it is written."""
+        if self.cache is not None and self._catalog is not None:
+            d = getattr(self._catalog.datasets, dataset, None)
+            self.cache.invalidate(self.cache.key(d, path))
+
+    def _report_context(self) -> Dict[str, Any]:
+        """Settings and cache counters written along with the stats."""
+        return {
+            "branch": self.branch,
+            "resolution": self.resolution,
+            "probe": self.probe if self.manifest is None else "manifest",
+            "workers": self.workers,
+            "cache": None if self.cache is None else self.cache.info(),
+        }
+
+    def report(self) -> Dict[str, Any]:
+        """Timings and counters of the hooks so far, with cache hit rates."""
+        return self.stats.report(**self._report_context())
+
+    def _dedup(self, dataset_name: str, d: Any) -> None:
+        """Drop or hardlink the branched copy of d if it is identical to base."""
+        branched = d._filepath
+        # without its branch copy the next run loads the data of the first
+        # parent branch that has any, which may differ from base, so copies
+        # are only ever hardlinked while the branch has parents
+        digest = dedup_dataset(d, self.dedup, drop=not self.ancestors)
+        if digest is None:
+            return
+        mode = "hardlink" if hasattr(d, "_filepath_swapped") else "drop"
+        logger.info(
+            f"STEEL_TOES:dedup '{branched.stem}{branched.suffix}' is identical to "
+            f"'{d._filepath_base.stem}{d._filepath_base.suffix}', {mode}"
+        )
+        self.equivalences.record(dataset_name, branched, d._filepath_base, digest, mode)
+        if mode == "drop":
+            if self.manifest is not None:
+                self.manifest.forget(dataset_name)
+            if self.cache is not None:
+                self.cache.set(self.cache.key(d, branched), False)
@@ -0,0 +1,171 @@
+"""
+Layouts of branched data in storage.
+
+The "suffix" layout keeps branched data next to the base data, injecting the
+branch into each name, `data/02_intermediate/iris_bob.csv`.  The "prefix"
+layout keeps every branched path of a branch under one prefix of the data
+root, `data/branches/bob/02_intermediate/iris.csv`, so finding, sizing,
+removing or promoting the data of a branch is one recursive listing of one
+prefix instead of a listing of every data directory.
+
+    >>> from steel_toes import use_layout
+    >>> use_layout("prefix", root="data")
+
+The layout is read from the `STEEL_TOES_LAYOUT` and `STEEL_TOES_LAYOUT_ROOT`
+environment variables on first use, which the `steel-toes` commands honour
+as well, unless `use_layout` is called first.
+"""
+import os
+from pathlib import PurePosixPath
+from typing import Any, Optional, Tuple, Union
+from urllib.parse import quote, unquote
+
+BRANCHES = "branches"
+
+
+def branch_filepath(filepath: Any, branch: str) -> Any:
+    """Inject branch in between the stem and suffix of filepath.
+
+    Example:
+    "data/02_intermediate/iris.csv" -> "data/02_intermediate/iris_main.csv"
+
+    """
+    branchstr = branch if branch == "" else f"_{branch}"
+    return filepath.parent / f"{filepath.stem}{branchstr}{filepath.suffix}"
+
+
+class SuffixLayout:
+    """Branched data next to the base data, with the branch in each name."""
+
+    name = "suffix"
+    prefixed = False
+
+    def file(self, filepath: Any, branch: str) -> Any:
+        """Branched path of a single file, of the same type as filepath."""
+        return branch_filepath(filepath, branch)
+
+    def directory(self, path: str, branch: str) -> str:
+        """Branched path of a directory of partitions.
+
+        Example:
+        "data/01_raw/partitions/" -> "data/01_raw/partitions_main"
+
+        """
+        path = path.rstrip("/")
+        return path if branch == "" else f"{path}_{branch}"
+
+    def versions(self, filepath: Any, branch: str) -> Tuple[Any, str]:
+        """Version tree and file name the branch versions of filepath are saved as.
+
+        Branch versions live in the base version tree, `<filepath>/<version>/
+        <stem>_<branch><suffix>`.
+        """
+        return filepath, branch_filepath(PurePosixPath(str(filepath)), branch).name
+
+    def branches(self, path: str) -> Optional[str]:
+        """Directory holding a prefix per branch for path, None without one."""
+        return None
+
+    def prefix(self, path: str, branch: str) -> Optional[str]:
+        """Prefix holding all data of branch for path, None without one."""
+        return None
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}()"
+
+
+class PrefixLayout(SuffixLayout):
+    """Branched data under `<root>/branches/<branch>/`, keeping original names.
+
+    Arguments:
+        root (str): data root the relative path of every dataset is taken
+            from.  The last occurrence of root in a path is used, paths
+            outside of root are taken relative to their own directory.
+            Branch names are quoted so each branch is a single directory.
+    """
+
+    name = "prefix"
+    prefixed = True
+
+    def __init__(self, root: str = "data") -> None:
+        """Initialize a prefix layout for the data under root."""
+        self.root = root
+        self._root_parts = tuple(part for part in root.split("/") if part)
+
+    def split(self, path: str) -> Tuple[str, str]:
+        """Split path into its data root and the path relative to it."""
+        parts = path.rstrip("/").split("/")
+        size = len(self._root_parts)
+        for i in range(len(parts) - size - 1, -1, -1):
+            if tuple(parts[i : i + size]) == self._root_parts:
+                return "/".join(parts[: i + size]), "/".join(parts[i + size :])
+        return "/".join(parts[:-1]), parts[-1]
+
+    def _move(self, path: str, branch: str) -> str:
+        _, relative = self.split(path)
+        return f"{self.prefix(path, branch)}/{relative}"
+
+    def file(self, filepath: Any, branch: str) -> Any:
+        if branch == "":
+            return filepath
+        return type(filepath)(self._move(str(filepath), branch))
+
+    def directory(self, path: str, branch: str) -> str:
+        path = path.rstrip("/")
+        return path if branch == "" else self._move(path, branch)
+
+    def versions(self, filepath: Any, branch: str) -> Tuple[Any, str]:
+        return self.file(filepath, branch), PurePosixPath(str(filepath)).name
+
+    def branches(self, path: str) -> Optional[str]:
+        root, _ = self.split(path)
+        return f"{root}/{BRANCHES}" if root else BRANCHES
+
+    def prefix(self, path: str, branch: str) -> Optional[str]:
+        if branch == "":
+            return None
+        return f"{self.branches(path)}/{quote(branch, safe='')}"
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(root='{self.root}')"
+
+
+def prefix_branch(prefix: str) -> str:
+    """Branch name of a prefix made by `PrefixLayout.prefix`."""
+    return unquote(PurePosixPath(prefix).name)
+
+
+Layout = SuffixLayout
+LAYOUTS = {"suffix": SuffixLayout, "prefix": PrefixLayout}
+
+
+def make_layout(name: str = "suffix", root: str = "data") -> Layout:
+    """Make the layout called name, root is only used by the prefix layout."""
+    if name not in LAYOUTS:
+        raise ValueError(f"layout must be one of {', '.join(LAYOUTS)}, got '{name}'")
+    return PrefixLayout(root) if name == "prefix" else SuffixLayout()
+
+
+_LAYOUT: Optional[Layout] = None
+
+
+def use_layout(layout: Union[str, Layout] = "suffix", root: str = "data") -> Layout:
+    """Set the layout every branched path is derived with."""
+    global _LAYOUT
+    _LAYOUT = make_layout(layout, root) if isinstance(layout, str) else layout
+    return _LAYOUT
+
+
+def current_layout() -> Layout:
+    """Get the layout in use, read from the environment on first use."""
+    if _LAYOUT is None:
+        use_layout(
+            os.environ.get("STEEL_TOES_LAYOUT", "suffix"),
+            os.environ.get("STEEL_TOES_LAYOUT_ROOT", "data"),
+        )
+    return _LAYOUT  # type: ignore
+
+
+def layout_filepath(filepath: Any, branch: str) -> Any:
+    """Branched path of filepath in the current layout."""
+    return current_layout().file(filepath, branch)
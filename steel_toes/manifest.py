@@ -0,0 +1,143 @@
+"""
+Manifest of branched datasets.
+
+The manifest is a small json file per branch that records the branched
+filepath of every dataset saved on that branch.  With a manifest the hook can
+swap filepaths without asking storage whether each branched dataset exists.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+from urllib.parse import quote
+
+from kedro.io.data_catalog import DataCatalog
+
+from steel_toes.probe import Candidate, exists_each
+from steel_toes.steel_toes import (
+    branched_paths,
+    get_current_branch,
+    load_catalog,
+    logger,
+)
+
+
+class Manifest:
+    """Record of the branched datasets saved on a single branch.
+
+    Arguments:
+        directory (Path): directory that the manifest files are kept in.
+        branch (str): git branch the manifest belongs to.
+        ancestors (List): parent branches whose manifests are probed as well.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        branch: str,
+        ancestors: Sequence[str] = (),
+    ) -> None:
+        """Initialize a manifest, nothing is read until it is needed."""
+        self.directory = Path(directory)
+        self.branch = branch
+        self.ancestors = list(ancestors)
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> Path:
+        """Path to the manifest file of this branch."""
+        return self.directory / f"{quote(self.branch, safe='')}.json"
+
+    def read(self) -> Dict[str, str]:
+        """Read the manifest, mapping dataset names to branched filepaths."""
+        try:
+            return json.loads(self.path.read_text())["datasets"]
+        except FileNotFoundError:
+            return {}
+
+    def write(self, datasets: Dict[str, str]) -> None:
+        """Replace the manifest with datasets.
+
+        The file is written next to the manifest and moved into place so that
+        readers never see a partially written manifest.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        tmp.write_text(
+            json.dumps({"branch": self.branch, "datasets": datasets}, indent=2)
+        )
+        os.replace(tmp, self.path)
+
+    def record(self, dataset: str, branched_filepath: Any) -> None:
+        """Record that dataset has been saved to branched_filepath."""
+        with self._lock:
+            datasets = self.read()
+            if datasets.get(dataset) == str(branched_filepath):
+                return
+            datasets[dataset] = str(branched_filepath)
+            self.write(datasets)
+
+    def forget(self, dataset: str) -> None:
+        """Forget dataset, its branched filepath no longer exists."""
+        with self._lock:
+            datasets = self.read()
+            if datasets.pop(dataset, None) is not None:
+                self.write(datasets)
+
+    def probe(self, candidates: List[Candidate], workers: int = 1) -> List[bool]:
+        """Check candidates against the manifests without touching storage."""
+        recorded = set(self.read().values())
+        for ancestor in self.ancestors:
+            recorded.update(Manifest(self.directory, ancestor).read().values())
+        return [
+            str(branched_filepath) in recorded for _, branched_filepath in candidates
+        ]
+
+
+def verify_manifest(
+    manifest: Union[str, Path],
+    branch: Optional[str] = None,
+    directory: Union[str, Path] = ".",
+    rebuild: bool = False,
+    workers: int = 1,
+    context=None,
+) -> Tuple[List[str], List[str]]:
+    """Compare the manifest of a branch with what exists in storage.
+
+    Arguments:
+        manifest (Path): directory that the manifest files are kept in.
+        branch (str): git branch to verify. Defaults to current branch.
+        directory (Path): directory of kedro project. Defaults to '.'
+        rebuild (bool): Rewrite the manifest from storage.
+        workers (int): Number of threads used to check storage.
+
+    Returns: (missing, untracked) - datasets recorded in the manifest that do
+        not exist in storage, and branched datasets in storage that are not
+        recorded in the manifest.
+    """
+    if branch is None:
+        branch = get_current_branch(directory) or ""
+    catalog: DataCatalog = load_catalog(context)
+    branch_manifest = Manifest(manifest, branch)
+    recorded = branch_manifest.read()
+
+    paths = branched_paths(branch, catalog, catalog.list())
+    exists = exists_each(list(paths.values()), workers=workers)
+    stored = {
+        name: str(branched_filepath)
+        for (name, (_, branched_filepath)), branched_exists in zip(
+            paths.items(), exists
+        )
+        if branched_exists
+    }
+    missing = sorted(name for name in recorded if name not in stored)
+    untracked = sorted(name for name in stored if recorded.get(name) != stored[name])
+    for name in missing:
+        logger.info(f"STEEL_TOES:manifest-missing | '{name}' '{recorded[name]}'")
+    for name in untracked:
+        logger.info(f"STEEL_TOES:manifest-untracked | '{name}' '{stored[name]}'")
+    if rebuild:
+        logger.info(f"STEEL_TOES:manifest-rebuild | '{branch_manifest.path}'")
+        branch_manifest.write(stored)
+    return missing, untracked
@@ -0,0 +1,168 @@
+"""
+Migration of branched data between layouts.
+
+Every path of a branch is derived in the layout it is stored in and the
+layout it moves to, and renamed, nothing is loaded or saved again.  Paths that
+already exist in the new layout are left alone, so a migration that was
+interrupted is finished by running it again.  Datasets registered with their
+own `branch` function do not follow the layout and are left out.
+"""
+import time
+from pathlib import Path, PurePosixPath
+from typing import Any, Iterable, List, NamedTuple, Tuple, Union
+
+from kedro.io.data_catalog import DataCatalog
+
+from steel_toes.layout import Layout, layout_filepath, make_layout
+from steel_toes.partitioned import is_partitioned
+from steel_toes.probe import _map
+from steel_toes.registry import REGISTRY
+from steel_toes.steel_toes import base_paths, load_catalog, logger
+from steel_toes.versioned import is_versioned
+
+Move = Tuple[Any, str, str]
+
+
+class MigrateReport(NamedTuple):
+    """(old path, new path) of every path moved, or that would be."""
+
+    moved: List[Tuple[str, str]]
+    seconds: float
+
+
+def plan_migration(
+    branch: str,
+    catalog: DataCatalog,
+    source: Layout,
+    target: Layout,
+    jobs: int = 1,
+) -> List[Move]:
+    """Find every path of branch in the source layout and where it moves to.
+
+    Plain datasets move a single file, partitioned datasets their whole
+    directory, versioned datasets the branched file of each version.
+
+    Returns: (filesystem, old path, new path) of every move.
+    """
+
+    def expand(dataset: str) -> List[Move]:
+        d = getattr(catalog.datasets, dataset, None)
+        if is_partitioned(d):
+            fs = d._filesystem
+            base = fs._strip_protocol(getattr(d, "_path_base", d._path))
+            src, dst = source.directory(base, branch), target.directory(base, branch)
+            return [(fs, src, dst)] if fs.exists(src) else []
+        strategy = REGISTRY.resolve(type(d))
+        filepath = getattr(d, "_filepath_base", getattr(d, "_filepath", None))
+        if (
+            filepath is None
+            or not hasattr(d, "_fs")
+            or strategy.ignore
+            or strategy.branch is not layout_filepath
+        ):
+            return []
+        if is_versioned(d):
+            root = PurePosixPath(str(filepath))
+            src_tree, src_name = source.versions(root, branch)
+            dst_tree, dst_name = target.versions(root, branch)
+            return [
+                (
+                    d._fs,
+                    path,
+                    str(dst_tree / PurePosixPath(path).parent.name / dst_name),
+                )
+                for path in sorted(d._fs.glob(str(src_tree / "*" / src_name)))
+            ]
+        src, dst = source.file(filepath, branch), target.file(filepath, branch)
+        return [(d._fs, str(src), str(dst))] if d._fs.exists(str(src)) else []
+
+    return [
+        move for moves in _map(expand, sorted(catalog.list()), jobs) for move in moves
+    ]
+
+
+def _move(move: Move) -> bool:
+    """Rename one path into the new layout, unless something is there already.
+
+    Returns: whether the path was moved.
+    """
+    fs, src, dst = move
+    if fs.exists(dst):
+        logger.warning(f"STEEL_TOES:migrate | '{dst}' already exists, kept '{src}'")
+        return False
+    fs.makedirs(str(PurePosixPath(dst).parent), exist_ok=True)
+    fs.mv(src, dst, recursive=True)
+    return True
+
+
+def _remove_empty(fs: Any, prefix: str) -> None:
+    """Remove the prefix of a branch once nothing but directories is left."""
+    try:
+        if not fs.find(prefix):
+            fs.rm(prefix, recursive=True)
+    except FileNotFoundError:
+        return
+
+
+def migrate(
+    directory: Union[str, Path] = ".",
+    branches: Iterable[str] = (),
+    source: str = "suffix",
+    target: str = "prefix",
+    root: str = "data",
+    dryrun: bool = False,
+    jobs: int = 1,
+    context=None,
+) -> MigrateReport:
+    """Move the data of branches from the source layout to the target layout.
+
+    Arguments:
+        directory (Path): directory of kedro project. Defaults to '.'
+        branches (Iterable): git branches to migrate the data of.
+        source (str): layout the data is stored in.  Defaults to "suffix".
+        target (str): layout to move the data to.  Defaults to "prefix".
+        root (str): data root of the prefix layout.  Defaults to "data".
+        dryrun (bool): Log what would be moved without moving it.
+        jobs (int): Number of datasets listed, and paths moved, at once.
+
+    Returns: MigrateReport of the paths moved.
+    """
+    branches = [branch for branch in branches if branch]
+    if not branches:
+        raise ValueError("migrate needs at least one branch to migrate")
+    if source == target:
+        raise ValueError(f"source and target layout are both '{source}'")
+    start = time.perf_counter()
+    old, new = make_layout(source, root), make_layout(target, root)
+    catalog = load_catalog(context)
+
+    moves = [
+        move
+        for branch in branches
+        for move in plan_migration(branch, catalog, old, new, jobs)
+    ]
+    for _, src, dst in moves:
+        action = "dryrun-migrate" if dryrun else "migrating"
+        logger.info(f"STEEL_TOES:{action} | '{src}' -> '{dst}'")
+    if not moves:
+        logger.info("STEEL_TOES: No Datasets to migrate.")
+    if dryrun or not moves:
+        return MigrateReport(
+            moved=[(src, dst) for _, src, dst in moves],
+            seconds=time.perf_counter() - start,
+        )
+
+    moved = _map(_move, moves, jobs)
+    # moving out of a prefixed layout leaves the directories of each prefix
+    prefixes = {
+        (str(fs.protocol), old.prefix(path, branch)): fs
+        for branch in branches
+        for fs, path in base_paths(catalog)
+        if old.prefix(path, branch) is not None
+    }
+    for (_, prefix), fs in prefixes.items():
+        _remove_empty(fs, prefix)
+    return MigrateReport(
+        moved=[(src, dst) for (_, src, dst), done in zip(moves, moved) if done],
+        seconds=time.perf_counter() - start,
+    )
@@ -0,0 +1,64 @@
+"""
+Once-only initialisation for hooks called from many threads.
+
+`ThreadRunner` calls the hooks of every node from its own thread, so many
+nodes loading the same dataset resolve it at the same time.  Each key gets
+its own `Once`, threads resolving different datasets never wait on each
+other, and threads resolving the same dataset wait for the first one instead
+of probing storage again.
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+
+class Once:
+    """Call a function at most once, threads arriving meanwhile wait for it.
+
+    A call that raises does not count, the next caller tries again.
+    """
+
+    __slots__ = ("_lock", "done")
+
+    def __init__(self) -> None:
+        """Initialize a Once that has not been called."""
+        self._lock = threading.Lock()
+        self.done = False
+
+    def __call__(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> bool:
+        """Call func unless it was already called.
+
+        Returns: whether func was called by this call.
+        """
+        if self.done:
+            return False
+        with self._lock:
+            if self.done:
+                return False
+            func(*args, **kwargs)
+            self.done = True
+            return True
+
+
+class OncePerKey:
+    """A `Once` for every key, created on first use without a shared lock."""
+
+    def __init__(self) -> None:
+        """Initialize with nothing called yet."""
+        self._once: Dict[Hashable, Once] = {}
+
+    def __call__(
+        self, key: Hashable, func: Callable[..., Any], *args: Any, **kwargs: Any
+    ) -> bool:
+        """Call func unless it was already called for key.
+
+        Returns: whether func was called by this call.
+        """
+        once = self._once.get(key)
+        if once is None:
+            # dict.setdefault is atomic, racing threads all get the same Once
+            once = self._once.setdefault(key, Once())
+        return once(func, *args, **kwargs)
+
+    def clear(self) -> None:
+        """Forget every key, only safe while no hook is running."""
+        self._once = {}
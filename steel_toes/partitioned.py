@@ -0,0 +1,203 @@
+"""
+Partition level branching for steel toes.
+
+Partitioned datasets keep a directory of partitions at `_path` rather than a
+single `_filepath`.  Copying that directory for every branch would cost storage
+and I/O for every partition, so a branch is an overlay instead.  Saves write
+only the partitions a node returns to the branch directory, `<path>_<branch>`
+in the suffix layout, loads list the branch and the base directory once each
+and merge them, the branch partition winning when both hold the same
+partition id.
+"""
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from kedro.io import IncrementalDataSet, PartitionedDataSet
+from kedro.io.core import parse_dataset_definition
+
+from steel_toes.layout import current_layout
+
+try:
+    from kedro.io.core import DatasetError
+except ImportError:  # pragma: no cover
+    # kedro<0.18.12
+    from kedro.io.core import DataSetError as DatasetError
+
+logger = logging.getLogger("steel_toes")
+
+_OVERLAY_KEY = "steel_toes"
+
+
+def branch_path(path: str, branch: str) -> str:
+    """Branched partition directory of path in the layout in use.
+
+    Example:
+    "data/01_raw/partitions/" -> "data/01_raw/partitions_main"
+
+    """
+    return current_layout().directory(path, branch)
+
+
+def is_partitioned(dataset: Any) -> bool:
+    """Check if dataset is a directory of partitions."""
+    return isinstance(dataset, PartitionedDataSet)
+
+
+class PartitionOverlay:
+    """Lists the partitions of a branch directory on top of a base directory.
+
+    `_path` is the branch directory, so saves only ever write to the branch,
+    `_path_base` is the directory the catalog was configured with.  The
+    methods are copied onto a direct subclass of each dataset class by
+    `overlay_class`, python only lets an instance take on a new class with
+    the same layout.
+    """
+
+    def _root(self, path: str) -> str:
+        """Path as returned by the filesystem, without protocol."""
+        return self._filesystem._strip_protocol(path).rstrip(self._sep)
+
+    def _partition_id(self, root: str, path: str) -> str:
+        """Partition id of path, relative to root and without the suffix."""
+        partition = path[len(root) :].lstrip(self._sep)
+        if self._filename_suffix and partition.endswith(self._filename_suffix):
+            partition = partition[: -len(self._filename_suffix)]
+        return partition
+
+    def _partition_filter(self) -> Optional[Callable[[str, str], bool]]:
+        """Filter (partition_id, path) while listing, None keeps everything."""
+        return None
+
+    def _list_root(
+        self, path: str, keep: Optional[Callable[[str, str], bool]] = None
+    ) -> Dict[str, str]:
+        """List the partitions under path in one pass.
+
+        Returns: {partition_id: path}, empty when path does not exist.
+        """
+        root = self._root(path)
+        try:
+            found = self._filesystem.find(root, **self._load_args)
+        except FileNotFoundError:
+            return {}
+        partitions = {}
+        for partition in found:
+            if not partition.endswith(self._filename_suffix):
+                continue
+            partition_id = self._partition_id(root, partition)
+            if keep is None or keep(partition_id, partition):
+                partitions[partition_id] = partition
+        return partitions
+
+    def _list_partitions(self) -> List[str]:
+        """Merge the base and branch listings, branch partitions win."""
+        partitions = self._partition_cache.get(_OVERLAY_KEY)
+        if partitions is None:
+            keep = self._partition_filter()
+            merged = self._list_root(self._path_base, keep)
+            merged.update(self._list_root(self._path, keep))
+            partitions = [merged[partition_id] for partition_id in sorted(merged)]
+            self._partition_cache[_OVERLAY_KEY] = partitions
+        return partitions
+
+    def _path_to_partition(self, path: str) -> str:
+        """Partition id of a path from either the branch or the base listing."""
+        for directory in (self._path, self._path_base):
+            root = self._root(directory)
+            if path.startswith(root + self._sep):
+                return self._partition_id(root, path)
+        return PartitionedDataSet._path_to_partition(self, path)  # type: ignore
+
+
+class IncrementalOverlay(PartitionOverlay):
+    """Overlay that also keeps the checkpoint of the branch on the branch.
+
+    The branch checkpoint is read first, before the branch has confirmed
+    anything the base checkpoint is used.
+    """
+
+    def _read_checkpoint(self) -> Optional[str]:
+        checkpoint = IncrementalDataSet._read_checkpoint(self)  # type: ignore
+        base = getattr(self, "_checkpoint_base", None)
+        if checkpoint is not None or base is None:
+            return checkpoint
+        config = {**self._checkpoint_config, self._filepath_arg: base}
+        type_, kwargs = parse_dataset_definition(config)
+        try:
+            return type_(**kwargs).load()
+        except DatasetError:
+            return None
+
+    def _partition_filter(self) -> Optional[Callable[[str, str], bool]]:
+        checkpoint = self._read_checkpoint()
+        checkpoints = {
+            self._root(self._checkpoint_config[self._filepath_arg]),
+            self._root(getattr(self, "_checkpoint_base", "")),
+        }
+
+        def keep(partition_id: str, path: str) -> bool:
+            if path in checkpoints:
+                return False
+            return checkpoint is None or self._comparison_func(partition_id, checkpoint)
+
+        return keep
+
+
+_OVERLAYS: Dict[type, type] = {}
+
+
+def _methods(overlay: type) -> Dict[str, Any]:
+    """Collect the methods of overlay and the overlays it extends."""
+    methods: Dict[str, Any] = {}
+    for klass in reversed(overlay.__mro__[:-1]):
+        methods.update(
+            (name, value)
+            for name, value in vars(klass).items()
+            if not name.startswith("__")
+        )
+    return methods
+
+
+def overlay_class(cls: type) -> type:
+    """Get the overlay class of a partitioned dataset class, made once per class."""
+    if cls not in _OVERLAYS:
+        overlay = (
+            IncrementalOverlay
+            if issubclass(cls, IncrementalDataSet)
+            else PartitionOverlay
+        )
+        name = f"Branched{cls.__name__}"
+        namespace = {
+            **_methods(overlay),
+            "__module__": __name__,
+            "__qualname__": name,
+            "__doc__": f"`{cls.__name__}` overlaying a branch on its base partitions.",
+        }
+        _OVERLAYS[cls] = type(name, (cls,), namespace)
+        # found by name on this module, so overlaid datasets can be pickled
+        globals().setdefault(name, _OVERLAYS[cls])
+    return _OVERLAYS[cls]
+
+
+BranchedPartitionedDataSet = overlay_class(PartitionedDataSet)
+BranchedIncrementalDataSet = overlay_class(IncrementalDataSet)
+
+
+def overlay_branch(d: Any, branched_path: str, hook: str = "") -> None:
+    """Overlay the partitions at branched_path on partitioned dataset d."""
+    logger.info(
+        f"STEEL_TOES:{hook} '{d._path.rstrip('/')}' -> '{branched_path}' (partitions)"
+    )
+    if isinstance(d, IncrementalDataSet):
+        checkpoint = d._checkpoint_config.get(d._filepath_arg)
+        base = d._normalized_path.rstrip(d._sep)
+        if isinstance(checkpoint, str) and checkpoint.startswith(base + d._sep):
+            d._checkpoint_base = checkpoint
+            d._checkpoint_config[d._filepath_arg] = (
+                branched_path + checkpoint[len(base) :]
+            )
+    d._path_base = d._path
+    d._path = branched_path
+    d.__class__ = overlay_class(type(d))
+    d._invalidate_caches()
+    d._path_swapped = True
@@ -0,0 +1,210 @@
+"""
+Probe strategies for steel toes.
+
+A probe answers whether the branched filepath of many datasets exists.  Every
+probe takes a list of (dataset, branched_filepath) candidates and returns a
+list of bools in the same order.
+"""
+import asyncio
+import copy
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import PurePosixPath
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from fsspec.asyn import AsyncFileSystem, sync
+from kedro.io.core import get_filepath_str
+
+from steel_toes.registry import REGISTRY
+from steel_toes.stats import record_probe
+
+Candidate = Tuple[Any, Any]
+
+
+def _map(func: Callable, items: Iterable, workers: int = 1) -> List:
+    """Map func over items, over a thread pool when workers > 1."""
+    items = list(items)
+    if workers > 1 and len(items) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(func, items))
+    return [func(item) for item in items]
+
+
+def branched_dataset_exists(dataset: Any, branched_filepath: str) -> bool:
+    """Check if branched filepath exists.
+
+    Filepath swapping ensures that we utilize the datasets existing _exists() method.
+
+    Returns: bools - whether branched_filepath exists or not
+    """
+    copied_dataset = copy.copy(dataset)
+    copied_dataset._filepath = branched_filepath
+    start = time.perf_counter()
+    # needs type conversion kedro implemnets ANY
+    exists = True if copied_dataset._exists() else False
+    record_probe([branched_filepath], time.perf_counter() - start)
+    return exists
+
+
+def fs_exists(dataset: Any, branched_filepath: Any) -> bool:
+    """Check if branched filepath exists directly on the datasets filesystem.
+
+    This is what kedro's file datasets do in `_exists()`, without copying the
+    dataset and whatever connections or data it holds.  Versioned datasets,
+    and datasets without an fsspec filesystem, fall back to
+    `branched_dataset_exists`.
+    """
+    if not _fs_probeable(dataset):
+        return branched_dataset_exists(dataset, branched_filepath)
+    start = time.perf_counter()
+    exists = bool(
+        dataset._fs.exists(get_filepath_str(branched_filepath, dataset._protocol))
+    )
+    record_probe([branched_filepath], time.perf_counter() - start)
+    return exists
+
+
+def _exists(candidate: Candidate) -> bool:
+    """Check a candidate the way the registry says its class is checked."""
+    d, branched_filepath = candidate
+    exists = REGISTRY.resolve(type(d)).exists or fs_exists
+    return exists(d, branched_filepath)
+
+
+def exists_each(candidates: List[Candidate], workers: int = 1) -> List[bool]:
+    """Check each candidate on its own, as registered for its dataset class."""
+    return _map(_exists, candidates, workers)
+
+
+def _fs_probeable(dataset: Any) -> bool:
+    """Check if the existence of dataset can be answered by its filesystem.
+
+    Versioned datasets store a directory of versions at their filepath and
+    datasets without an fsspec filesystem implement their own _exists, these
+    fall back to `branched_dataset_exists`, as do classes registered with
+    their own exists check.
+    """
+    return (
+        REGISTRY.resolve(type(dataset)).exists is None
+        and hasattr(dataset, "_fs")
+        and hasattr(dataset, "_protocol")
+        and getattr(dataset, "_version", None) is None
+    )
+
+
+def _list_names(fs: Any, directory: str) -> Tuple[Set[str], float]:
+    """List the names of everything directly inside directory.
+
+    Returns: (names, seconds the listing took)
+    """
+    start = time.perf_counter()
+    try:
+        paths = fs.ls(directory, detail=False)
+    except (FileNotFoundError, NotADirectoryError):
+        return set(), time.perf_counter() - start
+    names = {PurePosixPath(str(path).rstrip("/")).name for path in paths}
+    return names, time.perf_counter() - start
+
+
+def exists_by_listing(candidates: List[Candidate], workers: int = 1) -> List[bool]:
+    """Check candidates with one listing per directory.
+
+    Candidates are grouped by filesystem and parent directory, each directory
+    is listed once and every existence question is answered from the
+    listings, so the cost grows with the number of directories rather than the
+    number of datasets.
+    """
+    directories: Dict[Tuple[int, str], Any] = {}
+    members: Dict[Tuple[int, str], List[Any]] = {}
+    keys: Dict[int, Tuple[int, str]] = {}
+    fallback: List[int] = []
+    for i, (d, branched_filepath) in enumerate(candidates):
+        if not _fs_probeable(d):
+            fallback.append(i)
+            continue
+        # kedro strips the scheme of http(s) filepaths, the filesystem needs it
+        parent = PurePosixPath(branched_filepath).parent
+        key = (id(d._fs), get_filepath_str(parent, d._protocol))
+        directories.setdefault(key, d._fs)
+        members.setdefault(key, []).append(branched_filepath)
+        keys[i] = key
+
+    listed = _map(
+        lambda key: _list_names(directories[key], key[1]), directories, workers
+    )
+    listings = {}
+    for key, (names, seconds) in zip(directories, listed):
+        listings[key] = names
+        record_probe(members[key], seconds)
+
+    exists = [False] * len(candidates)
+    for i, key in keys.items():
+        exists[i] = PurePosixPath(candidates[i][1]).name in listings[key]
+    fallback_exists = exists_each([candidates[i] for i in fallback], workers)
+    for i, branched_exists in zip(fallback, fallback_exists):
+        exists[i] = branched_exists
+    return exists
+
+
+async def _exists_concurrently(
+    fs: AsyncFileSystem, paths: List[str], concurrency: int
+) -> List[bool]:
+    """Check every path with the async filesystem, at most concurrency at once."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def exists(path: str) -> bool:
+        async with semaphore:
+            start = time.perf_counter()
+            branched_exists = bool(await fs._exists(path))
+            record_probe([path], time.perf_counter() - start)
+            return branched_exists
+
+    return await asyncio.gather(*(exists(path) for path in paths))
+
+
+def exists_async(
+    candidates: List[Candidate], workers: int = 1, concurrency: Optional[int] = None
+) -> List[bool]:
+    """Check candidates on async filesystems with batches of coroutines.
+
+    Filesystems such as s3fs, gcsfs and http are async underneath, their
+    `_exists` coroutines are gathered on the filesystems own event loop with
+    at most `concurrency` requests in flight, defaulting to workers when more
+    than one is set.  Candidates on sync filesystems fall back to
+    `exists_each`.
+    """
+    if concurrency is None:
+        concurrency = workers if workers > 1 else 64
+    filesystems: Dict[int, AsyncFileSystem] = {}
+    groups: Dict[int, List[int]] = {}
+    fallback: List[int] = []
+    for i, (d, _) in enumerate(candidates):
+        fs = getattr(d, "_fs", None)
+        if not (_fs_probeable(d) and isinstance(fs, AsyncFileSystem) and fs.async_impl):
+            fallback.append(i)
+            continue
+        filesystems.setdefault(id(fs), fs)
+        groups.setdefault(id(fs), []).append(i)
+
+    exists = [False] * len(candidates)
+    for key, indices in groups.items():
+        fs = filesystems[key]
+        # kedro strips the scheme of http(s) filepaths, the filesystem needs it
+        paths = [
+            get_filepath_str(candidates[i][1], candidates[i][0]._protocol)
+            for i in indices
+        ]
+        results = sync(fs.loop, _exists_concurrently, fs, paths, concurrency)
+        for i, branched_exists in zip(indices, results):
+            exists[i] = branched_exists
+    fallback_exists = exists_each([candidates[i] for i in fallback], workers)
+    for i, branched_exists in zip(fallback, fallback_exists):
+        exists[i] = branched_exists
+    return exists
+
+
+PROBES: Dict[str, Callable[..., List[bool]]] = {
+    "exists": exists_each,
+    "listing": exists_by_listing,
+    "async": exists_async,
+}
@@ -0,0 +1,309 @@
+"""
+Promotion of branched data onto base paths.
+
+Once a feature branch is merged the data it produced is already sitting next
+to the base data.  Promoting renames every branched file onto its base path,
+nothing is loaded or saved again.  Each step is appended to a journal so that
+an interrupted promotion can be resumed, or rolled back to where it started.
+"""
+import json
+import threading
+import time
+from pathlib import Path, PurePosixPath
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+from urllib.parse import quote
+
+from kedro.io.data_catalog import DataCatalog
+
+from steel_toes.dedup import file_digest
+from steel_toes.partitioned import branch_path, is_partitioned
+from steel_toes.probe import _map
+from steel_toes.steel_toes import branched_paths, load_catalog, logger
+from steel_toes.versioned import branch_versions, is_versioned
+
+BACKUP_SUFFIX = ".steel_toes_backup"
+
+Move = Dict[str, str]
+
+
+class PromoteReport(NamedTuple):
+    """(branched path, base path) of every file moved, or that would be."""
+
+    moved: List[Tuple[str, str]]
+    seconds: float
+
+
+class Journal:
+    """Append only record of a promotion.
+
+    The first line is the plan, every following line marks one move as done.
+
+    Arguments:
+        path (Path): journal file, one per branch.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        """Initialize a journal, nothing is read until it is needed."""
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def exists(self) -> bool:
+        """Whether a promotion was started and not finished."""
+        return self.path.exists()
+
+    def start(self, branch: str, moves: List[Move]) -> None:
+        """Write the plan of a new promotion."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps({"branch": branch, "moves": moves}) + "\n")
+
+    def append(self, event: Dict[str, Any]) -> None:
+        """Record that a step is done."""
+        with self._lock:
+            with self.path.open("a") as f:
+                f.write(json.dumps(event) + "\n")
+                f.flush()
+
+    def read(self) -> Tuple[List[Move], Dict[int, Dict[str, Any]]]:
+        """Read the plan and the moves already done.
+
+        A line cut short by an interruption is ignored, that move is checked
+        against storage again.
+
+        Returns: (moves, {index: event})
+        """
+        lines = self.path.read_text().splitlines()
+        moves = json.loads(lines[0])["moves"]
+        done = {}
+        for line in lines[1:]:
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            done[event["index"]] = event
+        return moves, done
+
+    def finish(self) -> None:
+        """Remove the journal once there is nothing left to resume."""
+        self.path.unlink()
+
+
+def _filesystem(d: Any) -> Any:
+    return d._filesystem if is_partitioned(d) else d._fs
+
+
+def _sources(branch: str, catalog: DataCatalog) -> List[Tuple[str, str, str, str]]:
+    """Get the (dataset, kind, branched path, base path) of every dataset."""
+    sources = []
+    for dataset, (d, branched) in branched_paths(
+        branch, catalog, catalog.list()
+    ).items():
+        if not hasattr(d, "_fs"):
+            continue
+        base = getattr(d, "_filepath_base", d._filepath)
+        sources.append((dataset, "file", str(branched), str(base)))
+    for dataset in catalog.list():
+        d = getattr(catalog.datasets, dataset, None)
+        if is_versioned(d) and hasattr(d, "_fs"):
+            tree, name = branch_versions(d._filepath, branch)
+            sources.append(
+                (dataset, "versioned", str(tree / "*" / name), str(d._filepath))
+            )
+        elif is_partitioned(d):
+            fs = d._filesystem
+            base = fs._strip_protocol(getattr(d, "_path_base", d._path))
+            sources.append(
+                (dataset, "partitioned", branch_path(base, branch), base.rstrip("/"))
+            )
+    return sources
+
+
+def plan_moves(
+    branch: str, catalog: DataCatalog, filesystems: Dict[str, Any], jobs: int = 1
+) -> List[Move]:
+    """Find every branched file and the base path it is promoted to.
+
+    Plain datasets are a single file, versioned datasets promote the branched
+    file of each version onto the base file of that version, partitioned
+    datasets promote each partition.  A plain dataset found to be a directory
+    is refused, its type is unknown.
+    """
+
+    def expand(source: Tuple[str, str, str, str]) -> List[Move]:
+        dataset, kind, src, dst = source
+        fs = filesystems[dataset]
+        if kind == "file":
+            try:
+                info = fs.info(src)
+            except FileNotFoundError:
+                return []
+            if info.get("type") == "directory":
+                # a directory may be an overlay holding only some partitions,
+                # moving it over the base would drop the others
+                raise RuntimeError(
+                    f"'{src}' of {dataset} is a directory, promote it through "
+                    "a catalog that knows its dataset type, pass --session"
+                )
+            return [{"dataset": dataset, "src": src, "dst": dst}]
+        if kind == "versioned":
+            root = PurePosixPath(dst)
+            return [
+                {
+                    "dataset": dataset,
+                    "src": path,
+                    "dst": str(root / PurePosixPath(path).parent.name / root.name),
+                }
+                for path in sorted(fs.glob(src))
+            ]
+        try:
+            return [
+                {"dataset": dataset, "src": path, "dst": dst + path[len(src) :]}
+                for path in fs.find(src)
+            ]
+        except FileNotFoundError:
+            return []
+
+    return [
+        move
+        for moves in _map(expand, _sources(branch, catalog), jobs)
+        for move in moves
+    ]
+
+
+def _apply(fs: Any, move: Move, verify: bool = False) -> Dict[str, Any]:
+    """Rename one branched file onto its base path.
+
+    Every step checks storage first, so applying a move that was interrupted
+    part way picks up where it stopped.
+    """
+    src, dst = move["src"], move["dst"]
+    backup = dst + BACKUP_SUFFIX
+    if not fs.exists(src):
+        # moved before the journal was written
+        return {}
+    if fs.exists(dst) and not fs.exists(backup):
+        fs.mv(dst, backup, recursive=True)
+    digest = file_digest(fs, src) if verify else None
+    fs.makedirs(str(PurePosixPath(dst).parent), exist_ok=True)
+    fs.mv(src, dst, recursive=True)
+    if verify and file_digest(fs, dst) != digest:
+        raise RuntimeError(
+            f"checksum of '{dst}' does not match '{src}', "
+            "run `steel-toes promote --rollback` to restore the base data"
+        )
+    return {"sha256": digest} if verify else {}
+
+
+def _rollback(fs: Any, move: Move) -> None:
+    """Move a promoted file back to its branched path and restore the base."""
+    src, dst = move["src"], move["dst"]
+    backup = dst + BACKUP_SUFFIX
+    if fs.exists(dst) and not fs.exists(src):
+        fs.makedirs(str(PurePosixPath(src).parent), exist_ok=True)
+        fs.mv(dst, src, recursive=True)
+    if fs.exists(backup):
+        fs.mv(backup, dst, recursive=True)
+
+
+def promote(
+    directory: Union[str, Path] = ".",
+    branch: Optional[str] = None,
+    dryrun: bool = False,
+    verify: bool = False,
+    resume: bool = False,
+    rollback: bool = False,
+    journal: Union[str, Path, None] = None,
+    jobs: int = 1,
+    context=None,
+) -> PromoteReport:
+    """Promote the data of branch onto the base paths of the catalog.
+
+    Arguments:
+        directory (Path): directory of kedro project. Defaults to '.'
+        branch (str): git branch to promote the data of.
+        dryrun (bool): Log what would be moved without moving it.
+        verify (bool): Compare a checksum of each file before and after it
+            is moved.
+        resume (bool): Finish a promotion that was interrupted.
+        rollback (bool): Undo a promotion that was interrupted.
+        journal (Path): journal file.  Defaults to
+            `.steel_toes/promote/<branch>.jsonl` in directory.
+        jobs (int): Number of files moved at once.
+
+    Returns: PromoteReport of the files moved.
+    """
+    if not branch:
+        raise ValueError("promote needs the branch to promote")
+    start = time.perf_counter()
+    if journal is None:
+        journal = (
+            Path(directory)
+            / ".steel_toes"
+            / "promote"
+            / f"{quote(branch, safe='')}.jsonl"
+        )
+    record = Journal(journal)
+    catalog = load_catalog(context)
+    filesystems = {}
+    for dataset in catalog.list():
+        d = getattr(catalog.datasets, dataset, None)
+        if hasattr(d, "_fs") or is_partitioned(d):
+            filesystems[dataset] = _filesystem(d)
+
+    if record.exists() and not (resume or rollback or dryrun):
+        raise RuntimeError(
+            f"an interrupted promotion of '{branch}' was found at '{journal}', "
+            "pass --resume to finish it or --rollback to undo it"
+        )
+    if (resume or rollback) and not record.exists():
+        raise RuntimeError(f"no promotion of '{branch}' to resume at '{journal}'")
+
+    if rollback:
+        moves, _ = record.read()
+        for move in reversed(moves):
+            logger.info(f"STEEL_TOES:rollback | '{move['dst']}' -> '{move['src']}'")
+            _rollback(filesystems[move["dataset"]], move)
+        record.finish()
+        return PromoteReport(
+            moved=[(move["dst"], move["src"]) for move in moves],
+            seconds=time.perf_counter() - start,
+        )
+
+    if resume:
+        moves, done = record.read()
+    else:
+        moves, done = plan_moves(branch, catalog, filesystems, jobs), {}
+
+    for move in moves:
+        action = "dryrun-promote" if dryrun else "promoting"
+        logger.info(f"STEEL_TOES:{action} | '{move['src']}' -> '{move['dst']}'")
+    if not moves:
+        logger.info("STEEL_TOES: No Datasets to promote.")
+    if dryrun or not moves:
+        return PromoteReport(
+            moved=[(move["src"], move["dst"]) for move in moves],
+            seconds=time.perf_counter() - start,
+        )
+
+    if not resume:
+        record.start(branch, moves)
+
+    def apply(index: int) -> None:
+        if index in done:
+            return
+        move = moves[index]
+        event = _apply(filesystems[move["dataset"]], move, verify)
+        record.append({"index": index, **event})
+
+    _map(apply, range(len(moves)), jobs)
+
+    # base data is only dropped once every file has been promoted
+    for move in moves:
+        fs = filesystems[move["dataset"]]
+        backup = move["dst"] + BACKUP_SUFFIX
+        if fs.exists(backup):
+            fs.rm(backup, recursive=True)
+    record.finish()
+    return PromoteReport(
+        moved=[(move["src"], move["dst"]) for move in moves],
+        seconds=time.perf_counter() - start,
+    )
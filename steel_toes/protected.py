@@ -0,0 +1,154 @@
+"""
+Registry of the datasets steel toes has protected.
+
+Every swap is recorded as it happens, with the dataset name, its base and
+branched path, the hook that swapped it and when.  Records are kept per
+catalog, listing the protected datasets of a catalog walks its own records
+instead of probing every dataset of the catalog for a marker, and never
+touches the records of other catalogs.  A catalog seen for the first time,
+such as a copy or an unpickled catalog, is seeded from the markers its
+datasets carry.  A runner works on a shallow copy of the catalog of the
+session, the hook shares the records of the two.
+"""
+import json
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from kedro.io.data_catalog import DataCatalog
+
+SWAP_MARKERS = ["_filepath_swapped", "_path_swapped", "_version_swapped"]
+
+
+class Protection(NamedTuple):
+    """A dataset swapped onto its branched path.
+
+    branch is the branch the data belongs to, a parent branch of the one
+    being run when the data is inherited, empty when not known.
+    """
+
+    dataset: str
+    base: str
+    branched: str
+    hook: str
+    swapped_at: float
+    branch: str = ""
+
+
+class Protected:
+    """Protections by catalog, in the order they were swapped."""
+
+    def __init__(self) -> None:
+        """Initialize an empty registry."""
+        self._protections: "weakref.WeakKeyDictionary[Any, Protection]" = (
+            weakref.WeakKeyDictionary()
+        )
+        # catalogs compare equal by content and cannot be hashed, records are
+        # kept by id and dropped along with the catalog
+        self._catalogs: Dict[
+            int, Tuple["weakref.ref[DataCatalog]", Dict[str, Any]]
+        ] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, catalog: DataCatalog) -> Optional[Dict[str, Any]]:
+        entry = self._catalogs.get(id(catalog))
+        if entry is None or entry[0]() is not catalog:
+            return None
+        return entry[1]
+
+    def _set(self, catalog: DataCatalog, records: Dict[str, Any]) -> None:
+        key = id(catalog)
+        ref = weakref.ref(catalog, lambda _: self._catalogs.pop(key, None))
+        self._catalogs[key] = (ref, records)
+
+    def _records(self, catalog: DataCatalog) -> Dict[str, Any]:
+        """Get the {dataset: dataset object} records of catalog.
+
+        Datasets of a catalog seen for the first time may already be swapped,
+        those are recorded from their markers.
+        """
+        records = self._get(catalog)
+        if records is not None:
+            return records
+        records = {}
+        for dataset in catalog.list():
+            d = getattr(catalog.datasets, dataset, None)
+            if not any(hasattr(d, marker) for marker in SWAP_MARKERS):
+                continue
+            if d not in self._protections:
+                self._protections[d] = Protection(
+                    dataset,
+                    str(getattr(d, "_filepath_base", getattr(d, "_path", ""))),
+                    str(getattr(d, "_filepath", getattr(d, "_path", ""))),
+                    "",
+                    0.0,
+                )
+            records[dataset] = d
+        self._set(catalog, records)
+        return records
+
+    def add(
+        self,
+        d: Any,
+        dataset: str,
+        base: Any,
+        branched: Any,
+        hook: str,
+        branch: str = "",
+        catalog: Optional[DataCatalog] = None,
+    ) -> None:
+        """Record that dataset d of catalog was swapped from base to branched."""
+        protection = Protection(
+            dataset, str(base), str(branched), hook, time.time(), branch
+        )
+        with self._lock:
+            self._protections[d] = protection
+            if catalog is not None:
+                records = self._records(catalog)
+                records.pop(dataset, None)
+                records[dataset] = d
+
+    def share(self, copy: DataCatalog, catalog: DataCatalog) -> None:
+        """Share the records of catalog with a shallow copy of it.
+
+        Records are only listed for a catalog holding the same dataset
+        object, sharing with a catalog that is not a copy lists nothing wrong.
+        """
+        with self._lock:
+            if self._get(copy) is None:
+                self._set(copy, self._records(catalog))
+
+    def forget(self, d: Any) -> None:
+        """Forget dataset d, it is back on its base path."""
+        with self._lock:
+            self._protections.pop(d, None)
+
+    def get(self, d: Any) -> Optional[Protection]:
+        """Get the protection of dataset d, None when it is not protected."""
+        with self._lock:
+            return self._protections.get(d)
+
+    def of(self, catalog: DataCatalog) -> List[Tuple[Any, Protection]]:
+        """Get the (dataset, protection) of every protected dataset of catalog."""
+        with self._lock:
+            records = [
+                (dataset, d, self._protections.get(d))
+                for dataset, d in self._records(catalog).items()
+            ]
+        return [
+            (d, protection)
+            for dataset, d, protection in records
+            if protection is not None and getattr(catalog.datasets, dataset, None) is d
+        ]
+
+    def report(self, catalog: DataCatalog) -> List[Dict[str, Any]]:
+        """Every protection of catalog, ready to be written as json."""
+        return [protection._asdict() for _, protection in self.of(catalog)]
+
+    def to_json(self, catalog: DataCatalog, indent: Optional[int] = 2) -> str:
+        """Every protection of catalog as json, for tooling."""
+        return json.dumps(self.report(catalog), indent=indent)
+
+
+PROTECTED = Protected()
@@ -0,0 +1,107 @@
+"""
+Registry of how steel toes branches each dataset class.
+
+Every dataset class is resolved to a `Strategy` once and cached, the strategy
+tells steel toes which attribute holds the path, how to derive the branched
+path and how to check that it exists, or that the class is never branched.
+Custom datasets register their own strategy.
+
+    >>> from steel_toes import register
+    >>> register(MyDataSet, path="_path", exists=my_exists)
+    >>> register(SQLQueryDataSet, ignore=True)
+"""
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from steel_toes.layout import layout_filepath
+
+
+class Strategy:
+    """How steel toes branches a dataset class.
+
+    Arguments:
+        path (str): attribute of the dataset holding its path.
+        branch (Callable): derives the branched path from (path, branch).
+            Default derives it in the layout in use, see `steel_toes.layout`.
+        exists (Callable): checks whether (dataset, branched_path) exists.
+            Default None checks the path on the datasets own filesystem.
+        ignore (bool): never branch datasets of this class.
+    """
+
+    __slots__ = ("path", "branch", "exists", "ignore")
+
+    def __init__(
+        self,
+        path: str = "_filepath",
+        branch: Callable[[Any, str], Any] = layout_filepath,
+        exists: Optional[Callable[[Any, Any], bool]] = None,
+        ignore: bool = False,
+    ) -> None:
+        """Initialize a strategy, the defaults suit kedro's file datasets."""
+        self.path = path
+        self.branch = branch
+        self.exists = exists
+        self.ignore = ignore
+
+    def __repr__(self) -> str:
+        return (
+            f"Strategy(path='{self.path}', branch={self.branch.__name__}, "
+            f"exists={getattr(self.exists, '__name__', None)}, ignore={self.ignore})"
+        )
+
+
+DEFAULT = Strategy()
+IGNORE = Strategy(ignore=True)
+
+
+class Registry:
+    """Strategies by dataset class, resolved once per class through its mro."""
+
+    def __init__(self) -> None:
+        """Initialize an empty registry, every class gets the default strategy."""
+        self._strategies: Dict[type, Strategy] = {}
+        self._resolved: Dict[Tuple[type, Tuple[type, ...]], Strategy] = {}
+        self._lock = threading.Lock()
+
+    def register(
+        self, cls: type, strategy: Optional[Strategy] = None, **kwargs: Any
+    ) -> Strategy:
+        """Register how datasets of cls, and its subclasses, are branched.
+
+        Either pass a `Strategy`, or its arguments as keywords.
+        """
+        strategy = strategy or Strategy(**kwargs)
+        with self._lock:
+            self._strategies[cls] = strategy
+            self._resolved.clear()
+        return strategy
+
+    def unregister(self, cls: type) -> None:
+        """Forget the strategy of cls, it gets the default strategy again."""
+        with self._lock:
+            self._strategies.pop(cls, None)
+            self._resolved.clear()
+
+    def resolve(self, cls: type, ignore_types: Iterable[type] = ()) -> Strategy:
+        """Get the strategy of cls, datasets of ignore_types are ignored."""
+        key = (cls, tuple(ignore_types))
+        strategy = self._resolved.get(key)
+        if strategy is not None:
+            return strategy
+        if any(issubclass(cls, _type) for _type in key[1]):
+            strategy = IGNORE
+        else:
+            strategy = next(
+                (self._strategies[k] for k in cls.__mro__ if k in self._strategies),
+                DEFAULT,
+            )
+        self._resolved[key] = strategy
+        return strategy
+
+
+REGISTRY = Registry()
+
+
+def register(cls: type, strategy: Optional[Strategy] = None, **kwargs: Any) -> Strategy:
+    """Register how datasets of cls are branched in the global registry."""
+    return REGISTRY.register(cls, strategy, **kwargs)
@@ -0,0 +1,156 @@
+"""
+Bulk removal of branched data.
+
+Paths are deleted in batches per filesystem through fsspec's `rm`, which
+takes a list of paths, so object stores can delete many keys per request.
+Which targets exist is answered by one listing per parent directory, that
+listing also sizes every file.  Directories are only sized, with a listing
+of everything under them, when the sizes are asked for.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import PurePosixPath
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from steel_toes.probe import _map
+
+logger = logging.getLogger("steel_toes")
+
+Target = Tuple[Any, str]
+
+
+class RemoveSummary(NamedTuple):
+    """What was, or would have been, removed.
+
+    files and bytes are None when directories were removed without sizing
+    them.
+    """
+
+    paths: List[str]
+    files: Optional[int]
+    bytes: Optional[int]
+    seconds: float
+
+
+def _size(target: Target) -> Tuple[int, int]:
+    """Count the files and bytes under a target path."""
+    fs, path = target
+    try:
+        found = fs.find(path, withdirs=False, detail=True)
+    except FileNotFoundError:
+        return 0, 0
+    return len(found), sum(info.get("size") or 0 for info in found.values())
+
+
+def _list_directory(directory: Target) -> Dict[str, Dict[str, Any]]:
+    """List everything directly inside directory, by normalized path."""
+    fs, path = directory
+    try:
+        found = fs.ls(path, detail=True)
+    except (FileNotFoundError, NotADirectoryError):
+        return {}
+    return {fs._strip_protocol(info["name"]).rstrip("/"): info for info in found}
+
+
+def find_existing(
+    targets: List[Target], jobs: int = 1
+) -> List[Tuple[Target, Dict[str, Any]]]:
+    """Find the targets that exist with one listing per parent directory.
+
+    Returns: (target, listing info) of every target that exists, in order.
+    """
+    directories: Dict[Tuple[int, str], Target] = {}
+    keys = []
+    for fs, path in targets:
+        normalized = fs._strip_protocol(path).rstrip("/")
+        key = (id(fs), str(PurePosixPath(normalized).parent))
+        directories.setdefault(key, (fs, key[1]))
+        keys.append((key, normalized))
+    listings = dict(zip(directories, _map(_list_directory, directories.values(), jobs)))
+    return [
+        (target, listings[key][normalized])
+        for target, (key, normalized) in zip(targets, keys)
+        if normalized in listings[key]
+    ]
+
+
+def group_by_fs(targets: List[Target]) -> Dict[int, Tuple[Any, List[str]]]:
+    """Group target paths by the filesystem they live on."""
+    groups: Dict[int, Tuple[Any, List[str]]] = {}
+    for fs, path in targets:
+        groups.setdefault(id(fs), (fs, []))[1].append(path)
+    return groups
+
+
+def remove_paths(
+    targets: List[Target],
+    dryrun: bool = False,
+    jobs: int = 1,
+    batch_size: int = 100,
+    progress: Optional[Callable[[int, int], None]] = None,
+    size: bool = False,
+) -> RemoveSummary:
+    """Remove every target path in batches, grouped by filesystem.
+
+    Arguments:
+        targets (List): (filesystem, path) pairs to remove.
+        dryrun (bool): Only log and size the paths that would be removed.
+        jobs (int): Number of directories listed, and batches removed, at once.
+        batch_size (int): Number of paths passed to each `fs.rm` call.
+        progress (Callable): Called with the number of paths removed by each
+            batch and the total number of paths to remove.
+        size (bool): Size directories with a listing of everything under
+            them.  Files are sized by the listing that finds them either way,
+            dry runs always size.
+
+    Returns: RemoveSummary of the paths, files and bytes removed.
+    """
+    start = time.perf_counter()
+    found = find_existing(targets, jobs)
+    existing = [target for target, _ in found]
+    for _, path in existing:
+        if dryrun:
+            logger.info(f"STEEL_TOES:dryrun-remove | '{path}'")
+        else:
+            logger.info(f"STEEL_TOES:deleting | '{path}'")
+
+    directories = [target for target, info in found if info.get("type") == "directory"]
+    files = sum(1 for _, info in found if info.get("type") != "directory")
+    nbytes = sum(
+        info.get("size") or 0 for _, info in found if info.get("type") != "directory"
+    )
+    sized: Optional[Tuple[int, int]] = (files, nbytes)
+    if directories and (size or dryrun):
+        for dir_files, dir_bytes in _map(_size, directories, jobs):
+            files, nbytes = files + dir_files, nbytes + dir_bytes
+        sized = (files, nbytes)
+    elif directories:
+        sized = None
+
+    if not dryrun:
+        batches = [
+            (fs, paths[i : i + batch_size])
+            for fs, paths in group_by_fs(existing).values()
+            for i in range(0, len(paths), batch_size)
+        ]
+
+        def remove(batch: Tuple[Any, List[str]]) -> int:
+            fs, paths = batch
+            fs.rm(paths, recursive=True)
+            return len(paths)
+
+        # progress is reported from this thread so callers such as a click
+        # progressbar never have to be thread safe
+        with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+            for done in as_completed([executor.submit(remove, b) for b in batches]):
+                removed = done.result()
+                if progress is not None:
+                    progress(removed, len(existing))
+
+    return RemoveSummary(
+        paths=[path for _, path in existing],
+        files=None if sized is None else sized[0],
+        bytes=None if sized is None else sized[1],
+        seconds=time.perf_counter() - start,
+    )
@@ -0,0 +1,130 @@
+"""
+Branch resolution shared with ParallelRunner worker processes.
+
+`ParallelRunner` pickles the catalog into a worker process for every node,
+anything a worker swaps or saves never makes it back to the parent, or to the
+next worker.  Instead every dataset of the run is resolved once in the parent,
+outputs included, into a `ResolutionTable` that is pickled along with the
+catalog.  Workers apply the table without touching storage and report their
+saves to a spool directory that the parent collects after the run, or
+discards when the run fails.
+"""
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from kedro.io.data_catalog import DataCatalog
+
+from steel_toes.protected import PROTECTED
+from steel_toes.registry import REGISTRY
+from steel_toes.steel_toes import _inject_overlay, _swap, inject_branch, is_swapped
+
+TABLE_ATTR = "_steel_toes_table"
+
+
+def is_parallel(run_params: Optional[Dict[str, Any]]) -> bool:
+    """Check if the run_params of a kedro run are for a ParallelRunner."""
+    return "ParallelRunner" in str((run_params or {}).get("runner", ""))
+
+
+class ResolutionTable:
+    """Where every dataset of a run resolves to, decided in the parent process.
+
+    Arguments:
+        branch (str): git branch of the run.
+        paths (Dict): {dataset: branched path} of swapped datasets.
+        overlays (List): partitioned and versioned datasets overlaid by branch.
+        reports (Path): spool directory that workers report their saves to.
+    """
+
+    def __init__(
+        self,
+        branch: str,
+        paths: Dict[str, str],
+        overlays: List[str],
+        reports: str,
+    ) -> None:
+        """Initialize a table, owned by the process creating it."""
+        self.branch = branch
+        self.paths = paths
+        self.overlays = overlays
+        self.reports = reports
+        self.pid = os.getpid()
+
+    @classmethod
+    def resolve(
+        cls,
+        branch: str,
+        catalog: DataCatalog,
+        outputs: Iterable[str],
+        ignore_types: List = [],
+    ) -> "ResolutionTable":
+        """Swap outputs to the branch and record every branched dataset.
+
+        Inputs are expected to be resolved already.  Outputs are swapped up
+        front, a node only runs after the nodes producing its inputs, so every
+        worker loads what the previous one saved.
+        """
+        for dataset in sorted(outputs):
+            inject_branch(
+                branch,
+                catalog,
+                dataset,
+                save_mode=True,
+                hook="before_pipeline_run",
+                ignore_types=ignore_types,
+            )
+        paths, overlays = {}, []
+        for d, protection in PROTECTED.of(catalog):
+            if hasattr(d, "_filepath_swapped"):
+                paths[protection.dataset] = protection.branched
+            else:
+                overlays.append(protection.dataset)
+        reports = tempfile.mkdtemp(prefix="steel-toes-")
+        table = cls(branch, paths, overlays, reports)
+        setattr(catalog, TABLE_ATTR, table)
+        return table
+
+    @property
+    def in_worker(self) -> bool:
+        """Whether this copy of the table was shipped to another process."""
+        return os.getpid() != self.pid
+
+    def apply(self, catalog: DataCatalog) -> None:
+        """Swap any dataset of catalog that the table branched, without probing.
+
+        A no-op on catalogs pickled with their swaps, which is all of them
+        unless a dataset drops attributes when it is pickled.
+        """
+        for dataset, path in self.paths.items():
+            d = getattr(catalog.datasets, dataset, None)
+            if d is None or is_swapped(d):
+                continue
+            filepath = getattr(d, REGISTRY.resolve(type(d)).path)
+            _swap(d, type(filepath)(path), "worker", dataset, catalog=catalog)
+        for dataset in self.overlays:
+            _inject_overlay(self.branch, catalog, dataset, hook="worker")
+
+    def report(self, dataset: str, path: Any) -> None:
+        """Report a save made in this process to the parent."""
+        with open(Path(self.reports) / f"{os.getpid()}.jsonl", "a") as f:
+            f.write(json.dumps({"dataset": dataset, "path": str(path)}) + "\n")
+
+    def collect(self) -> List[Dict[str, str]]:
+        """Read the saves reported by every worker, and remove the spool."""
+        saves = []
+        for path in sorted(Path(self.reports).glob("*.jsonl")):
+            for line in path.read_text().splitlines():
+                try:
+                    saves.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        self.discard()
+        return saves
+
+    def discard(self) -> None:
+        """Remove the spool and every save reported to it."""
+        shutil.rmtree(self.reports, ignore_errors=True)
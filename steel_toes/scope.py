@@ -0,0 +1,211 @@
+"""
+Code change aware scoping of branched runs.
+
+A feature branch usually changes a node function or two, yet getting its
+branched outputs means running the whole pipeline again.  The working tree is
+diffed against the merge-base of the branch and a base branch, and the
+changed lines are matched against the source lines of every node function.
+Only the changed nodes and the nodes downstream of them need to run, every
+other input resolves to the data already saved on the base, or on a parent
+branch with `SteelToes(ancestry=True)`.
+
+Changes to a module outside of its node functions, imports, constants or
+helpers, mark every node defined in that module as changed.  Changes to other
+modules the node functions call, and to config, are not traced.
+"""
+import codecs
+import inspect
+import re
+import subprocess
+import sys
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple, Union
+
+from kedro.pipeline import Pipeline
+
+from steel_toes.steel_toes import logger
+
+Lines = Tuple[int, int]
+
+_HUNK = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+
+
+class Scope(NamedTuple):
+    """The part of a pipeline a branch needs to run."""
+
+    merge_base: str
+    changed: List[str]
+    nodes: List[str]
+    inputs: List[str]
+
+
+def _git(directory: Union[str, Path], *args: str) -> str:
+    return subprocess.check_output(["git", *args], cwd=str(directory)).decode()
+
+
+def _unquote(name: str) -> str:
+    """Undo the C style quoting git uses for unusual file names."""
+    if not (name.startswith('"') and name.endswith('"')):
+        return name
+    raw = codecs.escape_decode(name[1:-1].encode())[0]
+    return raw.decode(errors="surrogateescape")
+
+
+def parse_diff(diff: str, root: Path) -> Dict[Path, List[Lines]]:
+    """Parse a `git diff -U0 --dst-prefix=b/` into the changed lines of every file.
+
+    A hunk that only removes lines marks the lines on either side of it.
+
+    Returns: {absolute path: [(first, last) line]}
+    """
+    changes: Dict[Path, List[Lines]] = {}
+    path: Optional[Path] = None
+    for line in diff.splitlines():
+        if line.startswith("+++ "):
+            name = _unquote(line[4:].rstrip("\t"))
+            path = None if name == "/dev/null" else (root / name[2:]).resolve()
+            continue
+        match = _HUNK.match(line)
+        if match is None or path is None:
+            continue
+        start = int(match.group(1))
+        count = 1 if match.group(2) is None else int(match.group(2))
+        end = start + count - 1 if count else start + 1
+        changes.setdefault(path, []).append((start, end))
+    return changes
+
+
+def changed_lines(
+    directory: Union[str, Path] = ".", base: str = "main"
+) -> Tuple[str, Dict[Path, List[Lines]]]:
+    """Diff the working tree against the merge-base of HEAD and base.
+
+    Uncommitted changes count, new python files that are not tracked yet
+    count as changed as a whole.
+
+    Returns: (merge-base sha, {absolute path: [(first, last) line]})
+    """
+    root = Path(_git(directory, "rev-parse", "--show-toplevel").strip())
+    merge_base = _git(directory, "merge-base", "HEAD", base).strip()
+    # the prefixes are set explicitly, diff.noprefix or diff.mnemonicPrefix
+    # in a users config would change them
+    diff = _git(
+        root,
+        "-c",
+        "core.quotePath=false",
+        "diff",
+        "-U0",
+        "--no-color",
+        "--no-ext-diff",
+        "--src-prefix=a/",
+        "--dst-prefix=b/",
+        merge_base,
+        "--",
+        "*.py",
+    )
+    changes = parse_diff(diff, root)
+    untracked = _git(
+        root, "ls-files", "-z", "--others", "--exclude-standard", "--", "*.py"
+    )
+    for name in untracked.split("\0"):
+        if name:
+            changes[(root / name).resolve()] = [(1, sys.maxsize)]
+    return merge_base, changes
+
+
+def _source(func: Any) -> Optional[Tuple[Path, Lines]]:
+    """Get the file and line range a node function is defined at."""
+    while isinstance(func, partial):
+        func = func.func
+    func = inspect.unwrap(func)
+    try:
+        filename = inspect.getsourcefile(func)
+        lines, start = inspect.getsourcelines(func)
+    except (TypeError, OSError):
+        return None
+    if filename is None:
+        return None
+    return Path(filename).resolve(), (start, start + len(lines) - 1)
+
+
+def _overlaps(a: Lines, b: Lines) -> bool:
+    return a[0] <= b[1] and b[0] <= a[1]
+
+
+def changed_nodes(pipeline: Pipeline, changes: Dict[Path, List[Lines]]) -> List[str]:
+    """Get the nodes of pipeline whose source changed, in pipeline order."""
+    sources = {node.name: _source(node.func) for node in pipeline.nodes}
+    by_file: Dict[Path, List[Lines]] = {}
+    for source in sources.values():
+        if source is not None:
+            by_file.setdefault(source[0], []).append(source[1])
+
+    changed: Set[str] = set()
+    for name, source in sources.items():
+        if source is None or source[0] not in changes:
+            continue
+        path, lines = source
+        for hunk in changes[path]:
+            # a change outside every node function of the module, such as an
+            # import, a constant or a helper, may change any of them
+            outside = not any(_overlaps(hunk, other) for other in by_file[path])
+            if outside or _overlaps(hunk, lines):
+                changed.add(name)
+                break
+    return [node.name for node in pipeline.nodes if node.name in changed]
+
+
+def scope(
+    pipeline: Pipeline, directory: Union[str, Path] = ".", base: str = "main"
+) -> Scope:
+    """Work out the nodes of pipeline that need to run on the current branch.
+
+    Arguments:
+        pipeline (Pipeline): pipeline to scope.
+        directory (Path): directory in the git repository.  Defaults to '.'
+        base (str): branch to diff against the merge-base with.  Defaults to
+            "main".
+
+    Returns: Scope of the changed nodes, every node downstream of them, and the
+    inputs those nodes load from base or parent branch data.
+    """
+    merge_base, changes = changed_lines(directory, base)
+    changed = changed_nodes(pipeline, changes)
+    scoped = pipeline.from_nodes(*changed) if changed else Pipeline([])
+    logger.info(
+        f"STEEL_TOES:scope | {len(changed)} changed, "
+        f"{len(scoped.nodes)} of {len(pipeline.nodes)} nodes to run"
+    )
+    return Scope(
+        merge_base=merge_base,
+        changed=changed,
+        nodes=[node.name for node in scoped.nodes],
+        inputs=sorted(scoped.inputs()),
+    )
+
+
+def run_scoped(
+    directory: Union[str, Path] = ".",
+    base: str = "main",
+    pipeline_name: Optional[str] = None,
+    env: Optional[str] = None,
+    dryrun: bool = False,
+) -> Scope:
+    """Run only the nodes of a kedro pipeline changed since base, and downstream.
+
+    Needs a full kedro project, the pipelines are only registered once the
+    project is bootstrapped.
+    """
+    from kedro.framework.project import pipelines
+    from kedro.framework.session import KedroSession
+    from kedro.framework.startup import bootstrap_project
+
+    project_path = Path(directory).absolute()
+    bootstrap_project(project_path)
+    result = scope(pipelines[pipeline_name or "__default__"], project_path, base)
+    if dryrun or not result.nodes:
+        return result
+    with KedroSession.create(project_path=project_path, env=env) as session:
+        session.run(pipeline_name=pipeline_name, node_names=result.nodes)
+    return result
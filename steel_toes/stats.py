@@ -0,0 +1,142 @@
+"""
+Instrumentation of the steel toes hot path.
+
+Each `SteelToes` hook keeps a `Stats` of how long every hook took, how long
+each branched filepath took to probe, how many storage calls were made and
+how many datasets were swapped, skipped or ignored.  Probes report their
+storage calls through `record_probe`, which costs nothing unless a hook is
+recording.  Reports are written as json so `steel-toes stats` can compare
+runs.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from statistics import median
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+STATS_DIR = ".steel_toes/stats"
+OUTCOMES = ["swapped", "skipped", "ignored"]
+
+_RECORDING: Dict["Stats", int] = {}
+_LOCK = threading.Lock()
+
+
+def record_probe(paths: Iterable[Any], seconds: float, calls: int = 1) -> None:
+    """Record a storage call that answered whether paths exist.
+
+    A no-op unless a hook is recording.
+    """
+    if not _RECORDING:
+        return
+    paths = [str(path) for path in paths]
+    for stats in list(_RECORDING):
+        stats.probe(paths, seconds, calls)
+
+
+class Stats:
+    """Counters and timings of the steel toes hooks in this process."""
+
+    def __init__(self) -> None:
+        """Initialize empty counters."""
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget everything recorded so far."""
+        with self._lock:
+            self.started = time.time()
+            self.hooks: Dict[str, Dict[str, float]] = {}
+            self.probes: Dict[str, float] = {}
+            self.storage_calls = 0
+            self.outcomes = {outcome: 0 for outcome in OUTCOMES}
+
+    @contextmanager
+    def hook(self, name: str) -> Iterator[None]:
+        """Time a hook call and record the storage calls made during it."""
+        start = time.perf_counter()
+        with _LOCK:
+            _RECORDING[self] = _RECORDING.get(self, 0) + 1
+        try:
+            yield
+        finally:
+            with _LOCK:
+                _RECORDING[self] -= 1
+                if not _RECORDING[self]:
+                    del _RECORDING[self]
+            seconds = time.perf_counter() - start
+            with self._lock:
+                timing = self.hooks.setdefault(name, {"calls": 0, "seconds": 0.0})
+                timing["calls"] += 1
+                timing["seconds"] += seconds
+
+    def probe(self, paths: List[str], seconds: float, calls: int = 1) -> None:
+        """Record a storage call, every path waited seconds for its answer."""
+        with self._lock:
+            self.storage_calls += calls
+            for path in paths:
+                self.probes[path] = self.probes.get(path, 0.0) + seconds
+
+    def count(self, outcomes: Dict[str, int]) -> None:
+        """Add the number of datasets swapped, skipped and ignored."""
+        with self._lock:
+            for outcome, n in outcomes.items():
+                self.outcomes[outcome] = self.outcomes.get(outcome, 0) + n
+
+    def report(self, **extra: Any) -> Dict[str, Any]:
+        """Everything recorded, with the slowest probes first."""
+        with self._lock:
+            return {
+                **extra,
+                "started": self.started,
+                "hooks": {name: dict(timing) for name, timing in self.hooks.items()},
+                "storage_calls": self.storage_calls,
+                "outcomes": dict(self.outcomes),
+                "probes": dict(
+                    sorted(self.probes.items(), key=lambda p: p[1], reverse=True)
+                ),
+            }
+
+    def write(self, directory: Union[str, Path] = STATS_DIR, **extra: Any) -> Path:
+        """Write the report into directory, one file per run."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.localtime(self.started))
+        path = directory / f"{stamp}-{os.getpid()}.json"
+        path.write_text(json.dumps(self.report(**extra), indent=2))
+        return path
+
+
+def read_reports(
+    directory: Union[str, Path] = STATS_DIR, last: int = 5
+) -> List[Dict[str, Any]]:
+    """Read the latest reports, oldest first."""
+    paths = sorted(Path(directory).glob("*.json"))[-last:] if last else []
+    return [json.loads(path.read_text()) for path in paths]
+
+
+def hook_seconds(report: Dict[str, Any]) -> float:
+    """Total time spent in the hooks of a run."""
+    return sum(timing["seconds"] for timing in report["hooks"].values())
+
+
+def slowest(reports: List[Dict[str, Any]], top: int = 10) -> List[Tuple[str, float]]:
+    """Paths with the highest mean probe latency across reports."""
+    latencies: Dict[str, List[float]] = {}
+    for report in reports:
+        for path, seconds in report["probes"].items():
+            latencies.setdefault(path, []).append(seconds)
+    means = {path: sum(s) / len(s) for path, s in latencies.items()}
+    return sorted(means.items(), key=lambda p: p[1], reverse=True)[:top]
+
+
+def regression(reports: List[Dict[str, Any]]) -> Optional[float]:
+    """How many times slower the latest run was than the median of the others."""
+    if len(reports) < 2:
+        return None
+    baseline = median(hook_seconds(report) for report in reports[:-1])
+    if not baseline:
+        return None
+    return hook_seconds(reports[-1]) / baseline
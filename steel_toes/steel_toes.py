@@ -4,18 +4,35 @@ Core functionality of steel toes.
 This module does all of the real work to get the current branch and inject it
 into fielpaths.
 """
-import copy
 import logging
 import os
 import subprocess
-from pathlib import Path
-from typing import Any, List, Optional, Union
+from pathlib import Path, PurePosixPath
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 from colorama import Fore
-from kedro.framework.session import KedroSession
-from kedro.framework.startup import bootstrap_project
 from kedro.io.data_catalog import DataCatalog
 
+from steel_toes.dedup import unshare
+from steel_toes.git import read_head
+from steel_toes.layout import current_layout
+from steel_toes.partitioned import branch_path, is_partitioned, overlay_branch
+from steel_toes.probe import PROBES, exists_each
+from steel_toes.protected import PROTECTED, SWAP_MARKERS
+from steel_toes.registry import REGISTRY
+from steel_toes.remove import RemoveSummary, Target, remove_paths
+from steel_toes.versioned import is_versioned, overlay_versions, versioned_targets
+
 logger = logging.getLogger("steel_toes")
 logger.setLevel(logging.INFO)
 
@@ -35,8 +52,14 @@ def get_current_branch(proj_dir: Union[str, Path, None] = None) -> Optional[str]
 def get_current_git_branch(proj_dir: Union[str, Path, None] = None) -> Optional[str]:
     """Git branch of working tree.
 
+    HEAD is read directly from the git directory, `git` is only run when it
+    cannot be found.
+
     Returns: Git branch or None.
     """
+    branch = read_head(proj_dir)
+    if branch is not None:
+        return branch
     proj_dir = str(proj_dir or Path.cwd())
     try:
         res = subprocess.check_output(
@@ -48,17 +71,169 @@ def get_current_git_branch(proj_dir: Union[str, Path, None] = None) -> Optional[
     return None
 
 
-def branched_dataset_exists(dataset: Any, branched_filepath: str) -> bool:
-    """Check if branched filepath exists.
+def _branch_candidate(
+    branch: Optional[str],
+    catalog: DataCatalog,
+    dataset: str,
+    ignore_types: List = [],
+) -> Optional[Tuple[Any, Any]]:
+    """Get the dataset and its branched filepath if it is eligible for a swap.
+
+    Returns: (dataset, branched_filepath) or None
+    """
+    if branch is None:  # pragma: no cover
+        # branch is not mocked
+        branch = ""
+    d = getattr(catalog.datasets, dataset, None)
+    strategy = REGISTRY.resolve(type(d), ignore_types)
+    if strategy.ignore or hasattr(d, "_filepath_swapped"):
+        return None
+
+    filepath = getattr(d, strategy.path, None)
+    if filepath is None:
+        return None
+
+    return d, strategy.branch(filepath, branch)
+
+
+def is_swapped(d: Any) -> bool:
+    """Check if dataset d is branched, by a swap or an overlay."""
+    return any(hasattr(d, marker) for marker in SWAP_MARKERS)
 
-    Filepath swapping ensures that we utilize the datasets existing _exists() method.
 
-    Returns: bools - whether branched_filepath exists or not
+def _inject_overlay(
+    branch: Optional[str],
+    catalog: DataCatalog,
+    dataset: str,
+    hook: str = "",
+    ignore_types: List = [],
+) -> bool:
+    """Overlay branch on a partitioned or versioned dataset.
+
+    Partitioned and versioned datasets are never probed, an overlay of a
+    branch without any partitions or versions loads exactly the base.
+
+    Returns: whether dataset is partitioned or versioned, and handled here.
     """
-    copied_dataset = copy.copy(dataset)
-    copied_dataset._filepath = branched_filepath
-    # needs type conversion kedro implemnets ANY
-    return True if copied_dataset._exists() else False
+    d = getattr(catalog.datasets, dataset, None)
+    if not (is_partitioned(d) or is_versioned(d)):
+        return False
+    if (
+        branch
+        and not is_swapped(d)
+        and not REGISTRY.resolve(type(d), ignore_types).ignore
+    ):
+        base = d._path if is_partitioned(d) else d._filepath
+        if is_partitioned(d):
+            overlay_branch(d, branch_path(d._path, branch), hook)
+            PROTECTED.add(d, dataset, base, d._path, hook, catalog=catalog)
+        elif overlay_versions(d, branch, hook):
+            branched = f"{d._branch_root}/*/{d._branch_name}"
+            PROTECTED.add(d, dataset, base, branched, hook, catalog=catalog)
+    return True
+
+
+def branched_paths(
+    branch: Optional[str],
+    catalog: DataCatalog,
+    datasets: Iterable[str],
+    ignore_types: List = [],
+) -> Dict[str, Tuple[Any, Any]]:
+    """Get the dataset and branched filepath of datasets, swapped or not.
+
+    Unlike the hooks this ignores whether a dataset has already been swapped,
+    the branched filepath is always derived from the base filepath, which makes
+    it suitable for tooling that works on branches other than the current one.
+    Versioned datasets are branched inside their version tree instead, and
+    are left out.
+
+    Returns: {dataset_name: (dataset, branched_filepath)}
+    """
+    paths = {}
+    for dataset in datasets:
+        d = getattr(catalog.datasets, dataset, None)
+        strategy = REGISTRY.resolve(type(d), ignore_types)
+        filepath = getattr(d, "_filepath_base", getattr(d, strategy.path, None))
+        if filepath is None or strategy.ignore or is_versioned(d):
+            continue
+        paths[dataset] = (d, strategy.branch(filepath, branch or ""))
+    return paths
+
+
+def _swap(
+    d: Any,
+    branched_filepath: Any,
+    hook: str = "",
+    dataset: str = "",
+    branch: str = "",
+    catalog: Optional[DataCatalog] = None,
+) -> None:
+    """Swap the path of dataset d to branched_filepath, as registered for its class.
+
+    The swap is recorded in `PROTECTED` for catalog under the name dataset,
+    along with the branch the data belongs to.  A dataset swapped again keeps
+    its base.
+    """
+    path = REGISTRY.resolve(type(d)).path
+    filepath = getattr(d, path)
+    logger.info(
+        (
+            f"STEEL_TOES:{hook} "
+            f"'{PurePosixPath(str(filepath)).name}' -> "
+            f"'{PurePosixPath(str(branched_filepath)).name}'"
+        )
+    )
+    base = d.__dict__.get("_filepath_base", filepath)
+    d._filepath_base = base
+    setattr(d, path, branched_filepath)
+    d._filepath_swapped = True
+    PROTECTED.add(d, dataset, base, branched_filepath, hook, branch, catalog)
+
+
+def inherited(d: Any, branch: Optional[str]) -> bool:
+    """Check if dataset d is swapped onto the data of a parent branch."""
+    protection = PROTECTED.get(d)
+    return protection is not None and protection.branch not in ("", branch or "")
+
+
+def _reclaim(
+    branch: Optional[str], catalog: DataCatalog, dataset: str, hook: str = ""
+) -> bool:
+    """Swap a dataset inherited from a parent branch back onto branch.
+
+    Saves never write to the data of a parent branch.
+
+    Returns: whether dataset was inherited, and is now swapped onto branch.
+    """
+    d = getattr(catalog.datasets, dataset, None)
+    if not branch or not inherited(d, branch):
+        return False
+    strategy = REGISTRY.resolve(type(d))
+    branched_filepath = strategy.branch(d._filepath_base, branch)
+    _swap(d, branched_filepath, hook, dataset, branch, catalog)
+    return True
+
+
+def _chain(
+    branch: Optional[str],
+    ancestors: Sequence[str],
+    catalog: DataCatalog,
+    dataset: str,
+    ignore_types: List = [],
+) -> List[Tuple[str, Tuple[Any, Any]]]:
+    """Get the (branch, candidate) of dataset for branch and each of its ancestors.
+
+    Returns: nothing when dataset is not eligible for a swap.
+    """
+    candidate = _branch_candidate(branch, catalog, dataset, ignore_types)
+    if candidate is None:
+        return []
+    chain = [(branch or "", candidate)]
+    for ancestor in ancestors:
+        chain.append(
+            (ancestor, _branch_candidate(ancestor, catalog, dataset, ignore_types))
+        )
+    return chain
 
 
 def inject_branch(
@@ -69,6 +244,7 @@ def inject_branch(
     reset: bool = False,
     hook: str = "",
     ignore_types: List = [],
+    ancestors: Sequence[str] = (),
 ) -> None:
     """Inject branch into _filepath attribute of dataset.
 
@@ -78,97 +254,204 @@ def inject_branch(
     Example:
     "data/02_intermediate/iris.csv" -> "data/02_intermediate/iris_main.csv"
 
+    Without branch data the data of the first of ancestors that has any is
+    loaded instead, saves always go to branch.  A branched file hardlinked to
+    its base by dedup is unlinked before it is saved again.
     """
-    if branch is None:  # pragma: no cover
-        # branch is not mocked
-        branch = ""
-    try:
-        d = getattr(catalog.datasets, dataset)
-        filepath = d._filepath
-    except AttributeError:
+    if reset:  # pragma: nocover
+        # needed for cli, without mocking a full project `steel-toes clean-branch`
+        # cannot be tested, but the clean_branch function itself will still be
+        # tested.
         return
 
-    if hasattr(d, "_filepath_swapped") and not reset:
+    if _inject_overlay(branch, catalog, dataset, hook, ignore_types):
         return
-
-    if filepath is None:
+    if save_mode:
+        if not _reclaim(branch, catalog, dataset, hook):
+            for owner, (d, branched_filepath) in _chain(
+                branch, [], catalog, dataset, ignore_types
+            ):
+                _swap(d, branched_filepath, hook, dataset, owner, catalog)
+        # the save truncates the branched file, never through a hardlink
+        unshare(getattr(catalog.datasets, dataset, None))
         return
 
-    for _type in ignore_types:
-        if isinstance(d, _type):
+    chain = _chain(branch, ancestors, catalog, dataset, ignore_types)
+    if not chain:
+        return
+    exists = exists_each([candidate for _, candidate in chain])
+    for (owner, (d, branched_filepath)), found in zip(chain, exists):
+        if found:
+            _swap(d, branched_filepath, hook, dataset, owner, catalog)
             return
 
-    if not reset:
-        branchstr = branch if branch == "" else f"_{branch}"
-        branched_filepath = (
-            filepath.parent / f"{filepath.stem}{branchstr}{filepath.suffix}"
-        )
-    else:
-        return
 
-    if branched_dataset_exists(d, branched_filepath) or save_mode or reset:
-        logger.info(
-            (
-                f"STEEL_TOES:{hook} "
-                f"'{d._filepath.stem}{d._filepath.suffix}' -> "
-                f"'{branched_filepath.stem}{branched_filepath.suffix}'"
-            )
-        )
-        d._filepath = branched_filepath
-        d._filepath_swapped = True
+def inject_branches(
+    branch: Optional[str],
+    catalog: DataCatalog,
+    datasets: Iterable[str],
+    hook: str = "",
+    ignore_types: List = [],
+    workers: int = 1,
+    probe: Union[str, Callable[..., List[bool]]] = "exists",
+    ancestors: Sequence[str] = (),
+) -> Dict[str, int]:
+    """Inject branch into the _filepath of many datasets if the branch exists.
+
+    Existence checks are the slow part on remote storage.  They are made by
+    the `probe` strategy, "exists" checks each dataset on its own as registered
+    for its class in `steel_toes.registry`,
+    "listing" lists each directory once, or any callable with the same
+    signature as the probes in `steel_toes.probe`.  When workers > 1 the
+    checks are fanned out over a thread pool.  Swaps are always applied
+    afterwards on the calling thread in the order of datasets, so the results
+    and logs are the same as calling `inject_branch` on each dataset.
+    Partitioned and versioned datasets are overlaid without a check.
+
+    With ancestors, datasets without branch data fall back to the data of
+    the first ancestor that has any.  Every dataset is checked on every
+    branch of the chain in the same single call to the probe.
+
+    Returns: number of datasets "swapped", "skipped" because they have no
+    branch data or were already swapped, and "ignored" because they cannot be
+    branched.  With ancestors, "inherited" counts the swaps onto the data of
+    an ancestor.
+    """
+    outcomes = {"swapped": 0, "skipped": 0, "ignored": 0}
+    if ancestors:
+        outcomes["inherited"] = 0
+    names, owners, candidates = [], [], []
+    for dataset in datasets:
+        d = getattr(catalog.datasets, dataset, None)
+        swapped = is_swapped(d)
+        if _inject_overlay(branch, catalog, dataset, hook, ignore_types):
+            if swapped:
+                outcomes["skipped"] += 1
+            elif is_swapped(d):
+                outcomes["swapped"] += 1
+            else:
+                outcomes["ignored"] += 1
+            continue
+        chain = _chain(branch, ancestors, catalog, dataset, ignore_types)
+        for owner, candidate in chain:
+            names.append(dataset)
+            owners.append(owner)
+            candidates.append(candidate)
+        if chain:
+            continue
+        if swapped:
+            outcomes["skipped"] += 1
+        else:
+            outcomes["ignored"] += 1
+
+    if isinstance(probe, str):
+        probe = PROBES[probe]
+    exists = probe(candidates, workers=workers)
+
+    # the chain of each dataset is in order, the first level found wins
+    found: Dict[str, Tuple[str, Tuple[Any, Any]]] = {}
+    for dataset, owner, candidate, branched_exists in zip(
+        names, owners, candidates, exists
+    ):
+        if branched_exists:
+            found.setdefault(dataset, (owner, candidate))
+    for dataset in dict.fromkeys(names):
+        if dataset not in found:
+            outcomes["skipped"] += 1
+            continue
+        owner, (d, branched_filepath) = found[dataset]
+        _swap(d, branched_filepath, hook, dataset, owner, catalog)
+        outcomes["swapped"] += 1
+        if owner != (branch or ""):
+            outcomes["inherited"] += 1
+    return outcomes
+
+
+def load_catalog(context=None) -> DataCatalog:
+    """Load the catalog of the kedro project in the current directory.
+
+    Tests do not create a full project structure and need to pass context.
+    """
+    if context is None:
+        # importing the session is slow, commands that only need the catalog
+        # config never pay for it
+        from kedro.framework.session import KedroSession
+        from kedro.framework.startup import bootstrap_project
 
-    if reset:  # pragma: nocover
-        # needed for cli, without mocking a full project `steel-toes clean-branch`
-        # cannot be tested, but the clean_branch function itself will still be
-        # tested.
-        delattr(d, "_filepath_swapped")
+        bootstrap_project(Path(".").absolute())
+        session = KedroSession.create()
+        context = session.load_context()
+    return context.catalog
 
 
-def rm_dataset(catalog: DataCatalog, dataset: str, dryrun: bool = False) -> None:
-    """Delete a single datasets if branched.
+def branch_targets(branch: str, catalog: DataCatalog) -> List[Target]:
+    """Get the (filesystem, path) of every potential branched dataset.
 
-    If the dataset was saved under the currently set branch it will have a
-    _filepath_swapped attribute attached to it and can be safely deleted when
-    running this function.  When dryrun=True the datasets that would be removed
-    will simply be printed out.
+    Paths are derived from the base filepath so any branch can be targeted,
+    not only the one the catalog is currently swapped to.  An empty branch
+    would target base data and returns nothing.  A prefixed layout targets
+    the prefix of the branch instead.
     """
-    try:
-        d = getattr(catalog.datasets, dataset)
-    except AttributeError:
-        return
-    try:
-        filepath = d._filepath
-    except AttributeError:
-        return
-
-    if not hasattr(d, "_filepath_swapped"):  # pragma: nocover
-        # extra protection against deleting files
-        return
-
-    if dryrun:
-        logger.info(f"STEEL_TOES:dryrun-remove | '{filepath}'")
-
-    else:
-        logger.info(f"STEEL_TOES:deleting | '{filepath}'")
-        d._fs.delete(filepath, recursive=True)
+    if not branch:
+        return []
+    if current_layout().prefixed:
+        return prefix_targets(branch, catalog)
+    targets = [
+        (d._fs, str(branched_filepath))
+        for d, branched_filepath in branched_paths(
+            branch, catalog, catalog.list()
+        ).values()
+        if hasattr(d, "_fs")
+    ]
+    for dataset in catalog.list():
+        d = getattr(catalog.datasets, dataset, None)
+        if is_partitioned(d):
+            path = getattr(d, "_path_base", d._path)
+            targets.append((d._filesystem, branch_path(path, branch)))
+        elif is_versioned(d) and hasattr(d, "_fs"):
+            targets.extend(
+                (d._fs, path) for path in versioned_targets(d._fs, d._filepath, branch)
+            )
+    return targets
 
 
-def switch_branch(
-    directory: Union[str, Path], catalog: DataCatalog, branch: str
-) -> None:
-    """Switch branch being used.
+def base_paths(catalog: DataCatalog, versions: bool = False) -> List[Target]:
+    """Get the (filesystem, base path) of every dataset stored on a filesystem.
 
-    This is particularly useful for the cleanup command as it
-    allows for the user to cleanup when they no longer have the branch active.
+    With versions, the `<filepath>/*/<name>` files of every version of a
+    versioned dataset are added as well, its branched files sit next to them.
     """
-    current_branch = get_current_git_branch(directory)
-    if current_branch is None:  # pragma: no cover
-        # branch is not mocked
-        return
-    for dataset in set(catalog.list()):
-        inject_branch(current_branch, catalog, dataset, reset=True)
-    for dataset in set(catalog.list()):
-        inject_branch(branch, catalog, dataset)
+    bases = []
+    for dataset in catalog.list():
+        d = getattr(catalog.datasets, dataset, None)
+        if is_partitioned(d):
+            path = getattr(d, "_path_base", d._path)
+            bases.append((d._filesystem, d._filesystem._strip_protocol(path)))
+            continue
+        filepath = getattr(d, "_filepath_base", getattr(d, "_filepath", None))
+        if filepath is not None and hasattr(d, "_fs"):
+            bases.append((d._fs, str(filepath)))
+            if versions and is_versioned(d):
+                root = PurePosixPath(str(filepath))
+                bases.append((d._fs, str(root / "*" / root.name)))
+    return bases
+
+
+def prefix_targets(branch: str, catalog: DataCatalog) -> List[Target]:
+    """Get the (filesystem, prefix) holding all data of branch, one per data root.
+
+    Only used with a prefixed layout, where removing a branch is one
+    recursive delete of its prefix however many datasets it branched.
+    """
+    layout = current_layout()
+    targets: Dict[Tuple[str, str], Target] = {}
+    for fs, path in base_paths(catalog):
+        prefix = layout.prefix(path, branch)
+        if prefix is not None:
+            # datasets each hold their own filesystem, the protocol tells
+            # whether two of them share the same prefix
+            targets.setdefault((str(fs.protocol), prefix), (fs, prefix))
+    return list(targets.values())
 
 
 def clean_branch(
@@ -176,7 +459,11 @@ def clean_branch(
     branch: str = None,
     dryrun: bool = False,
     context=None,
-) -> None:
+    jobs: int = 1,
+    batch_size: int = 100,
+    progress: Optional[Callable[[int, int], None]] = None,
+    size: bool = False,
+) -> RemoveSummary:
     """Iterate over the catalog to remove branched datasets.
 
     Arguments:
@@ -184,23 +471,28 @@ def clean_branch(
         branch (str): git branch to clean files from. Defaults to current branch.
         dryrun (bool): Displays the files that would be deleted using the
             specified command without actually deleting them.
-
+        jobs (int): Number of directories listed, and batches deleted, at once.
+        batch_size (int): Number of paths deleted by each filesystem call.
+        progress (Callable): Called with the number of paths deleted by each
+            batch and the total number of paths to delete.
+        size (bool): Also count the files and bytes under deleted
+            directories, dry runs always count them.
+
+    Returns: RemoveSummary of the paths, files and bytes removed.
     """
-    if context is None:
-        # tests do not create a full project structure an need to pass context
-        bootstrap_project(Path(".").absolute())
-        session = KedroSession.create()
-        context = session.load_context()
-    catalog = context.catalog
-    if branch is not None:
-        switch_branch(directory=directory, catalog=catalog, branch=branch)
-    datasets = [
-        d
-        for d in catalog.list()
-        if hasattr(getattr(catalog.datasets, d, ""), "_filepath")
-    ]
-    for dataset in datasets:
-        rm_dataset(catalog=catalog, dataset=dataset, dryrun=dryrun)
+    catalog = load_catalog(context)
+    if branch is None:
+        branch = get_current_branch(directory)
+    summary = remove_paths(
+        branch_targets(branch, catalog),
+        dryrun=dryrun,
+        jobs=jobs,
+        batch_size=batch_size,
+        progress=progress,
+        size=size,
+    )
+    if not summary.paths:
+        logger.info("STEEL_TOES: No Datasets to remove.")
     if dryrun:
         logger.info(
             (
@@ -208,30 +500,25 @@ def clean_branch(
                 "Run 'kedro run clean-branch' to remove them."
             )
         )
+    return summary
 
 
 def whos_protected(catalog: DataCatalog = None) -> List[str]:
-    """List datasets protected by steel_toes.
+    """List datasets protected by steel_toes, in the order they were swapped.
 
     Only lists datasets that are currently branched off, not potentially
-    branched datasets.
+    branched datasets.  Read from the records `PROTECTED` keeps for catalog,
+    the cost grows with the number of datasets protected in this catalog
+    rather than the size of the catalog.
     """
     if catalog is None:
         ...
-    protected = list()
-    for dataset in catalog.list():
-        try:
-            d = getattr(catalog.datasets, dataset)
-            if hasattr(d, "_filepath_swapped"):
-                protected.append(dataset)
-        except AttributeError:
-            pass
-    return protected
+    return [protection.dataset for _, protection in PROTECTED.of(catalog)]
 
 
 def announce_protection(catalog: DataCatalog) -> None:
     """Pretty print datasets that are protected."""
-    protected = whos_protected(catalog)
+    protected = PROTECTED.of(catalog)
     if len(protected) == 0:
         print(
             f"{Fore.LIGHTBLACK_EX}STEEL-TOES |{Fore.RED} NO DATASETS PROETECTED{Fore.RESET}"
@@ -241,14 +528,7 @@ def announce_protection(catalog: DataCatalog) -> None:
         f"{Fore.LIGHTBLACK_EX}STEEL-TOES |{Fore.YELLOW}{len(protected)}{Fore.GREEN} DATASETS PROETECTED{Fore.RESET}"
     )
 
-    for dataset in protected:
-        try:
-            d = getattr(catalog.datasets, dataset)
-            print(
-                f"{Fore.LIGHTBLACK_EX}{dataset}: {Fore.LIGHTMAGENTA_EX}{d._filepath}{Fore.RESET}"
-            )
-        except AttributeError:  # pragma: no cover
-            pass
-        except AttributeError:  # pragma: no cover
-            pass
-            pass
+    for _, protection in protected:
+        print(
+            f"{Fore.LIGHTBLACK_EX}{protection.dataset}: {Fore.LIGHTMAGENTA_EX}{protection.branched}{Fore.RESET}"
+        )
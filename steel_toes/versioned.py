@@ -0,0 +1,192 @@
+"""
+Version level branching for steel toes.
+
+Versioned datasets keep a tree of versions at their `_filepath`,
+`<filepath>/<version>/<name>`, and kedro globs that tree for the latest
+version on load.  In the suffix layout a branch lives inside the same tree,
+one level down, saving `<filepath>/<version>/<stem>_<branch><suffix>`.  The
+base glob of kedro never matches a branched file, and a single glob of
+`<filepath>/*/<stem>*<suffix>` finds the latest version of both the branch
+and the base.  The prefix layout keeps a version tree of its own under the
+branch prefix, globbed once more.  Globs are made once per run and kept on
+the dataset, so a branched versioned dataset lists its versions no more often
+than it needs to.
+"""
+import logging
+import time
+from pathlib import PurePosixPath
+from typing import Any, Dict, List, Optional, Tuple
+
+from kedro.io.core import VersionNotFoundError
+
+from steel_toes.layout import current_layout
+from steel_toes.partitioned import _methods
+from steel_toes.stats import record_probe
+
+try:
+    from kedro.io.core import AbstractVersionedDataset
+except ImportError:  # pragma: no cover
+    # kedro<0.18.12
+    from kedro.io.core import AbstractVersionedDataSet as AbstractVersionedDataset
+
+logger = logging.getLogger("steel_toes")
+
+
+def is_versioned(dataset: Any) -> bool:
+    """Check if dataset is a tree of versions."""
+    return (
+        getattr(dataset, "_version", None) is not None
+        and getattr(dataset, "_filepath", None) is not None
+    )
+
+
+def branch_versions(filepath: Any, branch: str) -> Tuple[PurePosixPath, str]:
+    """Version tree and file name of the branch versions of filepath.
+
+    Example, in the suffix layout:
+    "data/02_intermediate/iris.csv" -> ("data/02_intermediate/iris.csv", "iris_main.csv")
+
+    """
+    root, name = current_layout().versions(PurePosixPath(str(filepath)), branch)
+    return PurePosixPath(str(root)), name
+
+
+def latest_versions(
+    glob: Any, filepath: Any, names: List[str]
+) -> Dict[str, Optional[str]]:
+    """Find the latest version of every name in the version tree of filepath.
+
+    Every name shares the stem and suffix of filepath, so one glob finds them
+    all.
+
+    Returns: {name: latest version, or None without any}
+    """
+    root = PurePosixPath(str(filepath))
+    pattern = str(root / "*" / f"{root.stem}*{root.suffix}")
+    start = time.perf_counter()
+    paths = list(glob(pattern))
+    record_probe([pattern], time.perf_counter() - start)
+
+    latest: Dict[str, Optional[str]] = {name: None for name in names}
+    for path in paths:
+        path = PurePosixPath(path)
+        version = path.parent.name
+        if path.name in latest and version > (latest[path.name] or ""):
+            latest[path.name] = version
+    return latest
+
+
+class VersionedOverlay:
+    """Saves branched files into the branch version tree of a versioned dataset.
+
+    `_branch_root` is the version tree of the branch, the base tree in the
+    suffix layout, and `_branch_name` the name of the branched file in each
+    version.  Loads take the latest branched version when there is one,
+    otherwise the latest base version, pinned load versions always load the
+    base.  The methods are copied onto a direct subclass of each dataset
+    class by `overlay_class`.
+    """
+
+    def _latest(self) -> Dict[str, Optional[str]]:
+        """Latest version of the "branch" and the "base", globbed once per run.
+
+        Kept apart from `_version_cache`, which kedro clears on every release.
+        """
+        latest = self.__dict__.get("_latest_versions")
+        if latest is None:
+            glob, base, name = (
+                self._glob_function,
+                self._filepath.name,
+                self._branch_name,
+            )
+            if self._branch_root == self._filepath:
+                found = latest_versions(glob, self._filepath, [name, base])
+                latest = {"branch": found[name], "base": found[base]}
+            else:
+                latest = {
+                    "branch": latest_versions(glob, self._branch_root, [name])[name],
+                    "base": latest_versions(glob, self._filepath, [base])[base],
+                }
+            self._latest_versions = latest
+        return latest
+
+    def _fetch_latest_load_version(self) -> str:
+        latest = self._latest()
+        version = latest["branch"] or latest["base"]
+        if version is None:
+            raise VersionNotFoundError(f"Did not find any versions for {self}")
+        return version
+
+    def _get_load_path(self) -> PurePosixPath:
+        if self._version.load:
+            return self._filepath / self._version.load / self._filepath.name
+        version = self._fetch_latest_load_version()
+        if self._latest()["branch"] == version:
+            return self._branch_root / version / self._branch_name
+        return self._filepath / version / self._filepath.name
+
+    def _get_versioned_path(self, version: str) -> PurePosixPath:
+        return self._branch_root / version / self._branch_name
+
+    def _save(self, data: Any) -> None:
+        # the overlay is a direct subclass of the dataset class
+        type(self).__mro__[1]._save(self, data)
+        self._latest()["branch"] = self.resolve_save_version()
+
+
+_OVERLAYS: Dict[type, type] = {}
+
+
+def overlay_class(cls: type) -> type:
+    """Get the overlay class of a versioned dataset class, made once per class."""
+    if cls not in _OVERLAYS:
+        name = f"Branched{cls.__name__}"
+        namespace = {
+            **_methods(VersionedOverlay),
+            "__module__": __name__,
+            "__qualname__": name,
+            "__doc__": f"`{cls.__name__}` saving a branch into its version tree.",
+        }
+        _OVERLAYS[cls] = type(name, (cls,), namespace)
+        # found by name on this module, so overlaid datasets can be pickled
+        globals().setdefault(name, _OVERLAYS[cls])
+    return _OVERLAYS[cls]
+
+
+def overlay_versions(d: Any, branch: str, hook: str = "") -> bool:
+    """Save the branch into the version tree of versioned dataset d.
+
+    Returns: whether d could be overlaid, only kedro's versioned datasets can.
+    """
+    if not isinstance(d, AbstractVersionedDataset):
+        return False
+    d._branch_root, d._branch_name = branch_versions(d._filepath, branch)
+    logger.info(
+        f"STEEL_TOES:{hook} '{d._filepath.name}' -> "
+        f"'{d._branch_root.name}/*/{d._branch_name}' (versions)"
+    )
+    d.__class__ = overlay_class(type(d))
+    d._version_swapped = True
+    return True
+
+
+def versioned_targets(fs: Any, filepath: Any, branch: str) -> List[str]:
+    """Get every branched path in the version tree of filepath.
+
+    Versions holding nothing but the branched file are targeted as a whole,
+    so removing them leaves no empty version behind.  A branch version tree
+    of its own is targeted as a whole.
+    """
+    tree, name = branch_versions(filepath, branch)
+    root = str(filepath).rstrip("/")
+    if str(tree) != root:
+        return [str(tree)] if fs.exists(str(tree)) else []
+    files: Dict[str, List[str]] = {}
+    for path in fs.glob(f"{root}/*/*"):
+        path = PurePosixPath(path)
+        files.setdefault(str(path.parent), []).append(path.name)
+    return [
+        version if names == [name] else f"{version}/{name}"
+        for version, names in sorted(files.items())
+        if name in names
+    ]
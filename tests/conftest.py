@@ -0,0 +1,37 @@
+"""Configuration shared by the catalog level tests."""
+from pathlib import Path
+from typing import Callable
+
+import pandas as pd
+import pytest
+from kedro.extras.datasets.pandas import CSVDataSet
+from kedro.io.data_catalog import DataCatalog
+
+DATASETS = [f"dataset_{i}" for i in range(20)]
+
+
+@pytest.fixture
+def make_catalog(tmp_path: Path) -> Callable[[], DataCatalog]:
+    """Build a fresh catalog of csv datasets in tmp_path on every call.
+
+    Every dataset has base data saved, every other dataset also has data saved
+    under the `bob` branch.
+    """
+    df = pd.DataFrame({"col1": [1, 2], "col2": [4, 5]})
+    for i, dataset in enumerate(DATASETS):
+        layer = tmp_path / f"layer_{i % 3}"
+        CSVDataSet(filepath=str(layer / f"{dataset}.csv")).save(df)
+        if i % 2 == 0:
+            CSVDataSet(filepath=str(layer / f"{dataset}_bob.csv")).save(df)
+
+    def _make_catalog() -> DataCatalog:
+        return DataCatalog(
+            {
+                dataset: CSVDataSet(
+                    filepath=str(tmp_path / f"layer_{i % 3}" / f"{dataset}.csv")
+                )
+                for i, dataset in enumerate(DATASETS)
+            }
+        )
+
+    return _make_catalog
@@ -0,0 +1,97 @@
+"""Module to test falling back through the parent branches of a branch."""
+import pandas as pd
+from git import Repo
+
+from steel_toes import SteelToes
+from steel_toes.git import ancestry
+from steel_toes.probe import PROBES
+from steel_toes.protected import PROTECTED
+from steel_toes.steel_toes import inject_branch, inject_branches
+
+from .conftest import DATASETS
+
+
+def commit(repo, path, message):
+    """Commit a change to the README of repo."""
+    (path / "README.md").write_text(message)
+    repo.index.add([str(path / "README.md")])
+    repo.index.commit(message)
+
+
+def test_ancestry(tmp_path):
+    """Parents are the branches with tips on the branch but not on base."""
+    repo = Repo.init(tmp_path)
+    commit(repo, tmp_path, "init")
+    repo.git.branch("-M", "main")
+    repo.git.checkout("-b", "other")
+    commit(repo, tmp_path, "other")
+    repo.git.checkout("main")
+    repo.git.checkout("-b", "feature-a")
+    commit(repo, tmp_path, "a")
+    repo.git.checkout("-b", "feature-b")
+    commit(repo, tmp_path, "b")
+    repo.git.checkout("-b", "feature-c")
+    # a branch on the same commit is not a parent, whichever was created first
+    assert ancestry(tmp_path, "feature-c", "main") == ["feature-a"]
+    commit(repo, tmp_path, "c")
+    repo.git.branch("feature-d")
+
+    assert ancestry(tmp_path, "feature-c", "main") == ["feature-b", "feature-a"]
+    assert ancestry(tmp_path) == ["feature-b", "feature-a"]
+    assert ancestry(tmp_path, "feature-a", "main") == []
+    assert ancestry(tmp_path, "main", "main") == []
+    assert ancestry(tmp_path, "not-a-branch", "main") == []
+
+
+def test_chain_is_probed_once(tmp_path, make_catalog, mocker):
+    """Every dataset is checked on every level in one call, the nearest wins."""
+    df = pd.DataFrame({"col1": [1]})
+    catalog = make_catalog()
+    for i, dataset in enumerate(DATASETS):
+        if i % 3 == 0:
+            filepath = getattr(catalog.datasets, dataset)._filepath
+            df.to_csv(filepath.with_name(f"{dataset}_alice.csv"))
+    probe = mocker.Mock(wraps=PROBES["exists"])
+
+    outcomes = inject_branches(
+        "carol", catalog, catalog.list(), probe=probe, ancestors=["bob", "alice"]
+    )
+    assert probe.call_count == 1
+    assert len(probe.call_args[0][0]) == 3 * len(DATASETS)
+    owners = {
+        protection.dataset: protection.branch for _, protection in PROTECTED.of(catalog)
+    }
+    expected = {
+        dataset: "bob" if i % 2 == 0 else "alice"
+        for i, dataset in enumerate(DATASETS)
+        if i % 2 == 0 or i % 3 == 0
+    }
+    assert owners == expected
+    assert outcomes["inherited"] == outcomes["swapped"] == len(expected)
+
+
+def test_saves_never_write_to_a_parent(make_catalog):
+    """An inherited dataset is swapped onto the branch before it is saved."""
+    catalog = make_catalog()
+    inject_branches("carol", catalog, ["dataset_0"], ancestors=["bob"])
+    d = catalog.datasets.dataset_0
+    assert d._filepath.name == "dataset_0_bob.csv"
+
+    inject_branch("carol", catalog, "dataset_0", save_mode=True)
+    assert d._filepath.name == "dataset_0_carol.csv"
+    assert d._filepath_base.name == "dataset_0.csv"
+    assert PROTECTED.get(d).branch == "carol"
+
+
+def test_hook_reads_ancestry_once(make_catalog, mocker):
+    """The hook reads the chain from git once and falls back through it."""
+    read = mocker.patch("steel_toes.hook.ancestry", return_value=["bob"])
+    hook = SteelToes(branch="carol", ancestry=True)
+    catalog = make_catalog()
+    hook.after_catalog_created(catalog=catalog)
+    hook.after_catalog_created(catalog=make_catalog())
+
+    assert read.call_count == 1
+    assert catalog.datasets.dataset_2._filepath.name == "dataset_2_bob.csv"
+    hook.after_node_run(catalog=catalog, outputs={"dataset_2": None})
+    assert catalog.datasets.dataset_2._filepath.name == "dataset_2_carol.csv"
@@ -0,0 +1,48 @@
+"""Module to test the existence cache shared between hooks."""
+from steel_toes import SteelToes, whos_protected
+from steel_toes.cache import ExistenceCache
+
+from .conftest import DATASETS
+
+
+def test_cache_across_runs(make_catalog, mocker):
+    """A second catalog in the same process is resolved from the cache."""
+    exists = mocker.spy(ExistenceCache, "set")
+    hook = SteelToes(branch="bob", cache_size=100)
+    hook.after_catalog_created(make_catalog())
+    assert hook.cache.info()["misses"] == len(DATASETS)
+    assert exists.call_count == len(DATASETS)
+
+    catalog = make_catalog()
+    hook.after_catalog_created(catalog)
+    assert hook.cache.info()["hits"] == len(DATASETS)
+    assert exists.call_count == len(DATASETS)
+    assert whos_protected(catalog) == DATASETS[::2]
+
+
+def test_save_invalidates(make_catalog):
+    """Saving a dataset forgets its cached negative result."""
+    hook = SteelToes(branch="bob", cache_size=100)
+    catalog = make_catalog()
+    hook.after_catalog_created(catalog)
+    d = catalog.datasets.dataset_1
+    key = hook.cache.key(d, d._filepath.with_name("dataset_1_bob.csv"))
+    assert hook.cache.get(key) is False
+
+    hook.after_node_run(catalog, {"dataset_1": None})
+    assert hook.cache.get(key) is None
+
+
+def test_lru_and_ttl(mocker):
+    """Least recently used entries are evicted and entries expire."""
+    cache = ExistenceCache(maxsize=2, ttl=10)
+    cache.set(("", "a"), True)
+    cache.set(("", "b"), False)
+    cache.get(("", "a"))
+    cache.set(("", "c"), True)
+    assert cache.get(("", "b")) is None
+    assert cache.get(("", "a")) is True
+
+    monotonic = mocker.patch("steel_toes.cache.time.monotonic")
+    monotonic.return_value = 1e12
+    assert cache.get(("", "a")) is None
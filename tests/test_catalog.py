@@ -0,0 +1,149 @@
+"""Module to test reading the catalog config without a kedro session."""
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from steel_toes.catalog import (
+    LightCatalog,
+    light_context,
+    read_catalog,
+    settings_conf_source,
+)
+from steel_toes.steel_toes import clean_branch
+
+CATALOG = """
+_csv: &csv
+  type: pandas.CSVDataSet
+
+cars:
+  <<: *csv
+  filepath: data/01_raw/cars.csv
+
+boats:
+  type: pandas.ParquetDataSet
+  filepath: data/02_intermediate/boats.pq
+  versioned: true
+
+memory:
+  type: MemoryDataSet
+"""
+
+
+def project(path: Path, catalog: str = CATALOG) -> Path:
+    """Write a kedro project holding only catalog config."""
+    (path / "conf" / "base").mkdir(parents=True)
+    (path / "conf" / "local").mkdir()
+    (path / "conf" / "base" / "catalog.yml").write_text(catalog)
+    return path
+
+
+def test_light_catalog(tmp_path):
+    """File based entries become datasets, anchors and memory datasets do not."""
+    catalog = LightCatalog(project(tmp_path))
+    assert sorted(catalog.list()) == ["boats", "cars"]
+    assert catalog.entries["boats"]["versioned"]
+    assert str(catalog.datasets.cars._filepath) == str(
+        tmp_path / "data/01_raw/cars.csv"
+    )
+    assert not catalog.datasets.cars._exists()
+
+
+def test_local_overrides_base(tmp_path):
+    """Entries in the local env win over base."""
+    project(tmp_path)
+    (tmp_path / "conf" / "local" / "catalog.yml").write_text(
+        "cars:\n  type: pandas.CSVDataSet\n  filepath: data/local/cars.csv\n"
+    )
+    catalog = LightCatalog(tmp_path)
+    assert str(catalog.datasets.cars._filepath).endswith("data/local/cars.csv")
+
+
+def test_cache_follows_mtime(tmp_path):
+    """The cached config is reused until a config file changes."""
+    project(tmp_path)
+    cache = tmp_path / ".steel_toes" / "catalog.json"
+    assert "cars" in read_catalog(tmp_path)
+    assert cache.exists()
+
+    # a stale cache with a matching signature is trusted
+    content = cache.read_text().replace("cars.csv", "trucks.csv")
+    cache.write_text(content)
+    assert read_catalog(tmp_path)["cars"]["filepath"] == "data/01_raw/trucks.csv"
+
+    config = tmp_path / "conf" / "base" / "catalog.yml"
+    config.write_text(CATALOG)
+    stat = config.stat()
+    os.utime(config, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert read_catalog(tmp_path)["cars"]["filepath"] == "data/01_raw/cars.csv"
+
+
+def test_templated_needs_session(tmp_path):
+    """Templated paths and credentials fall back to a kedro session."""
+    project(
+        tmp_path,
+        "cars:\n  type: pandas.CSVDataSet\n  filepath: ${base}/cars.csv\n",
+    )
+    assert light_context(tmp_path) is None
+
+    (tmp_path / "conf" / "base" / "catalog.yml").write_text(
+        "cars:\n  type: pandas.CSVDataSet\n  filepath: s3://b/cars.csv\n"
+        "  credentials: s3\n"
+    )
+    assert light_context(tmp_path) is None
+
+
+def test_unmodelled_types_need_session(tmp_path):
+    """Partitioned entries and dataset factories fall back to a kedro session."""
+    project(
+        tmp_path,
+        CATALOG
+        + "parts:\n  type: PartitionedDataSet\n  path: data/01_raw/parts\n"
+        + "  dataset: pandas.CSVDataSet\n",
+    )
+    assert read_catalog(tmp_path, cache=None)["parts"]["partitioned"]
+    assert light_context(tmp_path) is None
+
+    (tmp_path / "conf" / "base" / "catalog.yml").write_text(
+        CATALOG
+        + '"{name}_data":\n  type: pandas.CSVDataSet\n'
+        + "  filepath: data/01_raw/{name}.csv\n"
+    )
+    assert light_context(tmp_path) is None
+
+
+def test_clean_branch_light(tmp_path):
+    """clean_branch removes branched data found through the light catalog."""
+    project(tmp_path)
+    raw = tmp_path / "data" / "01_raw"
+    raw.mkdir(parents=True)
+    pd.DataFrame({"a": [1]}).to_csv(raw / "cars.csv")
+    pd.DataFrame({"a": [1]}).to_csv(raw / "cars_bob.csv")
+
+    clean_branch(tmp_path, branch="bob", context=light_context(tmp_path))
+    assert (raw / "cars.csv").exists()
+    assert not (raw / "cars_bob.csv").exists()
+
+
+def test_conf_source_from_settings(tmp_path, monkeypatch):
+    """The CONF_SOURCE of the project settings is read without importing them."""
+    project(tmp_path / "settings_conf")
+    (tmp_path / "pyproject.toml").write_text(
+        '[tool.kedro]\npackage_name = "cars"\nproject_name = "cars"\n'
+    )
+    (tmp_path / "src" / "cars").mkdir(parents=True)
+    (tmp_path / "src" / "cars" / "settings.py").write_text(
+        'import not_installed\n\nCONF_SOURCE = "settings_conf/conf"\n'
+    )
+    assert settings_conf_source(tmp_path) == "settings_conf/conf"
+    assert sorted(LightCatalog(tmp_path).list()) == ["boats", "cars"]
+
+    cache = tmp_path / "cache" / "catalog.json"
+    monkeypatch.setenv("STEEL_TOES_CATALOG_CACHE", str(cache))
+    assert sorted(light_context(tmp_path).catalog.list()) == ["boats", "cars"]
+    assert cache.exists()
+
+    (tmp_path / "src" / "cars" / "settings.py").write_text(
+        "CONF_SOURCE = str(Path(__file__).parent / 'conf')\n"
+    )
+    assert light_context(tmp_path) is None
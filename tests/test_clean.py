@@ -0,0 +1,58 @@
+"""Module to test cleaning branched datasets."""
+import logging
+from types import SimpleNamespace
+
+from steel_toes import clean_branch
+
+from .conftest import DATASETS
+
+
+def test_dryrun_lists_what_would_be_removed(make_catalog, caplog):
+    """Dry runs log every branched path that exists without removing it."""
+    catalog = make_catalog()
+    context = SimpleNamespace(catalog=catalog)
+    with caplog.at_level(logging.INFO, logger="steel_toes"):
+        summary = clean_branch(branch="bob", dryrun=True, context=context)
+
+    removed = [
+        r.getMessage() for r in caplog.records if "dryrun-remove | '" in r.getMessage()
+    ]
+    assert len(removed) == len(summary.paths) == len(DATASETS[::2])
+    assert all(catalog.datasets.dataset_0._fs.exists(path) for path in summary.paths)
+
+
+def test_clean_in_batches(make_catalog, mocker):
+    """Branched paths are deleted in batches and summarised."""
+    catalog = make_catalog()
+    fs = catalog.datasets.dataset_0._fs
+    rm = mocker.spy(type(fs), "rm")
+    progress = mocker.Mock()
+
+    summary = clean_branch(
+        branch="bob",
+        context=SimpleNamespace(catalog=catalog),
+        jobs=4,
+        batch_size=3,
+        progress=progress,
+    )
+
+    assert summary.files == len(DATASETS[::2])
+    assert summary.bytes > 0
+    assert rm.call_count == 4
+    assert sum(call.args[0] for call in progress.call_args_list) == summary.files
+    assert not any(fs.exists(path) for path in summary.paths)
+    assert all(getattr(catalog.datasets, d)._exists() for d in DATASETS)
+
+
+def test_clean_lists_each_directory_once(make_catalog, mocker):
+    """Existence and size come from one listing per directory, never a find."""
+    catalog = make_catalog()
+    fs = catalog.datasets.dataset_0._fs
+    ls = mocker.spy(type(fs), "ls")
+    find = mocker.spy(type(fs), "find")
+
+    summary = clean_branch(branch="bob", context=SimpleNamespace(catalog=catalog))
+
+    assert ls.call_count == 3
+    assert find.call_count == 0
+    assert summary.files == len(DATASETS[::2])
@@ -0,0 +1,109 @@
+"""Module to test deduplicating branched datasets identical to their base."""
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from kedro.pipeline import Pipeline, node
+
+from steel_toes import SteelToes, whos_protected
+from steel_toes.dedup import dedup_dataset, same_content
+from steel_toes.steel_toes import inject_branch
+
+from .test_hook import identity, run
+
+
+def increment(data):
+    """Change data so it no longer matches the base."""
+    return data + 1
+
+
+@pytest.fixture
+def pipeline():
+    """One node saving data identical to base, one node changing it."""
+    return Pipeline(
+        [
+            node(identity, "dataset_0", "dataset_1"),
+            node(increment, "dataset_1", "dataset_3"),
+        ]
+    )
+
+
+def test_same_content(tmp_path, make_catalog):
+    """Files are equal only when every chunk is."""
+    fs = make_catalog().datasets.dataset_0._fs
+    for name, content in [("a", b"x" * 10), ("b", b"x" * 10), ("c", b"x" * 9 + b"y")]:
+        (tmp_path / name).write_bytes(content)
+    assert same_content(fs, str(tmp_path / "a"), str(tmp_path / "b"), chunk_size=3)
+    assert same_content(fs, str(tmp_path / "a"), str(tmp_path / "c"), 3) is None
+
+
+def test_drop_identical(tmp_path, make_catalog, pipeline, monkeypatch):
+    """Identical outputs are dropped and read from base, changes are kept."""
+    monkeypatch.chdir(tmp_path)
+    catalog = make_catalog()
+    run(SteelToes(branch="bob", dedup="drop"), catalog, pipeline)
+
+    assert catalog.datasets.dataset_1._filepath.name == "dataset_1.csv"
+    assert not (tmp_path / "layer_1" / "dataset_1_bob.csv").exists()
+    assert (tmp_path / "layer_0" / "dataset_3_bob.csv").exists()
+    assert "dataset_1" not in whos_protected(catalog)
+    record = json.loads((tmp_path / ".steel_toes" / "dedup" / "bob.json").read_text())
+    assert list(record["datasets"]) == ["dataset_1"]
+    assert record["datasets"]["dataset_1"]["mode"] == "drop"
+
+
+def test_hardlink_identical(tmp_path, make_catalog):
+    """Identical local files become hardlinks to the base."""
+    catalog = make_catalog()
+    inject_branch("bob", catalog, "dataset_0")
+    d = catalog.datasets.dataset_0
+    assert dedup_dataset(d, "hardlink") is not None
+    assert d._filepath.name == "dataset_0_bob.csv"
+    assert os.stat(d._filepath).st_ino == os.stat(d._filepath_base).st_ino
+    assert Path(d._filepath).exists()
+
+
+def test_hardlink_is_unshared_before_save(
+    tmp_path, make_catalog, pipeline, monkeypatch
+):
+    """Saving the branch again after a hardlink never writes onto the base."""
+    monkeypatch.chdir(tmp_path)
+    df = pd.DataFrame({"col1": [1, 2], "col2": [4, 5]})
+    catalog = make_catalog()
+    inject_branch("carol", catalog, "dataset_1", save_mode=True)
+    catalog.save("dataset_1", df)
+    d = catalog.datasets.dataset_1
+    base = Path(d._filepath_base)
+    before = base.read_text()
+    assert dedup_dataset(d, "hardlink") is not None
+
+    fresh = make_catalog()
+    inject_branch("carol", fresh, "dataset_1", save_mode=True)
+    fresh.save("dataset_1", pd.DataFrame({"a": [99, 99]}))
+    assert base.read_text() == before
+    assert fresh.load("dataset_1")["a"].tolist() == [99, 99]
+
+    run(SteelToes(branch="bob", dedup="hardlink"), make_catalog(), pipeline)
+    assert Path(d._filepath_base).samefile(base.with_name("dataset_1_bob.csv"))
+    run(
+        SteelToes(branch="bob"),
+        make_catalog(),
+        Pipeline([node(increment, "dataset_0", "dataset_1")]),
+    )
+    assert base.read_text() == before
+    assert base.with_name("dataset_1_bob.csv").read_text() != before
+
+
+def test_keep_copies_with_ancestors(
+    tmp_path, make_catalog, pipeline, monkeypatch, mocker
+):
+    """With a parent branch a copy equal to base is kept, the parent may differ."""
+    monkeypatch.chdir(tmp_path)
+    mocker.patch("steel_toes.hook.ancestry", return_value=["bob"])
+    catalog = make_catalog()
+    run(SteelToes(branch="carol", dedup="drop", ancestry=True), catalog, pipeline)
+
+    assert (tmp_path / "layer_1" / "dataset_1_carol.csv").exists()
+    assert "dataset_1" in whos_protected(catalog)
@@ -0,0 +1,119 @@
+"""Module to test garbage collecting data from old branches."""
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import pandas as pd
+from git import Repo
+
+from steel_toes.gc import gc, parse_branch
+
+from .conftest import DATASETS
+
+
+def git_repo(path):
+    """Make a repo with a live branch, and a branch merged into main."""
+    path.mkdir()
+    (path / "README.md").write_text("content")
+    repo = Repo.init(path)
+    repo.index.add([str(path / "README.md")])
+    repo.index.commit("init")
+    repo.git.branch("-M", "main")
+    repo.git.branch("done")
+    repo.git.checkout("-b", "alive")
+    (path / "README.md").write_text("changed")
+    repo.index.add([str(path / "README.md")])
+    repo.index.commit("change")
+    return path
+
+
+def test_parse_branch():
+    """The longest stem wins when stems share a prefix."""
+    stems = [("iris", ".csv"), ("iris_raw", ".csv")]
+    assert parse_branch("iris_raw_bob.csv", stems) == "bob"
+    assert parse_branch("iris_bob.csv", stems) == "bob"
+    assert parse_branch("iris.csv", stems) is None
+    assert parse_branch("iris_.csv", stems) is None
+
+
+def test_gc(tmp_path, make_catalog):
+    """Data of deleted and merged branches is removed, live data is kept."""
+    repo = git_repo(tmp_path / "repo")
+    # bob only lives on in the reflog of HEAD
+    Repo(repo).git.checkout("-b", "bob")
+    Repo(repo).git.checkout("alive")
+    Repo(repo).git.branch("-D", "bob")
+    catalog = make_catalog()
+    df = pd.DataFrame({"col1": [1]})
+    layer = Path(catalog.datasets.dataset_1._filepath.parent)
+    alive = layer / "dataset_1_alive.csv"
+    done = layer / "dataset_1_done.csv"
+    for path in [alive, done]:
+        df.to_csv(path)
+    context = SimpleNamespace(catalog=catalog)
+    state = tmp_path / "gc.json"
+
+    report = gc(repo, dryrun=True, state=state, context=context)
+    assert sorted(report.orphans) == ["bob"]
+    assert len(report.orphans["bob"]) == len(DATASETS[::2])
+    assert sorted(report.kept) == ["alive", "done"]
+    assert done.exists()
+
+    report = gc(repo, base="main", state=state, jobs=4, context=context)
+    assert sorted(report.orphans) == ["bob", "done"]
+    assert report.summary.files == len(DATASETS[::2]) + 1
+    assert alive.exists() and not done.exists()
+    assert json.loads(state.read_text())["kept"] == {str(alive): "alive"}
+    assert all(getattr(catalog.datasets, d)._exists() for d in DATASETS)
+
+
+def test_gc_only_removes_proven_branch_data(tmp_path, make_catalog):
+    """Files merely named like branch data are reported and kept."""
+    repo = git_repo(tmp_path / "repo")
+    catalog = make_catalog()
+    layer = Path(catalog.datasets.dataset_1._filepath.parent)
+    old, v2, recorded = (layer / f"dataset_1_{name}.csv" for name in ["old", "v2", "x"])
+    for path in [old, v2, recorded]:
+        path.write_text("col1\n1\n")
+    manifests = tmp_path / "manifests"
+    manifests.mkdir()
+    (manifests / "x.json").write_text(
+        json.dumps({"branch": "x", "datasets": {"dataset_1": str(recorded)}})
+    )
+    state = tmp_path / "gc.json"
+    state.write_text(json.dumps({str(v2): "v2"}))
+
+    report = gc(
+        repo, state=state, manifest=manifests, context=SimpleNamespace(catalog=catalog)
+    )
+    assert sorted(report.orphans) == ["v2", "x"]
+    assert sorted(report.unproven) == ["bob", "old"]
+    assert old.exists() and not v2.exists() and not recorded.exists()
+    assert (
+        Path(catalog.datasets.dataset_0._filepath)
+        .with_name("dataset_0_bob.csv")
+        .exists()
+    )
+
+
+def test_gc_lists_changed_directories(tmp_path, make_catalog, mocker):
+    """Repeat runs only list the directories that changed since the last one."""
+    repo = git_repo(tmp_path / "repo")
+    catalog = make_catalog()
+    context = SimpleNamespace(catalog=catalog)
+    fs = catalog.datasets.dataset_0._fs
+    ls = mocker.spy(type(fs), "ls")
+
+    gc(repo, state="gc.json", context=context)
+    assert ls.call_count == 3
+    assert (repo / "gc.json").exists()
+
+    gc(repo, state="gc.json", context=context)
+    assert ls.call_count == 3
+
+    layer = Path(catalog.datasets.dataset_1._filepath.parent)
+    (layer / "dataset_1_done.csv").write_text("col1\n1\n")
+    report = gc(repo, base="main", state="gc.json", context=context)
+    # the changed directory, and once more to find what to remove
+    assert ls.call_count == 5
+    assert report.orphans == {"done": [str(layer / "dataset_1_done.csv")]}
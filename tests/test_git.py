@@ -1,10 +1,12 @@
 """Module to test how steel-toes interprets your git branch automatically."""
 import os
+import subprocess
 
 import pytest
 from git import Repo
 
 from steel_toes.core import get_current_branch, get_current_git_branch
+from steel_toes.git import clear_cache, find_git_dir, read_head, read_refs, resolve_ref
 
 
 def git_repo(tmpdir, branch="main"):
@@ -64,3 +66,83 @@ def test_prefers_environment_variables_change_git(tmpdir, branch):
     os.environ["STEEL_TOES_BRANCH"] = "main"
     git_repo(tmpdir, branch)
     assert get_current_branch() == "main"
+
+
+def rev_parse(path):
+    """Branch as reported by git itself."""
+    return (
+        subprocess.check_output(
+            ["git", "rev-parse", "--abbrev-ref", "HEAD"], cwd=str(path)
+        )
+        .decode()
+        .strip()
+    )
+
+
+@pytest.mark.parametrize("branch", BRANCHES)
+def test_read_head_matches_git(tmpdir, branch):
+    """Reading HEAD directly gives the same branch as git."""
+    git_repo(tmpdir, branch)
+    clear_cache()
+    assert read_head(tmpdir) == rev_parse(tmpdir) == branch
+    assert read_head(tmpdir.mkdir("src")) == branch
+
+
+def test_read_head_detached(tmpdir):
+    """A detached HEAD is reported as HEAD, just like git."""
+    repo = Repo(git_repo(tmpdir))
+    repo.git.checkout(repo.head.commit.hexsha)
+    clear_cache()
+    assert read_head(tmpdir) == rev_parse(tmpdir) == "HEAD"
+
+
+def test_read_head_follows_checkout(tmpdir):
+    """The cached HEAD is read again after switching branches."""
+    repo = Repo(git_repo(tmpdir, "one"))
+    assert read_head(tmpdir) == "one"
+    repo.git.checkout("-b", "two")
+    assert read_head(tmpdir) == "two"
+
+
+def test_read_head_after_git_init(tmpdir):
+    """A directory looked up before `git init` finds the repository after."""
+    clear_cache()
+    assert find_git_dir(tmpdir) is None
+    assert read_head(tmpdir) is None
+    git_repo(tmpdir, "late")
+    assert read_head(tmpdir) == "late"
+
+
+def test_read_head_worktree(tmpdir):
+    """Worktrees point to their git directory with a .git file."""
+    repo = Repo(git_repo(tmpdir.mkdir("main")))
+    worktree = tmpdir.join("worktree")
+    repo.git.worktree("add", "-b", "feature", str(worktree))
+    git_dir = find_git_dir(worktree)
+    clear_cache()
+    assert read_head(worktree) == rev_parse(worktree) == "feature"
+    assert resolve_ref(git_dir, "refs/heads/feature") == repo.head.commit.hexsha
+
+
+def test_read_head_submodule(tmpdir):
+    """Submodules point to their git directory with a .git file."""
+    sub = Repo(git_repo(tmpdir.mkdir("sub"), "subbranch"))
+    repo = Repo(git_repo(tmpdir.mkdir("super")))
+    repo.git.execute(
+        ["git", "-c", "protocol.file.allow=always", "submodule", "add"]
+        + [sub.working_dir, "sub"]
+    )
+    clear_cache()
+    module = tmpdir.join("super", "sub")
+    assert module.join(".git").isfile()
+    assert read_head(module) == rev_parse(module)
+
+
+def test_packed_refs(tmpdir):
+    """Refs packed into packed-refs are resolved."""
+    repo = Repo(git_repo(tmpdir, "packed"))
+    repo.git.pack_refs("--all")
+    git_dir = find_git_dir(tmpdir)
+    assert not os.path.exists(git_dir / "refs" / "heads" / "packed")
+    assert resolve_ref(git_dir, "refs/heads/packed") == repo.head.commit.hexsha
+    assert read_refs(git_dir)["refs/heads/packed"] == repo.head.commit.hexsha
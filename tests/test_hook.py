@@ -0,0 +1,117 @@
+"""Module to test the SteelToes hook itself."""
+import sys
+
+import pytest
+from kedro.framework.hooks.manager import _create_hook_manager
+from kedro.pipeline import Pipeline, node
+from kedro.runner import SequentialRunner
+
+from steel_toes import SteelToes, whos_protected
+
+AUDITED = ("open", "os.listdir", "os.scandir", "os.system", "subprocess.Popen")
+_recording = []
+
+
+def _audit(event, args):
+    """Record filesystem and subprocess events while a test is listening."""
+    if _recording and event in AUDITED:
+        _recording[-1].append(event)
+
+
+sys.addaudithook(_audit)
+
+
+@pytest.fixture
+def audit_events():
+    """Collect audited events raised inside the test."""
+    events = []
+    _recording.append(events)
+    yield events
+    _recording.remove(events)
+
+
+def test_init_does_no_work(audit_events, mocker, monkeypatch):
+    """Constructing the hook in settings.py must not touch git or the disk."""
+    monkeypatch.delenv("STEEL_TOES_BRANCH", raising=False)
+    get_current_branch = mocker.spy(
+        sys.modules["steel_toes.hook"], "get_current_branch"
+    )
+    stat = mocker.spy(sys.modules["pathlib"].Path, "stat")
+
+    hook = SteelToes(manifest="data/.steel_toes", cache_size=10, workers=8)
+
+    assert audit_events == []
+    assert get_current_branch.call_count == 0
+    assert stat.call_count == 0
+    assert hook._branch is None
+    assert hook._disabled is None
+
+
+def test_resolved_once_on_first_use(mocker, monkeypatch):
+    """The branch and enablement are resolved on first use and memoised."""
+    monkeypatch.setenv("STEEL_TOES_BRANCH", "bob")
+    monkeypatch.setenv("STEEL_TOES_ENABLED", "no")
+    get_current_branch = mocker.spy(
+        sys.modules["steel_toes.hook"], "get_current_branch"
+    )
+    hook = SteelToes(manifest="data/.steel_toes")
+
+    assert hook.disabled
+    assert hook.branch == "bob"
+    assert hook.manifest.branch == "bob"
+    monkeypatch.setenv("STEEL_TOES_BRANCH", "alice")
+    assert hook.branch == "bob"
+    assert get_current_branch.call_count == 1
+
+
+def identity(data):
+    """Pass data through a node unchanged."""
+    return data
+
+
+def run(hook, catalog, pipeline):
+    """Run pipeline with hook registered the way a kedro session does."""
+    hook_manager = _create_hook_manager()
+    hook_manager.register(hook)
+    hook_manager.hook.after_catalog_created(catalog=catalog)
+    hook_manager.hook.before_pipeline_run(
+        run_params={}, pipeline=pipeline, catalog=catalog
+    )
+    SequentialRunner().run(pipeline, catalog, hook_manager)
+
+
+def test_on_demand_only_resolves_touched_datasets(make_catalog, mocker):
+    """Only datasets loaded or saved by the run are resolved."""
+    probe = mocker.spy(sys.modules["steel_toes.probe"], "fs_exists")
+    catalog = make_catalog()
+    pipeline = Pipeline(
+        [
+            node(identity, "dataset_0", "dataset_1"),
+            node(identity, "dataset_1", "dataset_3"),
+        ]
+    )
+    run(SteelToes(branch="bob", resolution="on_demand"), catalog, pipeline)
+
+    assert probe.call_count == 1
+    assert whos_protected(catalog) == ["dataset_0", "dataset_1", "dataset_3"]
+    assert catalog.datasets.dataset_1._filepath.name == "dataset_1_bob.csv"
+    assert catalog.datasets.dataset_1._exists()
+    assert not hasattr(catalog.datasets.dataset_2, "_steel_toes_resolved")
+
+
+def test_pipeline_only_resolves_pipeline_datasets(make_catalog, mocker):
+    """Only the inputs of the pipeline are probed, outputs are planned."""
+    probe = mocker.spy(sys.modules["steel_toes.probe"], "fs_exists")
+    catalog = make_catalog()
+    pipeline = Pipeline(
+        [
+            node(identity, "dataset_0", "dataset_1"),
+            node(identity, "dataset_1", "dataset_3"),
+        ]
+    )
+    run(SteelToes(branch="bob", resolution="pipeline"), catalog, pipeline)
+
+    assert probe.call_count == 2
+    assert whos_protected(catalog) == ["dataset_0", "dataset_1", "dataset_3"]
+    assert catalog.datasets.dataset_3._filepath.name == "dataset_3_bob.csv"
+    assert catalog.datasets.dataset_3._exists()
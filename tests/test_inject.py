@@ -0,0 +1,132 @@
+"""Module to test how steel-toes injects branches into a catalog."""
+
+import asyncio
+import logging
+from pathlib import PurePosixPath
+
+import pytest
+from fsspec.asyn import AsyncFileSystem
+
+from steel_toes import whos_protected
+from steel_toes.probe import exists_async, exists_by_listing
+from steel_toes.layout import branch_filepath
+from steel_toes.steel_toes import inject_branches
+
+from .conftest import DATASETS
+
+
+def swaps(caplog, make_catalog, **kwargs):
+    """Inject the bob branch into a fresh catalog, return protected and logs."""
+    catalog = make_catalog()
+    caplog.clear()
+    with caplog.at_level(logging.INFO, logger="steel_toes"):
+        inject_branches("bob", catalog, catalog.list(), hook="test", **kwargs)
+    return whos_protected(catalog), [r.getMessage() for r in caplog.records]
+
+
+@pytest.mark.parametrize("workers", [2, 8, 64])
+def test_concurrent_matches_serial(caplog, make_catalog, workers):
+    """Probing over a thread pool swaps the same datasets with the same logs."""
+    serial = swaps(caplog, make_catalog)
+    concurrent = swaps(caplog, make_catalog, workers=workers)
+    assert serial == concurrent
+    assert serial[0] == DATASETS[::2]
+
+
+def test_listing_matches_exists(caplog, make_catalog):
+    """Listing directories swaps the same datasets as calling _exists."""
+    assert swaps(caplog, make_catalog, probe="listing") == swaps(caplog, make_catalog)
+
+
+def test_listing_lists_each_directory_once(caplog, make_catalog, mocker):
+    """Probe cost grows with the number of directories, not datasets."""
+    catalog = make_catalog()
+    fs = catalog.datasets.dataset_0._fs
+    ls = mocker.spy(type(fs), "ls")
+    exists = mocker.spy(type(fs), "exists")
+    inject_branches("bob", catalog, catalog.list(), probe="listing", workers=4)
+    assert ls.call_count == 3
+    assert exists.call_count == 0
+    assert whos_protected(catalog) == DATASETS[::2]
+
+
+class LatencyAsyncFileSystem(AsyncFileSystem):
+    """Async stand-in for object storage with latency on every request."""
+
+    protocol = "latencyasync"
+    cachable = False
+
+    def __init__(self, paths, latency=0.01, **kwargs):
+        """Filesystem where exactly paths exist."""
+        super().__init__(**kwargs)
+        self.paths = set(paths)
+        self.latency = latency
+        self.in_flight = 0
+        self.peak = 0
+        self.received = []
+
+    async def _info(self, path, **kwargs):
+        self.received.append(path)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(self.latency)
+        self.in_flight -= 1
+        if path not in self.paths:
+            raise FileNotFoundError(path)
+        return {"name": path, "size": 0, "type": "file"}
+
+
+def test_async_matches_exists(caplog, make_catalog):
+    """The async probe falls back to _exists for sync filesystems."""
+    assert swaps(caplog, make_catalog, probe="async") == swaps(caplog, make_catalog)
+
+
+@pytest.mark.parametrize("workers, concurrency, peak", [(1, 8, 8), (4, None, 4)])
+def test_async_limits_concurrency(make_catalog, workers, concurrency, peak):
+    """Async filesystems are probed concurrently under a limit."""
+    catalog = make_catalog()
+    fs = LatencyAsyncFileSystem([])
+    candidates = []
+    for dataset in DATASETS:
+        d = getattr(catalog.datasets, dataset)
+        d._fs = fs
+        candidates.append((d, branch_filepath(d._filepath, "bob")))
+    fs.paths = {str(branched_filepath) for _, branched_filepath in candidates[::2]}
+
+    exists = exists_async(candidates, workers=workers, concurrency=concurrency)
+    assert exists == [i % 2 == 0 for i in range(len(DATASETS))]
+    assert fs.peak == peak
+
+
+def test_async_keeps_http_scheme(make_catalog):
+    """http(s) filepaths are probed with the scheme kedro strips from them."""
+    d = make_catalog().datasets.dataset_0
+    d._fs = LatencyAsyncFileSystem(["https://example.com/data/iris_bob.csv"], 0)
+    d._protocol = "https"
+    branched = PurePosixPath("example.com/data/iris_bob.csv")
+
+    assert exists_async([(d, branched)]) == [True]
+    assert d._fs.received == ["https://example.com/data/iris_bob.csv"]
+
+
+class ListingFileSystem:
+    """Filesystem that only lists, recording every directory it is asked for."""
+
+    def __init__(self, paths):
+        self.paths = paths
+        self.listed = []
+
+    def ls(self, path, detail=False):
+        self.listed.append(path)
+        return [p for p in self.paths if p.rsplit("/", 1)[0] == path]
+
+
+def test_listing_keeps_http_scheme(make_catalog):
+    """http(s) directories are listed with the scheme kedro strips from them."""
+    d = make_catalog().datasets.dataset_0
+    d._fs = ListingFileSystem(["https://example.com/data/iris_bob.csv"])
+    d._protocol = "https"
+    branched = PurePosixPath("example.com/data/iris_bob.csv")
+
+    assert exists_by_listing([(d, branched)]) == [True]
+    assert d._fs.listed == ["https://example.com/data"]
@@ -0,0 +1,148 @@
+"""Module to test the prefix layout of branched data and migrating to it."""
+from pathlib import PurePosixPath
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+from kedro.extras.datasets.pandas import CSVDataSet
+from kedro.io import PartitionedDataSet
+from kedro.io.core import Version
+from kedro.io.data_catalog import DataCatalog
+
+from steel_toes import layout, whos_protected
+from steel_toes.gc import gc
+from steel_toes.layout import PrefixLayout, SuffixLayout, make_layout
+from steel_toes.migrate import migrate
+from steel_toes.steel_toes import (
+    branch_targets,
+    clean_branch,
+    inject_branch,
+    inject_branches,
+)
+
+from .test_gc import git_repo
+
+DF = pd.DataFrame({"col1": [1, 2]})
+
+
+@pytest.fixture
+def prefix(monkeypatch):
+    """Use the prefix layout for the test only."""
+    monkeypatch.setattr(layout, "_LAYOUT", PrefixLayout("data"))
+
+
+def make_catalog(data):
+    """Catalog of a csv, a directory of partitions and a versioned csv."""
+    return DataCatalog(
+        {
+            "iris": CSVDataSet(filepath=str(data / "02_intermediate" / "iris.csv")),
+            "parts": PartitionedDataSet(
+                str(data / "01_raw" / "parts"),
+                "pandas.CSVDataSet",
+                filename_suffix=".csv",
+            ),
+            "model": CSVDataSet(
+                filepath=str(data / "06_models" / "model.csv"),
+                version=Version(None, None),
+            ),
+        }
+    )
+
+
+def save_branch(data, branch="bob"):
+    """Save every dataset of the catalog under branch."""
+    catalog = make_catalog(data)
+    for dataset in catalog.list():
+        inject_branch(branch, catalog, dataset, save_mode=True)
+    catalog.save("iris", DF)
+    catalog.save("parts", {"p1": DF})
+    catalog.save("model", DF)
+    return catalog
+
+
+def test_layouts():
+    """Every path of a branch shares one prefix, branch names are quoted."""
+    layout = PrefixLayout("data")
+    filepath = PurePosixPath("s3/bucket/data/02_intermediate/iris.csv")
+    assert layout.file(filepath, "feature/x") == PurePosixPath(
+        "s3/bucket/data/branches/feature%2Fx/02_intermediate/iris.csv"
+    )
+    assert layout.file(filepath, "") == filepath
+    assert (
+        layout.directory("s3://bucket/data/01_raw/parts/", "bob")
+        == "s3://bucket/data/branches/bob/01_raw/parts"
+    )
+    assert layout.versions(filepath, "bob")[1] == "iris.csv"
+    assert layout.prefix(str(filepath), "bob") == "s3/bucket/data/branches/bob"
+    assert layout.file(PurePosixPath("other/iris.csv"), "bob") == PurePosixPath(
+        "other/branches/bob/iris.csv"
+    )
+    assert SuffixLayout().file(filepath, "bob").name == "iris_bob.csv"
+    with pytest.raises(ValueError):
+        make_layout("infix")
+
+
+def test_prefix_layout(tmp_path, prefix):
+    """Branch data lands under one prefix and is removed as one target."""
+    data = tmp_path / "data"
+    CSVDataSet(
+        filepath=str(data / "06_models" / "model.csv"), version=Version(None, None)
+    ).save(DF + 10)
+    catalog = save_branch(data)
+    assert sorted(whos_protected(catalog)) == ["iris", "model", "parts"]
+
+    bob = data / "branches" / "bob"
+    assert (bob / "02_intermediate" / "iris.csv").exists()
+    assert (bob / "01_raw" / "parts" / "p1.csv").exists()
+    assert len(list((bob / "06_models" / "model.csv").glob("*/model.csv"))) == 1
+    assert not (data / "02_intermediate").exists()
+
+    fresh = make_catalog(data)
+    inject_branches("bob", fresh, fresh.list())
+    pd.testing.assert_frame_equal(fresh.load("model"), DF)
+    pd.testing.assert_frame_equal(make_catalog(data).load("model"), DF + 10)
+
+    assert branch_targets("bob", make_catalog(data)) == [
+        (catalog.datasets.iris._fs, str(bob))
+    ]
+    summary = clean_branch(
+        tmp_path, "bob", context=SimpleNamespace(catalog=fresh), size=True
+    )
+    assert summary.files == 3
+    assert not bob.exists()
+
+
+def test_gc_lists_branches(tmp_path, prefix):
+    """gc finds every branch prefix with one listing of the data root."""
+    repo = git_repo(tmp_path / "repo")
+    data = tmp_path / "data"
+    for branch in ["alive", "gone"]:
+        save_branch(data, branch)
+
+    report = gc(repo, context=SimpleNamespace(catalog=make_catalog(data)))
+    assert report.orphans == {"gone": [str(data / "branches" / "gone")]}
+    assert sorted(report.kept) == ["alive"]
+    assert (data / "branches" / "alive").exists()
+    assert not (data / "branches" / "gone").exists()
+
+
+def test_migrate(tmp_path, monkeypatch):
+    """Branch data moves to the prefix layout and back without being loaded."""
+    data = tmp_path / "data"
+    save_branch(data)
+    context = SimpleNamespace(catalog=make_catalog(data))
+    before = sorted(p.relative_to(data) for p in data.rglob("*") if p.is_file())
+
+    report = migrate(tmp_path, ["bob"], "suffix", "prefix", context=context)
+    assert len(report.moved) == 3
+    assert not list((data / "02_intermediate").iterdir())
+    monkeypatch.setattr(layout, "_LAYOUT", PrefixLayout("data"))
+    catalog = make_catalog(data)
+    inject_branches("bob", catalog, catalog.list())
+    pd.testing.assert_frame_equal(catalog.load("iris"), DF)
+    pd.testing.assert_frame_equal(catalog.load("model"), DF)
+
+    migrate(tmp_path, ["bob"], "prefix", "suffix", context=context)
+    after = sorted(p.relative_to(data) for p in data.rglob("*") if p.is_file())
+    assert after == before
+    assert not (data / "branches" / "bob").exists()
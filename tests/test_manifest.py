@@ -0,0 +1,54 @@
+"""Module to test the manifest of branched datasets."""
+from types import SimpleNamespace
+
+import pandas as pd
+
+from steel_toes import SteelToes, whos_protected
+from steel_toes.manifest import Manifest, verify_manifest
+
+from .conftest import DATASETS
+
+
+def test_swaps_from_manifest_without_storage(tmp_path, make_catalog, mocker):
+    """Datasets recorded in the manifest are swapped without probing storage."""
+    catalog = make_catalog()
+    manifest = Manifest(tmp_path / "manifest", "bob")
+    manifest.record(
+        "dataset_1", catalog.datasets.dataset_1._filepath.with_name("dataset_1_bob.csv")
+    )
+    exists = mocker.patch("steel_toes.probe.fs_exists")
+
+    hook = SteelToes(branch="bob", manifest=tmp_path / "manifest")
+    hook.after_catalog_created(catalog)
+
+    assert whos_protected(catalog) == ["dataset_1"]
+    assert exists.call_count == 0
+
+
+def test_saves_are_recorded(tmp_path, make_catalog):
+    """Branched saves are recorded in the manifest after they are written."""
+    catalog = make_catalog()
+    hook = SteelToes(branch="feature/new", manifest=tmp_path / "manifest")
+    hook.after_catalog_created(catalog)
+    hook.after_node_run(catalog, {"dataset_3": None})
+    catalog.save("dataset_3", pd.DataFrame({"col1": [1]}))
+    hook.after_dataset_saved("dataset_3")
+
+    recorded = Manifest(tmp_path / "manifest", "feature/new").read()
+    assert recorded == {"dataset_3": str(catalog.datasets.dataset_3._filepath)}
+
+
+def test_verify_and_rebuild(tmp_path, make_catalog):
+    """Verify reports drift between the manifest and storage, rebuild fixes it."""
+    catalog = make_catalog()
+    manifest = Manifest(tmp_path / "manifest", "bob")
+    manifest.record("dataset_1", "nowhere/dataset_1_bob.csv")
+    context = SimpleNamespace(catalog=catalog)
+
+    missing, untracked = verify_manifest(tmp_path / "manifest", "bob", context=context)
+    assert missing == ["dataset_1"]
+    assert untracked == sorted(DATASETS[::2])
+
+    verify_manifest(tmp_path / "manifest", "bob", rebuild=True, context=context)
+    assert verify_manifest(tmp_path / "manifest", "bob", context=context) == ([], [])
+    assert sorted(manifest.read()) == sorted(DATASETS[::2])
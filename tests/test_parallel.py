@@ -0,0 +1,113 @@
+"""Module to test sharing branch resolution with ParallelRunner workers."""
+import multiprocessing
+import pickle
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+from kedro.framework.hooks.manager import _create_hook_manager
+from kedro.pipeline import Pipeline, node
+from kedro.runner import ParallelRunner
+
+from steel_toes import SteelToes, whos_protected
+from steel_toes.manifest import Manifest
+from steel_toes.resolution import TABLE_ATTR, ResolutionTable
+
+
+def add_one(data):
+    """Add one to every value, so each node leaves a trace."""
+    return data + 1
+
+
+PIPELINE = Pipeline(
+    [
+        node(add_one, "dataset_0", "dataset_1"),
+        node(add_one, "dataset_1", "dataset_3"),
+    ]
+)
+
+
+def test_table_pickles_with_the_catalog(make_catalog, mocker):
+    """Workers swap from the table shipped with the catalog, without probing."""
+    catalog = make_catalog()
+    table = ResolutionTable.resolve("bob", catalog, PIPELINE.all_outputs())
+    assert table.paths["dataset_1"].endswith("dataset_1_bob.csv")
+
+    shipped = pickle.loads(pickle.dumps(catalog))
+    assert getattr(shipped, TABLE_ATTR).paths == table.paths
+
+    probe = mocker.spy(sys.modules["steel_toes.probe"], "fs_exists")
+    fresh = make_catalog()
+    table.apply(fresh)
+    assert whos_protected(fresh) == ["dataset_1", "dataset_3"]
+    assert probe.call_count == 0
+    table.collect()
+
+
+@pytest.mark.skipif(
+    multiprocessing.get_start_method() != "fork",
+    reason="workers inherit the hook registered in the test",
+)
+def test_worker_saves_flow_to_the_next_worker(tmp_path, make_catalog, mocker):
+    """Outputs saved in one worker are loaded by the next, and reported back."""
+    hook = SteelToes(branch="bob", manifest=tmp_path / "manifest")
+    mocker.patch(
+        "kedro.runner.parallel_runner.settings",
+        SimpleNamespace(HOOKS=(hook,), DISABLE_HOOKS_FOR_PLUGINS=()),
+    )
+    hook_manager = _create_hook_manager()
+    hook_manager.register(hook)
+    catalog = make_catalog()
+    hook_manager.hook.after_catalog_created(catalog=catalog)
+    hook_manager.hook.before_pipeline_run(
+        run_params={"runner": str(ParallelRunner)}, pipeline=PIPELINE, catalog=catalog
+    )
+    ParallelRunner(max_workers=2).run(PIPELINE, catalog, hook_manager)
+    hook.after_pipeline_run()
+
+    base = catalog.datasets.dataset_0.load()
+    pd.testing.assert_frame_equal(catalog.datasets.dataset_3.load(), base + 2)
+    assert catalog.datasets.dataset_3._filepath.name == "dataset_3_bob.csv"
+    assert set(Manifest(tmp_path / "manifest", "bob").read()) == {
+        "dataset_1",
+        "dataset_3",
+    }
+
+
+def test_failed_run_discards_the_spool(make_catalog):
+    """A run that fails removes the spool workers report their saves to."""
+    hook = SteelToes(branch="bob")
+    catalog = make_catalog()
+    hook.after_catalog_created(catalog)
+    hook.before_pipeline_run(
+        run_params={"runner": str(ParallelRunner)}, pipeline=PIPELINE, catalog=catalog
+    )
+    spool = Path(hook._table.reports)
+    assert spool.is_dir()
+
+    hook.on_pipeline_error()
+    assert not spool.exists()
+    assert hook._table is None
+
+
+def test_parallel_run_invalidates_the_cache(make_catalog):
+    """Outputs swapped and saved for workers are probed again by the next run."""
+    hook = SteelToes(branch="carol", cache_size=64)
+    catalog = make_catalog()
+    hook.after_catalog_created(catalog)
+    key = hook.cache.key(
+        catalog.datasets.dataset_1, catalog.datasets.dataset_1._filepath
+    )
+    path = key[1].replace("dataset_1.csv", "dataset_1_carol.csv")
+    assert hook.cache.get((key[0], path)) is False
+
+    hook.before_pipeline_run(
+        run_params={"runner": str(ParallelRunner)}, pipeline=PIPELINE, catalog=catalog
+    )
+    assert hook.cache.get((key[0], path)) is None
+    hook._table.report("dataset_1", path)
+    hook.cache.set((key[0], path), False)
+    hook.after_pipeline_run()
+    assert hook.cache.get((key[0], path)) is None
@@ -0,0 +1,110 @@
+"""Module to test partition level branching of partitioned datasets."""
+import pickle
+from pathlib import Path
+
+import pandas as pd
+from kedro.io import IncrementalDataSet, PartitionedDataSet
+from kedro.io.data_catalog import DataCatalog
+
+from steel_toes.steel_toes import (
+    branch_targets,
+    inject_branch,
+    inject_branches,
+    whos_protected,
+)
+
+
+def partitions(path: Path, names, value: int = 0) -> None:
+    """Save a csv partition per name under path."""
+    path.mkdir(parents=True, exist_ok=True)
+    for name in names:
+        pd.DataFrame({"a": [value]}).to_csv(path / f"{name}.csv", index=False)
+
+
+def make_catalog(tmp_path: Path) -> DataCatalog:
+    """Catalog of a partitioned and an incremental dataset."""
+    return DataCatalog(
+        {
+            "parts": PartitionedDataSet(
+                str(tmp_path / "parts"), "pandas.CSVDataSet", filename_suffix=".csv"
+            ),
+            "incremental": IncrementalDataSet(
+                str(tmp_path / "incremental"),
+                "pandas.CSVDataSet",
+                filename_suffix=".csv",
+            ),
+        }
+    )
+
+
+def test_branch_writes_only_changed_partitions(tmp_path):
+    """Saves land on the branch, loads merge base and branch, branch wins."""
+    partitions(tmp_path / "parts", [f"p{i:03}" for i in range(500)])
+    catalog = make_catalog(tmp_path)
+    inject_branches("bob", catalog, catalog.list())
+    assert sorted(whos_protected(catalog)) == ["incremental", "parts"]
+
+    catalog.save("parts", {"p001": pd.DataFrame({"a": [1]})})
+    assert [p.name for p in (tmp_path / "parts_bob").iterdir()] == ["p001.csv"]
+    assert len(list((tmp_path / "parts").iterdir())) == 500
+
+    loaded = catalog.load("parts")
+    assert len(loaded) == 500
+    assert loaded["p001"]().a[0] == 1
+    assert loaded["p002"]().a[0] == 0
+
+    # a new catalog on main still sees only the base partitions
+    base = make_catalog(tmp_path).load("parts")
+    assert base["p001"]().a[0] == 0
+
+
+def test_one_listing_per_side(tmp_path, mocker):
+    """The base and branch directories are listed once each and cached."""
+    partitions(tmp_path / "parts", ["a", "b"])
+    partitions(tmp_path / "parts_bob", ["b", "c"], value=1)
+    catalog = make_catalog(tmp_path)
+    inject_branch("bob", catalog, "parts")
+    d = catalog.datasets.parts
+    find = mocker.spy(d._filesystem, "find")
+    loaded = catalog.load("parts")
+    catalog.load("parts")
+    assert find.call_count == 2
+    assert sorted(loaded) == ["a", "b", "c"]
+    assert loaded["b"]().a[0] == 1
+
+
+def test_incremental_checkpoint_stays_on_branch(tmp_path):
+    """Confirming a branch writes its checkpoint to the branch directory."""
+    partitions(tmp_path / "incremental", ["a", "b"])
+    catalog = make_catalog(tmp_path)
+    inject_branches("bob", catalog, ["incremental"])
+    assert sorted(catalog.load("incremental")) == ["a", "b"]
+    catalog.confirm("incremental")
+    assert (tmp_path / "incremental_bob" / "CHECKPOINT").exists()
+    assert not (tmp_path / "incremental" / "CHECKPOINT").exists()
+
+    partitions(tmp_path / "incremental_bob", ["c"])
+    catalog = make_catalog(tmp_path)
+    inject_branches("bob", catalog, ["incremental"])
+    assert sorted(catalog.load("incremental")) == ["c"]
+
+
+def test_branch_targets(tmp_path):
+    """Cleaning a branch targets the branch partition directory only."""
+    catalog = make_catalog(tmp_path)
+    inject_branches("bob", catalog, catalog.list())
+    paths = sorted(path for _, path in branch_targets("bob", catalog))
+    assert paths == [
+        str(tmp_path / "incremental_bob"),
+        str(tmp_path / "parts_bob"),
+    ]
+
+
+def test_overlay_pickles(tmp_path):
+    """Overlaid datasets can be shipped to other processes."""
+    partitions(tmp_path / "parts", ["a"])
+    catalog = make_catalog(tmp_path)
+    inject_branches("bob", catalog, ["parts"])
+    d = pickle.loads(pickle.dumps(catalog.datasets.parts))
+    assert d._path == str(tmp_path / "parts_bob")
+    assert list(d.load()) == ["a"]
@@ -0,0 +1,133 @@
+"""Module to test promoting branched data onto base paths."""
+from pathlib import Path
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+from kedro.io import PartitionedDataSet
+from kedro.io.data_catalog import DataCatalog
+
+from steel_toes import promote as promote_module
+from steel_toes.catalog import LightDataSet, light_context
+from steel_toes.promote import promote
+
+from .conftest import DATASETS
+from .test_catalog import project
+from .test_partitioned import partitions
+
+
+def bob_content(catalog, dataset):
+    """Overwrite the bob data of dataset so promotion can be told apart."""
+    path = Path(getattr(catalog.datasets, dataset)._filepath)
+    bob = path.with_name(f"{path.stem}_bob{path.suffix}")
+    pd.DataFrame({"col1": [9]}).to_csv(bob, index=False)
+    return path, bob
+
+
+def test_promote(make_catalog, tmp_path):
+    """Branched files replace their base, nothing is left behind."""
+    catalog = make_catalog()
+    context = SimpleNamespace(catalog=catalog)
+    base, bob = bob_content(catalog, "dataset_0")
+
+    report = promote(tmp_path, "bob", dryrun=True, context=context)
+    assert len(report.moved) == len(DATASETS[::2])
+    assert bob.exists()
+
+    report = promote(tmp_path, "bob", verify=True, jobs=4, context=context)
+    assert len(report.moved) == len(DATASETS[::2])
+    assert not bob.exists()
+    assert pd.read_csv(base).col1[0] == 9
+    assert not list(tmp_path.glob("**/*_bob.csv"))
+    assert not list(tmp_path.glob("**/*.steel_toes_backup"))
+    assert not (tmp_path / ".steel_toes" / "promote" / "bob.jsonl").exists()
+    assert promote(tmp_path, "bob", context=context).moved == []
+
+
+def interrupt(mocker, after):
+    """Fail the move after `after` moves have been applied."""
+    apply = promote_module._apply
+    calls = []
+
+    def flaky(*args, **kwargs):
+        if len(calls) == after:
+            raise KeyboardInterrupt
+        calls.append(args)
+        return apply(*args, **kwargs)
+
+    mocker.patch.object(promote_module, "_apply", side_effect=flaky)
+
+
+def test_resume(make_catalog, tmp_path, mocker):
+    """An interrupted promotion is finished with resume."""
+    context = SimpleNamespace(catalog=make_catalog())
+    interrupt(mocker, 3)
+    with pytest.raises(KeyboardInterrupt):
+        promote(tmp_path, "bob", context=context)
+    mocker.stopall()
+
+    with pytest.raises(RuntimeError):
+        promote(tmp_path, "bob", context=context)
+    assert len(list(tmp_path.glob("**/*_bob.csv"))) == len(DATASETS[::2]) - 3
+
+    report = promote(tmp_path, "bob", resume=True, context=context)
+    assert len(report.moved) == len(DATASETS[::2])
+    assert not list(tmp_path.glob("**/*_bob.csv"))
+    assert not list(tmp_path.glob("**/*.steel_toes_backup"))
+
+
+def test_rollback(make_catalog, tmp_path, mocker):
+    """An interrupted promotion is undone with rollback."""
+    catalog = make_catalog()
+    context = SimpleNamespace(catalog=catalog)
+    base, _ = bob_content(catalog, "dataset_0")
+    before = {p: p.read_text() for p in tmp_path.glob("layer_*/*.csv")}
+    interrupt(mocker, 5)
+    with pytest.raises(KeyboardInterrupt):
+        promote(tmp_path, "bob", context=context)
+    mocker.stopall()
+    assert pd.read_csv(base).col1[0] == 9
+
+    promote(tmp_path, "bob", rollback=True, context=context)
+    assert {p: p.read_text() for p in tmp_path.glob("layer_*/*.csv")} == before
+    assert not list(tmp_path.glob("**/*.steel_toes_backup"))
+
+
+def test_promote_partitions(tmp_path):
+    """Partitioned overlays are promoted one partition at a time.
+
+    The light catalog cannot model a directory of partitions, it falls back to
+    a session, and a plain dataset found to be a directory is refused.
+    """
+    project(
+        tmp_path,
+        "parts:\n  type: PartitionedDataSet\n  path: data/parts\n"
+        "  dataset: pandas.CSVDataSet\n  filename_suffix: .csv\n",
+    )
+    parts = tmp_path / "data" / "parts"
+    partitions(parts, ["a", "b", "c"])
+    partitions(tmp_path / "data" / "parts_bob", ["b"], value=1)
+    assert light_context(tmp_path) is None
+
+    light = SimpleNamespace(
+        catalog=SimpleNamespace(
+            datasets=SimpleNamespace(parts=LightDataSet(str(parts))),
+            list=lambda: ["parts"],
+        )
+    )
+    with pytest.raises(RuntimeError):
+        promote(tmp_path, "bob", context=light)
+    assert sorted(p.name for p in parts.iterdir()) == ["a.csv", "b.csv", "c.csv"]
+
+    catalog = DataCatalog(
+        {
+            "parts": PartitionedDataSet(
+                str(parts), "pandas.CSVDataSet", filename_suffix=".csv"
+            )
+        }
+    )
+    report = promote(tmp_path, "bob", context=SimpleNamespace(catalog=catalog))
+    assert len(report.moved) == 1
+    assert sorted(p.name for p in parts.iterdir()) == ["a.csv", "b.csv", "c.csv"]
+    assert pd.read_csv(parts / "b.csv").a[0] == 1
+    assert pd.read_csv(parts / "a.csv").a[0] == 0
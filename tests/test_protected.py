@@ -0,0 +1,71 @@
+"""Module to test the registry of protected datasets."""
+import json
+import pickle
+
+from steel_toes import whos_protected
+from steel_toes.protected import PROTECTED
+from steel_toes.steel_toes import announce_protection, inject_branches
+
+from .conftest import DATASETS
+
+
+class CountingDatasets:
+    """Count the datasets looked up on a catalog."""
+
+    def __init__(self, datasets):
+        self._datasets = datasets
+        self.lookups = 0
+
+    def __getattr__(self, name):
+        self.lookups += 1
+        return getattr(self._datasets, name)
+
+
+def test_swaps_are_recorded(make_catalog):
+    """Every swap records its dataset, paths, hook and time."""
+    catalog = make_catalog()
+    inject_branches("bob", catalog, catalog.list(), hook="test")
+
+    protections = dict(PROTECTED.of(catalog))
+    d = catalog.datasets.dataset_0
+    assert protections[d].dataset == "dataset_0"
+    assert protections[d].base == str(d._filepath_base)
+    assert protections[d].branched == str(d._filepath)
+    assert protections[d].hook == "test"
+    assert protections[d].swapped_at > 0
+
+    exported = json.loads(PROTECTED.to_json(catalog))
+    assert [p["dataset"] for p in exported] == DATASETS[::2]
+    assert exported[0]["branched"].endswith("dataset_0_bob.csv")
+
+
+def test_queries_only_touch_protected(make_catalog, capsys):
+    """whos_protected and announce_protection never look at other datasets."""
+    other = make_catalog()
+    inject_branches("bob", other, other.list())
+    catalog = make_catalog()
+    inject_branches("bob", catalog, catalog.list())
+    catalog.datasets = CountingDatasets(catalog.datasets)
+
+    assert whos_protected(catalog) == DATASETS[::2]
+    assert catalog.datasets.lookups == len(DATASETS[::2])
+    announce_protection(catalog)
+    assert catalog.datasets.lookups == 2 * len(DATASETS[::2])
+    assert "dataset_0_bob.csv" in capsys.readouterr().out
+
+
+def test_catalogs_only_see_their_own(make_catalog):
+    """Protections of one catalog are not listed for another."""
+    catalog = make_catalog()
+    inject_branches("bob", catalog, catalog.list())
+
+    assert whos_protected(make_catalog()) == []
+
+
+def test_copies_are_read_from_markers(make_catalog):
+    """Copied and unpickled catalogs list the datasets that arrived swapped."""
+    catalog = make_catalog()
+    inject_branches("bob", catalog, catalog.list())
+
+    assert whos_protected(catalog.shallow_copy()) == DATASETS[::2]
+    assert whos_protected(pickle.loads(pickle.dumps(catalog))) == DATASETS[::2]
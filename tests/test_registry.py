@@ -0,0 +1,86 @@
+"""Module to test the registry of how dataset classes are branched."""
+import copy
+
+import pytest
+from kedro.extras.datasets.pandas import CSVDataSet
+from kedro.io import MemoryDataSet
+from kedro.io.data_catalog import DataCatalog
+
+from steel_toes import register, whos_protected
+from steel_toes.registry import REGISTRY, Registry, Strategy
+from steel_toes.steel_toes import inject_branches
+
+from .conftest import DATASETS
+
+
+class TableDataSet(MemoryDataSet):
+    """A dataset whose location is a table name rather than a filepath."""
+
+    def __init__(self, table: str, tables: set) -> None:
+        super().__init__()
+        self._table = table
+        self.tables = tables
+
+
+@pytest.fixture
+def registry():
+    """Forget anything registered by the test."""
+    yield REGISTRY
+    REGISTRY.unregister(TableDataSet)
+    REGISTRY.unregister(CSVDataSet)
+
+
+def test_exists_never_copies_file_datasets(make_catalog, mocker):
+    """File datasets are checked on their filesystem, never copied."""
+    copied = mocker.spy(copy, "copy")
+    catalog = make_catalog()
+    outcomes = inject_branches("bob", catalog, catalog.list())
+
+    assert copied.call_count == 0
+    assert outcomes["swapped"] == len(DATASETS[::2])
+    assert whos_protected(catalog) == DATASETS[::2]
+
+
+def test_custom_dataset(registry):
+    """A registered dataset is branched with its own path and exists check."""
+    register(
+        TableDataSet,
+        path="_table",
+        branch=lambda table, branch: f"{table}__{branch}",
+        exists=lambda d, table: table in d.tables,
+    )
+    tables = {"iris", "iris__bob", "cars"}
+    catalog = DataCatalog(
+        {"iris": TableDataSet("iris", tables), "cars": TableDataSet("cars", tables)}
+    )
+    inject_branches("bob", catalog, catalog.list())
+
+    assert whos_protected(catalog) == ["iris"]
+    assert catalog.datasets.iris._table == "iris__bob"
+    assert catalog.datasets.iris._filepath_base == "iris"
+
+
+def test_register_ignore(registry, make_catalog):
+    """Classes registered as ignored are never branched."""
+    register(CSVDataSet, ignore=True)
+    catalog = make_catalog()
+    outcomes = inject_branches("bob", catalog, catalog.list())
+
+    assert whos_protected(catalog) == []
+    assert outcomes["ignored"] == len(DATASETS)
+
+
+def test_resolves_once_per_class():
+    """Strategies are resolved through the mro once and cached per class."""
+    registry = Registry()
+    strategy = registry.register(MemoryDataSet, ignore=True)
+
+    assert registry.resolve(TableDataSet) is strategy
+    # bypass register, which would clear the cache
+    registry._strategies[TableDataSet] = Strategy(path="_table")
+    assert registry.resolve(TableDataSet) is strategy
+    assert registry.resolve(TableDataSet, [TableDataSet]).ignore
+    assert registry.resolve(CSVDataSet).path == "_filepath"
+
+    registry.unregister(MemoryDataSet)
+    assert registry.resolve(TableDataSet).path == "_table"
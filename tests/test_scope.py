@@ -0,0 +1,117 @@
+"""Module to test scoping a branched run to the nodes changed on the branch."""
+import importlib.util
+import uuid
+
+from git import Repo
+from kedro.pipeline import Pipeline, node
+
+from steel_toes.scope import changed_lines, parse_diff, scope
+
+NODES = """import math
+
+
+def clean(raw):
+    return raw
+
+
+def features(clean):
+    return clean
+
+
+def train(features):
+    return features
+
+
+def report(raw):
+    return raw
+"""
+
+
+def load_pipeline(path):
+    """Import the node module at path and build a pipeline of its functions."""
+    spec = importlib.util.spec_from_file_location(f"nodes_{uuid.uuid4().hex}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return Pipeline(
+        [
+            node(module.clean, "raw", "clean", name="clean"),
+            node(module.features, "clean", "features", name="features"),
+            node(module.train, "features", "model", name="train"),
+            node(module.report, "raw", "report", name="report"),
+        ]
+    )
+
+
+def feature_branch(tmp_path, change):
+    """Commit the node module on main, and change it on a feature branch."""
+    repo = Repo.init(tmp_path)
+    path = tmp_path / "nodes.py"
+    path.write_text(NODES)
+    repo.index.add([str(path)])
+    repo.index.commit("nodes")
+    repo.git.branch("-M", "main")
+    repo.git.checkout("-b", "feature")
+    path.write_text(change(NODES))
+    return load_pipeline(path)
+
+
+def test_changed_node_and_downstream(tmp_path):
+    """Only the changed node and its downstream nodes are scoped."""
+    pipeline = feature_branch(
+        tmp_path, lambda s: s.replace("    return clean", "    return clean * 2")
+    )
+    result = scope(pipeline, tmp_path, "main")
+    assert result.changed == ["features"]
+    assert result.nodes == ["features", "train"]
+    assert result.inputs == ["clean"]
+
+
+def test_module_level_change_scopes_every_node(tmp_path):
+    """A change outside the node functions may change any of them."""
+    pipeline = feature_branch(tmp_path, lambda s: s.replace("math", "json"))
+    assert sorted(scope(pipeline, tmp_path, "main").nodes) == sorted(
+        ["clean", "features", "train", "report"]
+    )
+
+
+def test_nothing_changed(tmp_path):
+    """Without changes there is nothing to run."""
+    result = scope(feature_branch(tmp_path, lambda s: s), tmp_path, "main")
+    assert result.changed == result.nodes == []
+
+
+def test_parse_diff(tmp_path):
+    """Added, changed and removed lines all mark the lines around them."""
+    diff = "\n".join(
+        [
+            "+++ b/src/nodes.py",
+            "@@ -3 +3 @@ def clean(raw):",
+            "@@ -10,2 +10,0 @@",
+            "@@ -20,0 +21,3 @@",
+            "+++ /dev/null",
+            "@@ -1,5 +0,0 @@",
+        ]
+    )
+    assert parse_diff(diff, tmp_path) == {
+        (tmp_path / "src" / "nodes.py").resolve(): [(3, 3), (10, 11), (21, 23)]
+    }
+
+
+def test_changed_lines_ignore_user_diff_config(tmp_path):
+    """Prefixes and quoting set in the git config do not change the paths."""
+    repo = Repo.init(tmp_path)
+    with repo.config_writer() as config:
+        config.set_value("diff", "noprefix", "true")
+        config.set_value("core", "quotePath", "true")
+    path = tmp_path / "src" / "nödes ünicode.py"
+    path.parent.mkdir()
+    path.write_text(NODES)
+    repo.index.add([str(path)])
+    repo.index.commit("nodes")
+    repo.git.branch("-M", "main")
+    repo.git.checkout("-b", "feature")
+    path.write_text(NODES.replace("    return clean", "    return clean * 2"))
+
+    _, changes = changed_lines(tmp_path, "main")
+    assert changes == {path.resolve(): [(9, 9)]}
+    assert scope(load_pipeline(path), tmp_path, "main").changed == ["features"]
@@ -0,0 +1,48 @@
+"""Module to test the instrumentation of the hooks."""
+from click.testing import CliRunner
+from kedro.pipeline import Pipeline, node
+
+from steel_toes import SteelToes
+from steel_toes.cli import cli
+from steel_toes.stats import read_reports
+
+from .conftest import DATASETS
+from .test_hook import identity, run
+
+
+def test_report(tmp_path, make_catalog):
+    """Hook times, storage calls, outcomes and cache hits are reported."""
+    hook = SteelToes(branch="bob", cache_size=64, stats=tmp_path / "stats")
+    pipeline = Pipeline([node(identity, "dataset_1", "dataset_3")])
+    run(hook, make_catalog(), pipeline)
+    hook.after_pipeline_run()
+
+    report = hook.report()
+    assert report["hooks"]["after_catalog_created"]["calls"] == 1
+    assert report["hooks"]["before_dataset_loaded"]["calls"] == 1
+    assert report["storage_calls"] == len(DATASETS)
+    assert report["outcomes"] == {
+        "swapped": len(DATASETS[::2]) + 1,
+        # dataset_1 is checked again before the pipeline runs
+        "skipped": len(DATASETS[1::2]) + 1,
+        "ignored": 0,
+    }
+    assert report["cache"]["misses"] == len(DATASETS)
+    assert len(report["probes"]) == len(DATASETS)
+
+    reports = read_reports(tmp_path / "stats")
+    assert len(reports) == 1
+    assert reports[0]["branch"] == "bob"
+
+
+def test_stats_command(tmp_path, make_catalog):
+    """steel-toes stats summarises the latest reports."""
+    hook = SteelToes(branch="bob", stats=tmp_path / "stats")
+    run(hook, make_catalog(), Pipeline([node(identity, "dataset_1", "dataset_3")]))
+    hook.after_pipeline_run()
+
+    result = CliRunner().invoke(cli, ["stats", "-d", str(tmp_path / "stats")])
+    assert result.exit_code == 0, result.output
+    assert f"{len(DATASETS) + 1} storage calls" in result.output
+    assert "after_catalog_created" in result.output
+    assert "slowest datasets over 1 runs" in result.output
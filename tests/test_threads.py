@@ -0,0 +1,107 @@
+"""Module to stress the hook with many threads, the way ThreadRunner calls it."""
+import sys
+import threading
+import time
+
+import pandas as pd
+from kedro.extras.datasets.pandas import CSVDataSet
+from kedro.framework.hooks.manager import _create_hook_manager
+from kedro.io.data_catalog import DataCatalog
+from kedro.pipeline import Pipeline, node
+from kedro.runner import ThreadRunner
+
+from steel_toes import SteelToes, whos_protected
+from steel_toes.once import OncePerKey
+
+THREADS = 300
+NODES = 100
+
+
+def identity(data):
+    """Pass data through a node unchanged."""
+    return data
+
+
+def slow_exists(probe, seconds=0.01):
+    """Wrap a probe so concurrent calls overlap."""
+
+    def exists(*args):
+        time.sleep(seconds)
+        return probe(*args)
+
+    return exists
+
+
+def test_once_per_key_under_contention():
+    """Every key is initialised exactly once however many threads race for it."""
+    once = OncePerKey()
+    calls = []
+    barrier = threading.Barrier(THREADS)
+
+    def work(i):
+        barrier.wait()
+        once(i % 3, lambda: calls.append(i % 3) or time.sleep(0.01))
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(calls) == [0, 1, 2]
+
+
+def test_concurrent_loads_resolve_once(make_catalog, mocker):
+    """Hundreds of threads loading one dataset probe it once and swap it once."""
+    probe_module = sys.modules["steel_toes.probe"]
+    probe = mocker.patch.object(
+        probe_module, "fs_exists", side_effect=slow_exists(probe_module.fs_exists)
+    )
+    catalog = make_catalog()
+    base = catalog.datasets.dataset_0._filepath
+    hook = SteelToes(branch="bob", resolution="on_demand")
+    hook.after_catalog_created(catalog)
+    barrier = threading.Barrier(THREADS)
+
+    def load():
+        barrier.wait()
+        hook.before_dataset_loaded("dataset_0")
+
+    threads = [threading.Thread(target=load) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    d = catalog.datasets.dataset_0
+    assert probe.call_count == 1
+    assert d._filepath_base == base
+    assert d._filepath.name == "dataset_0_bob.csv"
+    assert hook.stats.outcomes["swapped"] == 1
+
+
+def test_thread_runner(tmp_path, make_catalog):
+    """A wide pipeline under ThreadRunner swaps every dataset exactly once."""
+    catalog = make_catalog()
+    outputs = {
+        f"out_{i}": CSVDataSet(filepath=str(tmp_path / "out" / f"out_{i}.csv"))
+        for i in range(NODES)
+    }
+    catalog = DataCatalog({**catalog._data_sets, **outputs})
+    pipeline = Pipeline(
+        [node(identity, "dataset_0", name, name=name) for name in outputs]
+    )
+    hook = SteelToes(branch="bob", resolution="on_demand")
+    hook_manager = _create_hook_manager()
+    hook_manager.register(hook)
+    hook_manager.hook.after_catalog_created(catalog=catalog)
+    ThreadRunner(max_workers=NODES).run(pipeline, catalog, hook_manager)
+
+    assert sorted(whos_protected(catalog)) == sorted(["dataset_0", *outputs])
+    assert hook.stats.outcomes["swapped"] == NODES + 1
+    assert catalog.datasets.dataset_0._filepath_base.name == "dataset_0.csv"
+    for name in outputs:
+        assert (tmp_path / "out" / f"{name}_bob.csv").exists()
+        assert not (tmp_path / "out" / f"{name}.csv").exists()
+    pd.testing.assert_frame_equal(
+        catalog.load("out_0"), catalog.datasets.dataset_0.load()
+    )
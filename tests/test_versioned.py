@@ -0,0 +1,93 @@
+"""Module to test branching versioned datasets inside their version tree."""
+import pickle
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+from kedro.extras.datasets.pandas import CSVDataSet
+from kedro.io.core import Version
+from kedro.io.data_catalog import DataCatalog
+
+from steel_toes import clean_branch, whos_protected
+from steel_toes.promote import promote
+from steel_toes.steel_toes import inject_branches
+
+BASE = pd.DataFrame({"col1": [1, 2]})
+BRANCH = pd.DataFrame({"col1": [3, 4]})
+
+
+@pytest.fixture
+def make_catalog(tmp_path):
+    """Build a fresh catalog of one versioned csv with a single base version."""
+    filepath = str(tmp_path / "iris.csv")
+    CSVDataSet(filepath=filepath, version=Version(None, None)).save(BASE)
+
+    def _make_catalog():
+        return DataCatalog(
+            {"iris": CSVDataSet(filepath=filepath, version=Version(None, None))}
+        )
+
+    return _make_catalog
+
+
+def branched(catalog):
+    """Overlay the bob branch on the catalog and return the versioned dataset."""
+    inject_branches("bob", catalog, catalog.list())
+    return catalog.datasets.iris
+
+
+def test_branch_saves_into_version_tree(tmp_path, make_catalog):
+    """Branch versions are saved next to base versions and never loaded by base."""
+    catalog = make_catalog()
+    d = branched(catalog)
+    assert whos_protected(catalog) == ["iris"]
+    pd.testing.assert_frame_equal(d.load(), BASE)
+
+    d.save(BRANCH)
+    version = d.resolve_save_version()
+    assert (tmp_path / "iris.csv" / version / "iris_bob.csv").exists()
+    assert not (tmp_path / "iris.csv" / version / "iris.csv").exists()
+    pd.testing.assert_frame_equal(d.load(), BRANCH)
+    pd.testing.assert_frame_equal(make_catalog().load("iris"), BASE)
+    pd.testing.assert_frame_equal(branched(make_catalog()).load(), BRANCH)
+
+
+def test_versions_are_listed_once_per_run(make_catalog, mocker):
+    """One glob resolves both branch and base, and survives release."""
+    plain = make_catalog().datasets.iris
+    plain._glob_function = mocker.Mock(wraps=plain._glob_function)
+    d = branched(make_catalog())
+    d._glob_function = mocker.Mock(wraps=d._glob_function)
+
+    for dataset in [plain, d]:
+        dataset.load()
+        dataset.release()
+        dataset.load()
+    assert d._glob_function.call_count == 1
+    assert plain._glob_function.call_count == 2
+
+
+def test_clean_and_promote(tmp_path, make_catalog):
+    """Cleaning removes branch versions, promoting renames them onto the base."""
+    d = branched(make_catalog())
+    d.save(BRANCH)
+    context = SimpleNamespace(catalog=make_catalog())
+
+    promote(tmp_path, "bob", context=context)
+    pd.testing.assert_frame_equal(make_catalog().load("iris"), BRANCH)
+
+    d = branched(make_catalog())
+    d.save(BASE)
+    clean_branch(tmp_path, "bob", context=context)
+    assert not list((tmp_path / "iris.csv").glob("*/iris_bob.csv"))
+    assert len(list((tmp_path / "iris.csv").iterdir())) == 2
+
+
+def test_overlaid_dataset_pickles(make_catalog):
+    """Overlaid datasets keep their branch and resolved versions when pickled."""
+    d = branched(make_catalog())
+    d.load()
+    copied = pickle.loads(pickle.dumps(d))
+    assert type(copied) is type(d)
+    assert copied._latest_versions == d._latest_versions
+    pd.testing.assert_frame_equal(copied.load(), BASE)